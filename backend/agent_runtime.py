@@ -0,0 +1,93 @@
+# agent_runtime.py
+# 에이전트(file_monitor)의 asyncio 실행 환경
+#   - 이벤트 루프 하나에서 감시 이벤트/주기 검사 작업을 동시에 진행
+#   - 네트워크 요청은 api_client의 공유 세션을 쓰는 전용 스레드 풀에서 실행 (동시 요청 수 제한)
+#   - 해시 계산은 별도 스레드 풀에서 실행하여 네트워크 대기와 겹치도록 함
+#   - watchdog 스레드의 이벤트는 submit()으로 루프에 전달
+import asyncio, functools, os
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+from hash_calculator import calculate_file_hash
+
+MAX_INFLIGHT_REQUESTS = int(os.getenv("FIM_MAX_INFLIGHT_REQUESTS", str(api_client.POOL_MAXSIZE)))  # 동시 API 요청 수
+HASH_WORKERS = int(os.getenv("FIM_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))              # 동시 해시 계산 수
+
+
+class AgentRuntime:
+    """
+    에이전트 작업을 실행하는 asyncio 런타임
+        - call_api / hash_file / call_blocking 은 루프 안에서 await로 사용
+        - submit 은 다른 스레드(watchdog 등)에서 코루틴을 루프에 넘길 때 사용
+    """
+
+    def __init__(self, max_inflight=MAX_INFLIGHT_REQUESTS, hash_workers=HASH_WORKERS):
+        self.loop = None
+        self._net_executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="fim-net")
+        self._hash_executor = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="fim-hash")
+        self._tasks = set()
+
+    def attach(self, loop):
+        """ 현재 실행 중인 이벤트 루프를 런타임에 연결 """
+        self.loop = loop
+
+    async def call_api(self, func, *args, **kwargs):
+        """
+        api_client 함수를 네트워크 스레드 풀에서 실행
+            - 풀 크기만큼만 동시에 요청하고 나머지는 대기
+
+        :param func: 실행할 api_client 함수
+
+        :return: 함수 반환값
+        """
+
+        return await self.loop.run_in_executor(self._net_executor, functools.partial(func, *args, **kwargs))
+
+    async def hash_file(self, file_path):
+        """
+        파일 해시를 해시 스레드 풀에서 계산
+
+        :param file_path: 파일 절대 경로
+
+        :return: 해시값 (실패 시 None)
+        """
+
+        return await self.loop.run_in_executor(self._hash_executor, calculate_file_hash, str(file_path))
+
+    async def call_blocking(self, func, *args, **kwargs):
+        """ 기타 블로킹 작업(OS 알림 등)을 기본 스레드 풀에서 실행 """
+        return await self.loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    def spawn(self, coro):
+        """ 루프 안에서 코루틴을 백그라운드 작업으로 실행 (종료 시 정리 대상으로 추적) """
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def submit(self, coro):
+        """
+        다른 스레드에서 코루틴을 루프에 전달 (watchdog 이벤트 연결용)
+
+        :param coro: 실행할 코루틴
+        """
+
+        if self.loop is None or self.loop.is_closed():
+            coro.close()
+            return
+        self.loop.call_soon_threadsafe(self.spawn, coro)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[AGENT ERROR] 백그라운드 작업 오류: {task.exception()!r}")
+
+    async def drain(self):
+        """ 진행 중인 백그라운드 작업이 모두 끝날 때까지 대기 """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def shutdown(self):
+        """ 스레드 풀 정리 """
+        self._net_executor.shutdown(wait=False, cancel_futures=True)
+        self._hash_executor.shutdown(wait=False, cancel_futures=True)
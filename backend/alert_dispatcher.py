@@ -0,0 +1,185 @@
+# alert_dispatcher.py
+# alerts 테이블에 쌓인 이메일 알림을 백그라운드에서 발송
+#   - 워커 프로세스 중 advisory lock을 잡은 하나만 발송 (SMTP 연결 하나를 재사용)
+#   - 새 알림은 LISTEN/NOTIFY로 즉시 깨어나 처리, 놓친 경우를 대비해 주기적으로도 확인
+#   - 요약(digest) 대상 알림은 사용자별로 모아 변경 유형별로 정리한 이메일 한 통으로 발송
+#   - 실패한 알림은 지수 백오프로 재시도하고, 최대 횟수를 넘으면 failed로 표시
+import os, threading, time
+from collections import defaultdict
+import psycopg
+from alerts import SMTPMailer, smtp_configured
+from config import DB_PARAMS
+from database import ALERT_CHANNEL, release_connection
+
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", "50"))
+ALERT_DIGEST_USERS_PER_BATCH = int(os.getenv("ALERT_DIGEST_USERS_PER_BATCH", "20"))
+ALERT_DIGEST_MAX_LINES = 200                                           # 요약 이메일에 나열할 최대 파일 수
+ALERT_POLL_INTERVAL = float(os.getenv("ALERT_POLL_INTERVAL", "30"))    # 알림이 없어도 대기열을 확인하는 간격 (초)
+ALERT_LEASE_SECONDS = int(os.getenv("ALERT_LEASE_SECONDS", "300"))     # 가져간 알림을 다른 워커가 다시 가져가기까지 (초)
+ALERT_MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", "6"))
+ALERT_RETRY_BASE = 30                                                  # 재시도 대기 기본값 (초)
+ALERT_RETRY_MAX = 3600
+DISPATCHER_LOCK_KEY = 0x46494D41                                       # pg advisory lock 키 ('FIMA')
+DISPATCHER_RETRY_DELAY = 10
+
+
+class AlertDispatcher(threading.Thread):
+    def __init__(self, db_manager):
+        super().__init__(name="alert-dispatcher", daemon=True)
+        self.db = db_manager
+        self.mailer = SMTPMailer()
+
+    def run(self):
+        while True:
+            try:
+                with psycopg.connect(**DB_PARAMS, autocommit=True) as listen_conn:
+                    # 1. 발송 담당 워커 선출 (연결이 끊기면 lock이 풀려 다른 워커가 이어받음)
+                    while not listen_conn.execute(
+                            "SELECT pg_try_advisory_lock(%s)", (DISPATCHER_LOCK_KEY,)).fetchone()[0]:
+                        time.sleep(ALERT_POLL_INTERVAL)
+
+                    print(f"✅ 알림 디스패처 시작 (pid {os.getpid()})")
+                    listen_conn.execute(f"LISTEN {ALERT_CHANNEL}")
+
+                    # 2. 대기열이 빌 때까지 발송 -> 새 알림 또는 주기 도래까지 대기
+                    while True:
+                        if self._dispatch_batch():
+                            continue
+                        self.mailer.close_if_idle()
+                        for _ in listen_conn.notifies(timeout=self._wait_timeout(), stop_after=1):
+                            pass
+
+            except Exception as e:
+                print(f"⚠️ 알림 디스패처 오류, {DISPATCHER_RETRY_DELAY}초 후 재시작: {e}")
+
+            self.mailer.close()
+            time.sleep(DISPATCHER_RETRY_DELAY)
+
+    def _wait_timeout(self):
+        """ 다음 발송 예정 알림(요약 포함)까지 대기할 시간 """
+        try:
+            due_in = self.db.seconds_until_next_alert()
+        finally:
+            release_connection()
+        if due_in is None:
+            return ALERT_POLL_INTERVAL
+        return min(ALERT_POLL_INTERVAL, due_in + 0.5)
+
+    def _dispatch_batch(self):
+        """
+        발송 시점이 된 알림을 한 묶음 발송 (즉시 발송 + 사용자별 요약)
+
+        :return: 처리한 알림 수
+        """
+
+        try:
+            alerts = self.db.claim_pending_alerts(ALERT_BATCH_SIZE, ALERT_LEASE_SECONDS)
+            for alert in alerts:
+                self._deliver([alert["id"]], alert["email"], alert["subject"], alert["body"], alert["attempts"])
+
+            digest_alerts = self.db.claim_digest_alerts(ALERT_DIGEST_USERS_PER_BATCH, ALERT_LEASE_SECONDS)
+            by_user = defaultdict(list)
+            for alert in digest_alerts:
+                by_user[alert["user_id"]].append(alert)
+            for user_alerts in by_user.values():
+                self._deliver_digest(user_alerts)
+
+            return len(alerts) + len(digest_alerts)
+        finally:
+            release_connection()
+
+    def _deliver_digest(self, user_alerts):
+        """ 사용자 1명의 요약 대상 알림을 이메일 한 통으로 발송 (1건이면 원래 이메일 그대로) """
+        ids = [alert["id"] for alert in user_alerts]
+        attempts = max(alert["attempts"] for alert in user_alerts)
+        email = user_alerts[0]["email"]
+
+        if len(user_alerts) == 1:
+            self._deliver(ids, email, user_alerts[0]["subject"], user_alerts[0]["body"], attempts)
+            return
+
+        subject, body = build_digest_message(user_alerts)
+        self._deliver(ids, email, subject, body, attempts)
+
+    def _deliver(self, alert_ids, email, subject, body, attempts):
+        """ 이메일 1통 발송 후 포함된 알림들의 결과 기록 """
+        if not email:
+            self.db.mark_alerts_failed(alert_ids, "recipient email not found", None)
+            return
+
+        try:
+            self.mailer.send(email, subject, body)
+        except Exception as e:
+            if attempts >= ALERT_MAX_ATTEMPTS:
+                print(f"❌ 알림 {alert_ids} 발송 최종 실패 ({attempts}회): {e}")
+                self.db.mark_alerts_failed(alert_ids, str(e), None)
+            else:
+                delay = min(ALERT_RETRY_MAX, ALERT_RETRY_BASE * (2 ** (attempts - 1)))
+                print(f"⚠️ 알림 {alert_ids} 발송 실패, {delay}초 후 재시도: {e}")
+                self.db.mark_alerts_failed(alert_ids, str(e), delay)
+            return
+
+        self.db.mark_alerts_sent(alert_ids)
+        print(f"이메일 알림 발송 완료: {email} ({len(alert_ids)}건)")
+
+
+def build_digest_message(user_alerts):
+    """
+    여러 알림을 변경 유형별로 묶은 요약 이메일 작성
+
+    :param user_alerts: 한 사용자의 알림 목록 (change_type, file_path, created_at 포함)
+
+    :return: (제목, 본문)
+    """
+
+    by_type = defaultdict(list)
+    for alert in sorted(user_alerts, key=lambda a: a["created_at"]):
+        by_type[alert["change_type"] or "Unknown"].append(alert)
+
+    first = min(alert["created_at"] for alert in user_alerts)
+    last = max(alert["created_at"] for alert in user_alerts)
+    summary = ", ".join(f"{change_type} {len(items)}건" for change_type, items in by_type.items())
+
+    subject = f"파일 변경 알림 요약: {len(user_alerts)}건 ({summary})"
+    lines = [
+        f"{first.strftime('%Y-%m-%d %H:%M:%S')} ~ {last.strftime('%Y-%m-%d %H:%M:%S')} 동안 "
+        f"{len(user_alerts)}건의 파일 변경이 감지되었습니다."
+    ]
+
+    listed = 0
+    for change_type, items in by_type.items():
+        lines.append("")
+        lines.append(f"[{change_type}] {len(items)}건")
+        for alert in items:
+            if listed >= ALERT_DIGEST_MAX_LINES:
+                break
+            lines.append(f"- {alert['file_path']} ({alert['created_at'].strftime('%H:%M:%S')})")
+            listed += 1
+
+    if listed < len(user_alerts):
+        lines.append("")
+        lines.append(f"... 외 {len(user_alerts) - listed}건")
+
+    return subject, "\n".join(lines)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def start_alert_dispatcher(db_manager):
+    """
+    알림 디스패처 스레드 시작 (워커 프로세스마다 한 번)
+
+    :param db_manager: 풀 연결을 사용하는 DatabaseManager
+    """
+
+    global _dispatcher
+    if not smtp_configured():
+        print("⚠️ SMTP 설정이 없어 알림 디스패처를 시작하지 않습니다. 알림은 발송 대기 상태로 남습니다.")
+        return
+
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher(db_manager)
+            _dispatcher.start()
@@ -1,5 +1,5 @@
 # alerts.py
-import smtplib, os
+import smtplib, os, time
 from email.message import EmailMessage
 from dotenv import  load_dotenv
 
@@ -9,6 +9,22 @@ SMTP_SERVER = os.getenv("SMTP_SERVER")
 SMTP_PORT = int(os.getenv("SMTP_PORT"))
 SMTP_SEND_EMAIL = os.getenv("SMTP_SEND_EMAIL")
 SMTP_SEND_PASSWORD = os.getenv("SMTP_SEND_PASSWORD")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))         # SMTP 연결/응답 타임아웃 (초)
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))  # 이 시간 동안 사용하지 않은 연결은 종료 (초)
+
+
+def smtp_configured():
+    """ SMTP 설정값이 모두 있는지 확인 """
+    return all([SMTP_SERVER, SMTP_PORT, SMTP_SEND_EMAIL, SMTP_SEND_PASSWORD])
+
+
+def _build_message(recipient_email, subject, body):
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = SMTP_SEND_EMAIL
+    message["To"] = recipient_email
+    message.set_content(body)
+    return message
 
 # --- 이메일 알림 전송 ---
 def send_notification_email(recipient_email, subject, body):
@@ -23,7 +39,7 @@ def send_notification_email(recipient_email, subject, body):
     """
 
     # 설정 값들이 제대로 로드되었는지 확인
-    if not all([SMTP_SERVER, SMTP_PORT, SMTP_SEND_EMAIL, SMTP_SEND_PASSWORD]):
+    if not smtp_configured():
         print("이메일 발송 실패: SMTP 설정값이 .env 파일에 제대로 설정되지 않았습니다.")
         print(f"   - SERVER: {'설정됨' if SMTP_SERVER else '누락'}")
         print(f"   - PORT: {'설정됨' if SMTP_PORT else '누락 또는 오류'}")
@@ -32,14 +48,74 @@ def send_notification_email(recipient_email, subject, body):
         return False
 
     # EmailMessage 객체 생성
-    message = EmailMessage()
-    message["Subject"] = subject
-    message["From"] = SMTP_SEND_EMAIL
-    message["To"] = recipient_email
-    message.set_content(body)
+    message = _build_message(recipient_email, subject, body)
 
     with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
         server.starttls()
         server.login(SMTP_SEND_EMAIL, SMTP_SEND_PASSWORD)
         server.send_message(message)
-        return None
\ No newline at end of file
+        return None
+
+
+# --- 연결을 재사용하는 이메일 발송기 ---
+class SMTPMailer:
+    """
+    인증된 SMTP 연결 하나를 유지하며 여러 이메일을 발송
+        - 연결이 끊겼으면 한 번 재연결 후 재시도
+        - 오래 사용하지 않은 연결은 close_if_idle()로 정리
+        - 한 스레드(알림 디스패처)에서만 사용
+    """
+
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        try:
+            server.starttls()
+            server.login(SMTP_SEND_EMAIL, SMTP_SEND_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def send(self, recipient_email, subject, body):
+        """
+        이메일 발송
+
+        :param recipient_email: 받는 사람의 이메일 주소
+        :param subject: 이메일 제목
+        :param body: 이메일 본문
+
+        :raises: smtplib.SMTPException, OSError: 발송 실패
+        """
+
+        message = _build_message(recipient_email, subject, body)
+
+        for attempt in range(2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                self._server.send_message(message)
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, OSError):
+                # 서버가 유휴 연결을 끊은 경우 -> 재연결 후 한 번 더 시도
+                self.close()
+                if attempt == 1:
+                    raise
+
+    def close_if_idle(self):
+        """ 유휴 시간이 지난 연결 종료 """
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+            self.close()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
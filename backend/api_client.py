@@ -1,6 +1,11 @@
 import configparser, requests, os, keyring, sys
+import base64, io, random, tempfile, threading, time, uuid
 import traceback
-from datetime import datetime
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from compression_utils import SNIFF_SIZE, SPOOL_MAX_MEMORY, choose_encoding, compress_to_spool
+from delta_utils import DELTA_MIN_SIZE, compute_delta, unpack_signatures
 
 # --- 추가: 간단한 파일 로거 ---
 def get_base_dir():
@@ -33,6 +38,231 @@ API_BASE_URL = "https://fim-backend-buhbaactf2cgeugd.japaneast-01.azurewebsites.
 API_TOKEN = None
 HEADERS = {}
 
+# --- HTTP 세션 / 타임아웃 / 재시도 설정 ---
+CONNECT_TIMEOUT = float(os.getenv("FIM_CONNECT_TIMEOUT", "5"))         # TCP/TLS 연결 타임아웃 (초)
+READ_TIMEOUT = float(os.getenv("FIM_READ_TIMEOUT", "30"))               # 일반 API 응답 대기 타임아웃 (초)
+UPLOAD_READ_TIMEOUT = float(os.getenv("FIM_UPLOAD_READ_TIMEOUT", "300")) # 백업 업로드 응답 대기 타임아웃 (초)
+POOL_MAXSIZE = 10                   # 호스트당 유지할 keep-alive 연결 수
+MAX_RETRIES = 3                     # 요청 1건당 최대 재시도 횟수
+RETRY_BACKOFF_BASE = 0.5            # 지수 백오프 기본 대기 시간 (초)
+RETRY_BACKOFF_MAX = 8.0             # 백오프 최대 대기 시간 (초)
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+UPLOAD_READ_BLOCK_SIZE = 64 * 1024  # 스트리밍 업로드 시 한 번에 읽을 크기 (바이트)
+
+DELTA_MAX_RATIO = 0.5               # 델타가 파일 크기의 이 비율보다 크면 전체 업로드
+
+# --- 해시 보고 배치 설정 ---
+REPORT_BATCH_SIZE = 200             # /api/report_hashes 요청 1건에 담을 최대 보고 수 (서버 상한 500)
+REPORT_BATCH_WINDOW = 2.0           # 첫 보고 후 배치를 전송하기까지 모으는 시간 (초)
+
+
+class RetryBudget:
+    """
+    프로세스 전역 재시도 예산
+        - 요청마다 retry_ratio 만큼 토큰을 적립하고, 재시도할 때마다 토큰 1개를 사용
+        - 서버 장애 시 모든 요청이 재시도를 반복하며 부하를 키우는 것을 막음
+    """
+
+    def __init__(self, retry_ratio=0.2, initial_tokens=10.0, max_tokens=50.0):
+        self.retry_ratio = retry_ratio
+        self.max_tokens = max_tokens
+        self._tokens = initial_tokens
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        """ 새 요청 1건에 대한 토큰 적립 """
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.retry_ratio)
+
+    def try_acquire(self):
+        """
+        재시도 1회에 필요한 토큰 사용
+
+        :return: 재시도 가능 여부 (True or False)
+        """
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+_retry_budget = RetryBudget()
+_session = None
+_session_lock = threading.Lock()
+_server_upload_encodings = []   # 서버가 Accept-Encoding 응답 헤더로 알린 업로드 압축 방식
+
+
+def get_session():
+    """
+    연결 풀(keep-alive)을 사용하는 공용 requests 세션 반환
+        - 최초 호출 시 한 번만 생성되며, 이후 모든 API 호출이 TCP/TLS 연결을 재사용
+
+    :return: requests.Session
+    """
+
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # 재시도는 _send_request에서 예산과 함께 직접 처리하므로 어댑터 재시도는 끔
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _is_connect_failure(error):
+    """ 요청이 서버에 도달하기 전에 실패했는지 확인 (연결 타임아웃, 연결 거부, DNS 실패) """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+def _record_upload_encodings(response):
+    """ 응답의 Accept-Encoding 헤더(RFC 7694)로 서버가 받을 수 있는 업로드 압축 방식을 기록 """
+    global _server_upload_encodings
+    accept_encoding = response.headers.get("Accept-Encoding")
+    if accept_encoding is not None:
+        _server_upload_encodings = [enc.strip().lower() for enc in accept_encoding.split(",") if enc.strip()]
+
+
+def _send_request(method, url, idempotent=False, timeout=None, **kwargs):
+    """
+    공용 세션으로 HTTP 요청 전송 (타임아웃 + 재시도)
+        - 멱등 요청: 연결 오류, 타임아웃, 502/503/504 응답 시 지수 백오프로 재시도
+        - 비멱등 요청: 서버에 도달하지 못한 연결 실패일 때만 재시도
+        - 모든 재시도는 전역 재시도 예산 안에서만 허용
+
+    :param method: HTTP 메서드
+    :param url: 요청 URL
+    :param idempotent: 멱등 요청 여부
+    :param timeout: (연결, 읽기) 타임아웃 튜플 (None이면 기본값)
+    :param kwargs: requests.Session.request에 전달할 인자
+
+    :return: requests.Response
+
+    :raises: requests.exceptions.RequestException: 재시도 후에도 실패한 경우
+    """
+
+    session = get_session()
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    _retry_budget.record_request()
+
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            _record_upload_encodings(response)
+            if not (idempotent and response.status_code in RETRYABLE_STATUS_CODES):
+                return response
+            if attempt >= MAX_RETRIES or not _retry_budget.try_acquire():
+                return response
+            reason = f"HTTP {response.status_code}"
+            response.close()
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            retryable = idempotent or _is_connect_failure(e)
+            if not retryable or attempt >= MAX_RETRIES or not _retry_budget.try_acquire():
+                raise
+            reason = type(e).__name__
+
+        delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+        attempt += 1
+        print(f"[API_CLIENT WARNING] {method} {url} 실패 ({reason}). {delay:.1f}초 후 재시도 ({attempt}/{MAX_RETRIES})")
+        time.sleep(delay)
+
+        # 스트리밍 본문은 처음부터 다시 읽도록 되감기
+        body = kwargs.get("data")
+        if isinstance(body, MultipartFileStream):
+            body.rewind()
+
+
+class MultipartFileStream:
+    """
+    multipart/form-data 본문을 파일에서 조금씩 읽어 전송하는 file-like 객체
+        - 파일 내용을 메모리에 올리지 않고 (폼 필드 + 파일 파트 + 종료 경계)를 순서대로 읽음
+        - __len__으로 전체 길이를 알려 Content-Length 헤더로 전송 (chunked 인코딩 사용 안 함)
+    """
+
+    def __init__(self, fields, file_field, filename, file_obj, file_size, mimetype="application/octet-stream"):
+        """
+        :param fields: 일반 폼 필드 딕셔너리
+        :param file_field: 파일 파트의 필드 이름
+        :param filename: 파일 파트에 기록할 파일 이름
+        :param file_obj: 읽을 파일 객체 (seek 지원 필요)
+        :param file_size: 전송할 파일 크기 (바이트)
+        :param mimetype: 파일 파트의 MIME 타입
+        """
+
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+
+        head = io.BytesIO()
+        for name, value in fields.items():
+            head.write(f"--{self.boundary}\r\n".encode())
+            head.write(f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode())
+            head.write(f"{value}\r\n".encode("utf-8"))
+        safe_filename = filename.replace('"', "%22").replace("\r", "").replace("\n", "")
+        head.write(f"--{self.boundary}\r\n".encode())
+        head.write(f'Content-Disposition: form-data; name="{file_field}"; filename="{safe_filename}"\r\n'.encode("utf-8"))
+        head.write(f"Content-Type: {mimetype}\r\n\r\n".encode())
+
+        self._head = head.getvalue()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._file_obj = file_obj
+        self._file_start = file_obj.tell()
+        self._file_size = file_size
+        self._length = len(self._head) + file_size + len(self._tail)
+        self.rewind()
+
+    def __len__(self):
+        return self._length
+
+    def rewind(self):
+        """ 본문을 처음부터 다시 읽도록 위치 초기화 (재시도용) """
+        self._file_obj.seek(self._file_start)
+        self._position = 0
+
+    def read(self, size=-1):
+        """
+        본문의 다음 부분 읽기
+
+        :param size: 읽을 최대 바이트 수 (음수면 UPLOAD_READ_BLOCK_SIZE)
+
+        :return: bytes (끝에 도달하면 b"")
+        """
+
+        if size is None or size < 0:
+            size = UPLOAD_READ_BLOCK_SIZE
+
+        chunks = []
+        head_end = len(self._head)
+        file_end = head_end + self._file_size
+
+        while size > 0 and self._position < self._length:
+            if self._position < head_end:
+                chunk = self._head[self._position:self._position + size]
+            elif self._position < file_end:
+                chunk = self._file_obj.read(min(size, file_end - self._position))
+                if not chunk:
+                    # 업로드 도중 파일이 줄어들었으면 Content-Length를 맞출 수 없으므로 중단
+                    raise IOError("업로드 중 파일 크기가 변경되었습니다.")
+            else:
+                tail_offset = self._position - file_end
+                chunk = self._tail[tail_offset:tail_offset + size]
+
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+
+        return b"".join(chunks)
+
 def get_token_from_keyring():
     """
     keyring에서 API 토큰을 가져오기
@@ -116,9 +346,26 @@ def initialize_api_credentials():
     else:
         print("[API_CLIENT WARNING] API 토큰이 설정되지 않았습니다. 서버 인증이 필요한 API 호출은 실패합니다.")
 
+_file_list_cache = {"etag": None, "files": None}  # 마지막으로 받은 파일 목록과 ETag
+
+def _touch_cached_files(file_paths):
+    """
+    보고에 성공한 파일의 캐시된 updated_at을 현재 시각으로 갱신
+        - 서버는 updated_at만 바뀌는 보고로는 목록 버전(ETag)을 올리지 않으므로 304 응답 후에도 검사 주기가 맞도록 함
+    """
+
+    files = _file_list_cache["files"]
+    if not files or not file_paths:
+        return
+    now_str = datetime.now(timezone.utc).isoformat()
+    for file_info in files:
+        if file_info.get("file_path") in file_paths:
+            file_info["updated_at"] = now_str
+
 def fetch_file_list():
     """
     서버에서 검사 대상 파일 목록 받아오기
+        - 이전 응답의 ETag를 If-None-Match로 보내고, 304면 캐시된 목록 사용
 
     :return: JSON or None
     """
@@ -127,10 +374,20 @@ def fetch_file_list():
         print(f"[API_CLIENT ERROR] API 토큰이 없어 파일 목록을 요청할 수 없습니다.")
         return None
 
+    headers = dict(HEADERS)
+    if _file_list_cache["etag"] and _file_list_cache["files"] is not None:
+        headers["If-None-Match"] = _file_list_cache["etag"]
+
     try:
-        response = requests.get(f"{API_BASE_URL}/api/files", headers=HEADERS)
+        response = _send_request("GET", f"{API_BASE_URL}/api/files", idempotent=True, headers=headers)
+        if response.status_code == 304:
+            return list(_file_list_cache["files"])
+
         response.raise_for_status()
-        return response.json()
+        files = response.json()
+        _file_list_cache["etag"] = response.headers.get("ETag")
+        _file_list_cache["files"] = files
+        return list(files)
     except requests.exceptions.RequestException as e:
         print(f"[API_CLIENT ERROR] 파일 목록 요청 실패: {e}")
         return None
@@ -160,7 +417,8 @@ def report_hash(file_path, new_hash, detection_source="unknown"):
     }
     try:
         # 3. 서버에 POST 요청 전송
-        response = requests.post( # routes/files.py의 report_hash 호출
+        response = _send_request( # routes/files.py의 report_hash 호출
+            "POST",
             f"{API_BASE_URL}/api/report_hash",
             json=data,
             headers=HEADERS # 인증 헤더 포함
@@ -170,6 +428,8 @@ def report_hash(file_path, new_hash, detection_source="unknown"):
 
         # 5. 성공 로그 출력 및 결과 반환
         print(f"[API_CLIENT SUCCESS] 해시 보고 성공 ({file_path}, source: {detection_source})")
+        if response.status_code == 200:
+            _touch_cached_files({file_path})
         return response.status_code == 200
 
     # 6. 요청 실패 시 에러 로그 출력
@@ -194,6 +454,150 @@ def report_hash(file_path, new_hash, detection_source="unknown"):
 
     return False
 
+class HashReportBatcher:
+    """
+    해시 보고를 짧은 시간 동안 모아 /api/report_hashes로 일괄 전송
+        - batch_size 만큼 쌓이거나 window 초가 지나면 자동 전송
+        - 보고마다 on_result(file_path, new_hash, success) 콜백으로 결과 전달
+    """
+
+    def __init__(self, batch_size=REPORT_BATCH_SIZE, window=REPORT_BATCH_WINDOW):
+        self.batch_size = batch_size
+        self.window = window
+        self._pending = []                      # (report, on_result) 목록
+        self._lock = threading.Lock()           # _pending / _timer 보호
+        self._flush_lock = threading.Lock()     # 동시에 하나의 flush만 실행
+        self._timer = None
+        self._batch_endpoint_available = True   # 구버전 서버면 개별 보고로 대체
+
+    def add(self, file_path, new_hash, detection_source="unknown", on_result=None):
+        """
+        보고를 대기열에 추가
+
+        :param file_path: 파일의 상대 경로
+        :param new_hash: 새 해시값
+        :param detection_source: 변경 감지 유형
+        :param on_result: 전송 결과 콜백 (file_path, new_hash, success)
+        """
+
+        report = {
+            "file_path": file_path,
+            "new_hash": new_hash,
+            "detection_source": detection_source,
+            "detected_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        with self._lock:
+            self._pending.append((report, on_result))
+            is_full = len(self._pending) >= self.batch_size
+            if not is_full and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if is_full:
+            self.flush()
+
+    def flush(self):
+        """ 대기 중인 보고를 모두 전송 """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            for start in range(0, len(pending), self.batch_size):
+                self._send_batch(pending[start:start + self.batch_size])
+
+    def _send_batch(self, batch):
+        """
+        보고 묶음 1개를 서버에 전송하고 콜백 호출
+
+        :param batch: (report, on_result) 리스트
+        """
+
+        if not batch:
+            return
+
+        if not API_TOKEN:
+            print(f"[API_CLIENT ERROR] API 토큰이 없어 해시 {len(batch)}건을 보고할 수 없습니다.")
+            self._notify(batch, set())
+            return
+
+        if not self._batch_endpoint_available:
+            self._send_individually(batch)
+            return
+
+        try:
+            response = _send_request(
+                "POST",
+                f"{API_BASE_URL}/api/report_hashes",
+                json={"reports": [report for report, _ in batch]},
+                headers=HEADERS
+            )
+            if response.status_code == 404:
+                print("[API_CLIENT WARNING] 서버가 일괄 보고를 지원하지 않습니다. 개별 보고로 전환합니다.")
+                self._batch_endpoint_available = False
+                self._send_individually(batch)
+                return
+
+            response.raise_for_status()
+            results = response.json().get("results", [])
+            succeeded = {r.get("file_path") for r in results if r.get("status") == "success"}
+            print(f"[API_CLIENT SUCCESS] 해시 일괄 보고 완료 ({len(succeeded)}/{len(batch)}건 성공)")
+            _touch_cached_files(succeeded)
+            self._notify(batch, succeeded)
+
+        except requests.exceptions.HTTPError as e:
+            print(f"[API_CLIENT ERROR] HTTP 오류로 해시 일괄 보고 실패 ({len(batch)}건): {e.response.status_code}")
+            print(f"  ㄴ 서버 응답: {e.response.text}")
+            self._notify(batch, set())
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"[API_CLIENT ERROR] 해시 일괄 보고 실패 ({len(batch)}건): {e}")
+            self._notify(batch, set())
+
+    def _send_individually(self, batch):
+        """ 일괄 보고를 지원하지 않는 서버에 보고를 하나씩 전송 """
+        succeeded = set()
+        for report, _ in batch:
+            if report_hash(report["file_path"], report["new_hash"], report["detection_source"]):
+                succeeded.add(report["file_path"])
+        self._notify(batch, succeeded)
+
+    @staticmethod
+    def _notify(batch, succeeded_paths):
+        """ 보고별 결과 콜백 호출 """
+        for report, on_result in batch:
+            if on_result is None:
+                continue
+            try:
+                on_result(report["file_path"], report["new_hash"], report["file_path"] in succeeded_paths)
+            except Exception as e:
+                print(f"[API_CLIENT ERROR] 보고 결과 콜백 처리 중 오류 ({report['file_path']}): {e}")
+
+
+_report_batcher = HashReportBatcher()
+
+
+def queue_hash_report(file_path, new_hash, detection_source="unknown", on_result=None):
+    """
+    해시 보고를 배치 대기열에 추가 (REPORT_BATCH_WINDOW 안에 모인 보고를 한 번에 전송)
+
+    :param file_path: 파일의 상대 경로
+    :param new_hash: 새 해시값
+    :param detection_source: 변경 감지 유형
+    :param on_result: 전송 결과 콜백 (file_path, new_hash, success)
+    """
+
+    _report_batcher.add(file_path, new_hash, detection_source, on_result)
+
+
+def flush_hash_reports():
+    """ 배치 대기열에 남은 해시 보고를 즉시 전송 """
+    _report_batcher.flush()
+
 def register_new_file_on_server(relative_path, initial_hash, file_content_bytes=None, detection_source="unknown"):
     """
     서버에 새 파일 정보 등록
@@ -240,7 +644,7 @@ def report_file_deleted_on_server(relative_path, detection_source="unknown"):
     try:
         # 4. 서버에 POST 요청 전송
         print(f"[API_CLIENT INFO] 파일 삭제 보고 시도: {relative_path} to {target_url}")
-        response = requests.post(target_url, json=data, headers=HEADERS)
+        response = _send_request("POST", target_url, json=data, headers=HEADERS)
 
         # 5. HTTP 오류 발생 시 예외 처리
         response.raise_for_status()
@@ -271,14 +675,149 @@ def report_file_deleted_on_server(relative_path, detection_source="unknown"):
 
     return False
 
-def request_gdrive_backup(relative_path, file_content_bytes, file_hash, is_modified=False, change_time=None):
+def _request_backup_reuse(relative_path, file_hash, is_modified, change_time_str):
+    """
+    파일 내용 없이 해시만 보내 서버의 기존 백업을 재사용하도록 요청
+
+    :return: True (재사용 성공), False (실패), None (서버에 내용이 없어 업로드 필요)
+    """
+
+    data_payload = {
+        "relative_path": relative_path,
+        "is_modified": "true" if is_modified else "false",
+        "file_hash": file_hash,
+        "reuse_existing": "true",
+    }
+    if change_time_str:
+        data_payload["change_time"] = change_time_str
+
+    try:
+        response = _send_request("POST", f"{API_BASE_URL}/api/gdrive/backup_file", data=data_payload, headers=HEADERS)
+        if response.status_code == 409:
+            return None
+        response.raise_for_status()
+        if response.json().get("status") == "success":
+            print(f"[API_CLIENT SUCCESS] 기존 백업 재사용 (업로드 생략): {relative_path} (hash: {file_hash})")
+            return True
+        return False
+
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"[API_CLIENT ERROR] 기존 백업 재사용 요청 실패 ({relative_path}): {e}")
+        return False
+
+def _post_streamed_form(url, fields, file_obj, file_size, filename):
+    """
+    폼 필드와 파일을 multipart/form-data로 스트리밍 전송 (서버가 지원하면 압축)
+
+    :param url: 요청 URL
+    :param fields: 폼 필드 딕셔너리
+    :param file_obj: 전송할 파일 객체 (처음 위치)
+    :param file_size: 전송할 크기 (바이트)
+    :param filename: 파일 파트에 기록할 이름
+
+    :return: requests.Response
+    """
+
+    fields = dict(fields)
+    sample = file_obj.read(SNIFF_SIZE)
+    file_obj.seek(0)
+    content_encoding = choose_encoding(sample, file_size, _server_upload_encodings)
+
+    upload_obj, upload_size = file_obj, file_size
+    if content_encoding:
+        upload_obj, upload_size = compress_to_spool(file_obj, content_encoding)
+        fields["content_encoding"] = content_encoding
+        print(f"  ㄴ {content_encoding} 압축 적용: {file_size} -> {upload_size} bytes")
+
+    with upload_obj:
+        body = MultipartFileStream(fields, "file_content", filename, upload_obj, upload_size)
+        return _send_request(
+            "POST", url,
+            timeout=(CONNECT_TIMEOUT, UPLOAD_READ_TIMEOUT),
+            data=body,
+            headers={**HEADERS, "Content-Type": body.content_type}
+        )
+
+def _request_delta_backup(relative_path, file_path, file_hash, is_modified, change_time_str):
+    """
+    이전 백업 대비 변경된 블록(델타)만 전송하여 백업 요청 (rsync 방식)
+
+    :return: True (성공), False (실패), None (델타를 쓸 수 없어 전체 업로드 필요)
+    """
+
+    file_size = os.path.getsize(file_path)
+    if file_size < DELTA_MIN_SIZE:
+        return None
+
+    try:
+        # 1. 서버에서 이전 백업의 블록 시그니처 조회
+        response = _send_request(
+            "GET", f"{API_BASE_URL}/api/files/delta_base",
+            idempotent=True,
+            params={"relative_path": relative_path},
+            headers=HEADERS
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        base = response.json()
+        signatures = unpack_signatures(base64.b64decode(base["signatures"]))
+
+        # 2. 롤링 체크섬으로 델타 계산 (임시 파일에 기록)
+        with open(file_path, "rb") as f, tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as delta:
+            delta_size = compute_delta(f, base["block_size"], signatures, base["file_size"] or 0, delta)
+            if delta_size > file_size * DELTA_MAX_RATIO:
+                print(f"  ㄴ 델타 효과가 작아 전체 업로드: {relative_path} (delta {delta_size} / {file_size} bytes)")
+                return None
+            delta.seek(0)
+
+            # 3. 델타 전송
+            fields = {
+                "relative_path": relative_path,
+                "is_modified": "true" if is_modified else "false",
+                "file_hash": file_hash,
+                "base_backup_id": base["backup_id"],
+            }
+            if change_time_str:
+                fields["change_time"] = change_time_str
+
+            print(f"[API_CLIENT INFO] 델타 백업 요청 시도: {relative_path} (delta {delta_size} / {file_size} bytes)")
+            response = _post_streamed_form(
+                f"{API_BASE_URL}/api/gdrive/backup_delta", fields, delta, delta_size,
+                os.path.basename(relative_path) + ".delta"
+            )
+
+        if response.status_code == 409:
+            print(f"  ㄴ 서버가 델타를 적용할 수 없어 전체 업로드: {relative_path}")
+            return None
+        response.raise_for_status()
+
+        response_json = response.json()
+        if response.status_code == 202:
+            print(f"[API_CLIENT SUCCESS] 델타 백업 작업 등록: {relative_path} (job {response_json.get('job_id')})")
+            return True
+        if response_json.get("status") == "success":
+            print(f"[API_CLIENT SUCCESS] 델타 백업 성공: {relative_path}. Drive ID: {response_json.get('drive_file_id')}")
+            return True
+
+        print(f"[API_CLIENT ERROR] 델타 백업 실패 (서버 응답): {response_json.get('message', response_json.get('error'))}")
+        return False
+
+    except (requests.exceptions.RequestException, ValueError, KeyError, OSError) as e:
+        print(f"[API_CLIENT WARNING] 델타 백업 실패, 전체 업로드로 진행 ({relative_path}): {e}")
+        return None
+
+def request_gdrive_backup(relative_path, file_source, file_hash, is_modified=False, change_time=None):
     """
     서버에 Google Drive 백업을 요청
-        - 파일 내용을 multipart/form-data 형식으로 전송
+        - 파일 내용을 multipart/form-data 형식으로 스트리밍 전송 (파일 전체를 메모리에 올리지 않음)
+        - 서버가 지원하면 압축 효과가 있는 파일은 zstd/gzip으로 압축하여 전송
+        - 먼저 파일 내용 없이 해시만 보내 서버의 기존 백업 재사용을 요청 (내용이 없으면 409 -> 업로드 진행)
+        - 수정된 큰 파일은 이전 백업 대비 변경된 블록(델타)만 전송
         - 서버는 해당 파일을 Google Drive에 업로드하고 DB에 기록
 
     :param relative_path: 파일의 상대 경로
-    :param file_content_bytes: 파일 내용 (바이트)
+    :param file_source: 업로드할 파일의 절대 경로 또는 파일 내용 (바이트)
     :param file_hash: 파일의 해시값
     :param is_modified: 파일의 수정 여부 (True or False)
     :param change_time: 파일의 변경 시간
@@ -290,15 +829,7 @@ def request_gdrive_backup(relative_path, file_content_bytes, file_hash, is_modif
     if not API_TOKEN and not HEADERS.get("Authorization"):
         print(f"[API_CLIENT WARNING] API 토큰이 설정되지 않았습니다. Google Drive 백업은 서버 세션에 의존할 수 있습니다.")
 
-    # 2. 파일과 데이터 페이로드 구성 (multipart/form-data 형식)
-    files_payload = {
-        'file_content': (
-            os.path.basename(relative_path),        # 파일 이름
-            file_content_bytes,                     # 파일 내용
-            'application/octet-stream'              # MIME 타입
-        )
-    }
-
+    # 2. 폼 데이터 구성
     data_payload = {
         "relative_path": relative_path,                     # 파일 경로
         "is_modified": "true" if is_modified else "false",  # 수정 여부
@@ -312,19 +843,44 @@ def request_gdrive_backup(relative_path, file_content_bytes, file_hash, is_modif
             change_time_str = change_time
         data_payload["change_time"] = change_time_str
 
-    # 3. 요청 URL 구성
+    # 3. 업로드 없이 기존 백업 재사용 요청 (서버에 같은 내용이 없으면 None -> 업로드 진행)
+    reuse_result = _request_backup_reuse(relative_path, file_hash, is_modified, data_payload.get("change_time"))
+    if reuse_result is not None:
+        return reuse_result
+
+    # 4. 수정된 파일이면 이전 백업 대비 델타만 전송 시도
+    if is_modified and not isinstance(file_source, (bytes, bytearray)):
+        delta_result = _request_delta_backup(relative_path, file_source, file_hash, is_modified, data_payload.get("change_time"))
+        if delta_result is not None:
+            return delta_result
+
+    # 5. 요청 URL 구성
     endpoint_path = "/api/gdrive/backup_file"
     target_url = f"{API_BASE_URL}{endpoint_path}"
 
     try:
-        # 4. 서버에 POST 요청 전송
-        print(f"[API_CLIENT INFO] Google Drive 백업 요청 시도: {relative_path} (hash: {file_hash}) to {target_url}")
-        response = requests.post(target_url, files=files_payload, data=data_payload, headers=HEADERS)
-        # 5. HTTP 오류 발생 시 예외 처리
+        # 6. 파일 열기 (경로면 파일에서 직접 스트리밍, 바이트면 메모리 버퍼 사용)
+        if isinstance(file_source, (bytes, bytearray)):
+            file_obj = io.BytesIO(file_source)
+            file_size = len(file_source)
+        else:
+            file_obj = open(file_source, "rb")
+            file_size = os.fstat(file_obj.fileno()).st_size
+
+        # 7. 서버에 POST 요청 전송 (서버가 지원하고 압축 효과가 있으면 압축)
+        with file_obj:
+            print(f"[API_CLIENT INFO] Google Drive 백업 요청 시도: {relative_path} ({file_size} bytes, hash: {file_hash}) to {target_url}")
+            response = _post_streamed_form(target_url, data_payload, file_obj, file_size, os.path.basename(relative_path))
+
+        # 8. HTTP 오류 발생 시 예외 처리
         response.raise_for_status()
 
-        # 6. 응답 JSON 파싱 및 성공 여부 확인
+        # 9. 응답 JSON 파싱 및 성공 여부 확인 (202: 서버가 백업 작업으로 등록, 업로드는 서버에서 비동기 진행)
         response_json = response.json()
+        if response.status_code == 202:
+            print(f"[API_CLIENT SUCCESS] Google Drive 백업 작업 등록: {relative_path} "
+                  f"(job {response_json.get('job_id')}, 상태: {response_json.get('status_url')})")
+            return True
         if response_json.get("status") == "success":
             print(f"[API_CLIENT SUCCESS] Google Drive 백업 요청 성공: {relative_path}. "
                   f"Drive ID: {response_json.get('drive_file_id')}, "
@@ -335,17 +891,17 @@ def request_gdrive_backup(relative_path, file_content_bytes, file_hash, is_modif
             print(f"[API_CLIENT ERROR] Google Drive 백업 요청 실패 (서버 응답): {error_msg}")
             return False
 
-    # 7. 예외 처리: HTTP 오류
+    # 10. 예외 처리: HTTP 오류
     except requests.exceptions.HTTPError as http_err:
         print(f"[API_CLIENT ERROR] Google Drive 백업 요청 실패 (HTTP Error {http_err.response.status_code}): {relative_path}")
         return False
 
-    # 8. 예외 처리: 일반 요청 오류
+    # 11. 예외 처리: 일반 요청 오류
     except requests.exceptions.RequestException as req_err:
         print(f"[API_CLIENT ERROR] Google Drive 백업 요청 실패 ({relative_path}): {req_err}")
         return False
 
-    # 9. 예외 처리: 기타 오류
+    # 12. 예외 처리: 기타 오류
     except Exception as e:
         print(f"[API_CLIENT ERROR] Google Drive 백업 요청 중 예외 발생 ({relative_path}): {e}")
         return False
\ No newline at end of file
@@ -1,22 +1,31 @@
 import configparser
+import hashlib
 import io
 import os
 import secrets
+import tempfile
 import zipfile
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from drive_utils import get_google_drive_service_for_user
+from drive_utils import invalidate_drive_service
 from flask import send_file, redirect, url_for, session, jsonify, request
 from flask_dance.consumer import oauth_authorized
-from googleapiclient.http import MediaIoBaseUpload
 from auth import token_required
+from alert_dispatcher import start_alert_dispatcher
+from backup_jobs import enqueue_backup, start_backup_workers
+import blob_cache
 from connection import google_bp
-from database import get_or_create_user, DatabaseManager, save_or_update_google_tokens, NotFoundError, DatabaseError
+from database import get_or_create_user, DatabaseManager, save_or_update_google_tokens, NotFoundError, DatabaseError, release_connection, get_pool
+from database import get_google_tokens_by_user_id
+from db.migrate import EXPECTED_SCHEMA_VERSION, apply_migrations, check_schema_version
 from db.api_token_manager import get_token_by_user_id, save_token_to_db
+from db.query_stats import query_stats
 from routes.files import files_bp, init_files_bp
 from routes.protected import protected_bp
 from flask_cors import CORS
 from core.app_instance import app
+from compression_utils import SUPPORTED_ENCODINGS, SPOOL_MAX_MEMORY, decode_and_hash
+from delta_utils import apply_delta
 import config
 
 load_dotenv()
@@ -34,6 +43,13 @@ CORS(
     expose_headers=["Content-Disposition"]
 )
 
+@app.after_request
+def advertise_upload_encodings(response):
+    """ API 응답에 서버가 받을 수 있는 업로드 압축 방식을 Accept-Encoding 헤더로 알림 (RFC 7694) """
+    if request.path.startswith("/api/"):
+        response.headers["Accept-Encoding"] = ", ".join(SUPPORTED_ENCODINGS)
+    return response
+
 # OAUTHLIB_INSECURE_TRANSPORT 설정
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
@@ -41,12 +57,28 @@ os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 def generate_api_token():
     return secrets.token_hex(32)
 
+# --- DB 스키마 버전 확인 ---
+try:
+    with get_pool().connection() as schema_conn:
+        schema_ok, schema_version = check_schema_version(schema_conn)
+        if not schema_ok and config.DB_AUTO_MIGRATE:
+            apply_migrations(schema_conn)
+            schema_ok, schema_version = check_schema_version(schema_conn)
+
+    if schema_ok:
+        print(f"✅ DB 스키마 버전 확인 (버전 {schema_version})")
+    else:
+        print(f"❌ DB 스키마 버전 불일치: 현재 {schema_version}, 필요 {EXPECTED_SCHEMA_VERSION}. "
+              f"'python -m db.migrate'로 마이그레이션을 적용하세요.")
+
+except Exception as schema_err:
+    print(f"❌ DB 스키마 버전 확인 오류: {schema_err}")
+
 # --- DatabaseManager 인스턴스 생성 및 file_bp 초기화 ---
 db_manager = None # 초기값을 None으로 설정
 try:
-    # database.py의 정적 메서드를 사용하여 DB 연결 및 DatabaseManager 인스턴스 생성
-    db_conn = DatabaseManager.connect()
-    db_manager = DatabaseManager(db_conn)
+    # 고정 연결 없이 생성 -> 요청마다 연결 풀에서 연결을 빌려 사용
+    db_manager = DatabaseManager()
     print("✅ DatabaseManager 인스턴스 생성 성공")
 
 except Exception as db_init_err:
@@ -56,79 +88,18 @@ if db_manager:
     # 생성된 DatabaseManager 인스턴스를 files 블루프린트에 전달
     init_files_bp(db_manager)
     print(" files_bp 초기화 성공")
+    # 이메일 알림은 요청과 분리하여 백그라운드에서 발송
+    start_alert_dispatcher(db_manager)
+    # Google Drive 업로드는 요청과 분리하여 백그라운드 워커에서 수행
+    start_backup_workers(db_manager)
 else:
     print("❌ db_manager가 없어 files_bp 초기화 실패. /api/files 등 관련 엔드포인트가 작동하지 않습니다.")
 
-def get_or_create_drive_folder_id(service, folder_name="FIM_Backup"):
-    """
-
-    :param service: 구글 드라이브 서비스
-    :param folder_name: 디렉토리 이름
-
-    :return:
-    """
-
-    query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
-    response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-    folders = response.get('files', [])
-    if folders:
-        return folders[0]['id']
-    else:
-        file_metadata = {
-            'name': folder_name,
-            'mimeType': 'application/vnd.google-apps.folder'
-        }
-        folder = service.files().create(body=file_metadata, fields='id').execute()
-        return folder.get('id')
-
-def upload_file_to_google_drive(service, drive_folder_id, client_relative_path, file_content_bytes, is_modified=False,  change_time=None):
-    """
-    구글 드라이브에 파일 업로드
+@app.teardown_appcontext
+def return_db_connection(exception=None):
+    """ 요청이 끝나면 요청 중 빌린 DB 연결을 풀에 반환 """
+    release_connection()
 
-    :param service: 구글 드라이브 서비스
-    :param drive_folder_id:
-    :param client_relative_path:
-    :param file_content_bytes:
-    :param is_modified:
-    :param change_time:
-
-    :return:
-    """
-
-    original_filename = os.path.basename(client_relative_path)
-    base_name, ext = os.path.splitext(original_filename)
-
-    if is_modified:
-        if change_time:
-            # 문자열이면 datetime 변환 시도
-            if isinstance(change_time, str):
-                try:
-                    change_dt = datetime.strptime(change_time, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    change_dt = datetime.now()
-            else:
-                change_dt = change_time
-        else:
-            change_dt = datetime.now()
-
-        if change_dt.tzinfo is None:
-            change_dt = change_dt.replace(tzinfo=KST)
-        change_dt = change_dt.astimezone(KST)
-
-        timestamp = change_dt.strftime("_%Y%m%d_%H%M%S")
-        drive_filename = f"{base_name}{timestamp}{ext}"
-    else:
-        drive_filename = original_filename
-
-    file_metadata = {
-        'name': drive_filename,
-        'parents': [drive_folder_id]
-    }
-    media = MediaIoBaseUpload(io.BytesIO(file_content_bytes), mimetype='application/octet-stream')
-
-    created_file = service.files().create(body=file_metadata, media_body=media, fields='id, name, webViewLink').execute()
-    print(f"File uploaded to Google Drive: ID '{created_file.get('id')}', Name: '{created_file.get('name')}', Link: {created_file.get('webViewLink')}")
-    return created_file
 
 # --- Routes ---
 @app.route("/")
@@ -213,6 +184,146 @@ def download_client(user_id):
     zip_buffer.seek(0)
     return send_file(zip_buffer, as_attachment=True, download_name="file_monitor.zip", mimetype="application/zip")
 
+def parse_change_time(change_time_str):
+    """
+    클라이언트가 보낸 변경 시간 문자열을 datetime으로 변환
+
+    :param change_time_str: ISO 형식 문자열 (없거나 잘못되면 현재 시간)
+
+    :return: datetime
+    """
+
+    if change_time_str:
+        try:
+            return datetime.fromisoformat(change_time_str)
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc)  # fallback
+
+def backup_from_existing_blob(user_id, relative_path, file_hash, change_time):
+    """
+    업로드 없이 사용자의 기존 백업(동일 해시)을 재사용하여 백업 기록 생성
+        - 내용 변경 없는 재저장, 되돌린 수정 등은 파일 내용을 다시 받지 않음
+
+    :param user_id: 사용자 ID
+    :param relative_path: 파일의 상대 경로
+    :param file_hash: 파일의 해시값
+    :param change_time: 파일의 변경 시간
+
+    :return: 백업 성공 여부 JSON (기존 백업이 없으면 409 content_required)
+    """
+
+    existing_backup = db_manager.find_backup_by_hash(user_id, file_hash)
+    if not existing_backup:
+        return jsonify({"status": "content_required", "error": "No existing backup with this hash"}), 409
+
+    try:
+        report_result = db_manager.handle_file_report(
+            user_id=user_id,
+            file_path=relative_path,
+            new_hash=file_hash,
+            detection_source="gdrive_backup_trigger",
+            use_buffer=False,  # 버퍼의 변경없음 응답으로 실제 수정의 백업을 건너뛰지 않도록 항상 DB에서 판정
+        )
+    except DatabaseError as e:
+        return jsonify({"error": str(e)}), 500
+
+    if report_result.get("status") != "success":
+        error_message = report_result.get("message", "Failed to update file report in DB")
+        return jsonify({"error": error_message}), report_result.get("status_code", 500)
+
+    # 파일이 변경되지 않았으면 백업 생략
+    message_from_db = report_result.get("message", "")
+    if "unchanged" in message_from_db:
+        return jsonify({"status": "success", "message": message_from_db}), 200
+
+    original_file_id = report_result.get("file_id")
+    if not original_file_id:
+        print(f"Failed to get file ID from DB report: {report_result}")
+        return jsonify({"error": "Failed to get file ID from DB report"}), 500
+
+    backup_record_id = db_manager.save_backup_entry(
+        file_id=original_file_id,
+        backup_path=existing_backup["backup_path"],
+        backup_hash=file_hash,
+        created_at=change_time,
+        file_size=existing_backup.get("file_size"),
+        block_size=existing_backup.get("block_size"),
+        block_signatures=existing_backup.get("block_signatures"),
+    )
+    if not backup_record_id:
+        return jsonify({"error": "Failed to save backup record"}), 500
+
+    print(f"Reused existing backup '{existing_backup['backup_path']}' for '{relative_path}' (hash {file_hash})")
+    return jsonify({
+        "status": "success",
+        "message": f"File '{os.path.basename(relative_path)}' backed up by reusing existing content.",
+        "drive_file_id": existing_backup["backup_path"],
+        "reused": True,
+    }), 200
+
+def store_verified_backup(user_id, relative_path, file_stream, file_hash, file_size, is_modified, change_time):
+    """
+    해시 검증이 끝난 파일 스트림을 DB에 보고하고 Google Drive 백업 작업으로 등록
+        - Drive 업로드는 backup_jobs 워커가 수행하므로 요청은 스풀 저장까지만 기다림
+        - 진행 상황은 GET /api/backup_jobs/<job_id>로 확인
+
+    :param user_id: 사용자 ID
+    :param relative_path: 파일의 상대 경로
+    :param file_stream: 원본 파일 내용 스트림 (seek 가능)
+    :param file_hash: 검증된 파일 해시값
+    :param file_size: 파일 크기 (바이트)
+    :param is_modified: 파일의 수정 여부
+    :param change_time: 파일의 변경 시간
+
+    :return: 작업 등록 결과 (Flask 응답, 등록 시 202)
+    """
+
+    # Drive 연동 여부만 확인 (토큰 갱신/폴더 조회 등 Drive 요청은 워커에서 수행)
+    # 사용자 행은 있어도 토큰이 비어 있을 수 있으므로 drive_utils와 같이 액세스 토큰까지 확인
+    user_google_tokens = get_google_tokens_by_user_id(user_id)
+    if not user_google_tokens or not user_google_tokens.get("google_access_token"):
+        return jsonify({"error": "Google Drive service not available"}), 500
+
+    try:
+        # 1. 스풀 저장 -> 파일 정보 등록/업데이트 + 백업 작업 등록 (하나의 트랜잭션)
+        file_stream.seek(0)
+        report_result_dict = enqueue_backup(db_manager, user_id, relative_path, file_stream,
+                                            file_hash, file_size, is_modified, change_time)
+
+    except DatabaseError as e:
+        print(f"❌ Failed to queue backup for '{relative_path}': {e}")
+        return jsonify({"status": "error", "message": "Failed to queue backup job."}), 500
+
+    except OSError as e:
+        print(f"❌ Failed to spool backup content for '{relative_path}': {e}")
+        return jsonify({"status": "error", "message": "Failed to queue backup job."}), 500
+
+    if report_result_dict.get("status") != "success":
+        error_message = report_result_dict.get("message", "Failed to update file report in DB")
+        return jsonify({"error": error_message}), report_result_dict.get("status_code", 500)
+
+    # 파일이 변경되지 않았으면 백업 생략
+    message_from_db = report_result_dict.get("message", "")
+    if "unchanged" in message_from_db:
+        return jsonify({"status": "success", "message": message_from_db}), 200
+
+    job_id = report_result_dict.get("job_id")
+    if not report_result_dict.get("file_id") or not job_id:
+        print(f"Failed to get file ID / job ID from DB report: {report_result_dict}")
+        return jsonify({"error": "Failed to get file ID from DB report"}), 500
+
+    print(f"Backup job {job_id} queued for '{relative_path}' ({file_size} bytes)")
+    status_url = f"/api/backup_jobs/{job_id}"
+    response = jsonify({
+        "status": "accepted",
+        "message": f"Backup of '{os.path.basename(relative_path)}' queued.",
+        "job_id": job_id,
+        "status_url": status_url,
+    })
+    response.headers["Location"] = status_url
+    return response, 202
+
 @app.route("/api/gdrive/backup_file", methods=["POST"])
 @token_required
 def api_gdrive_backup_file(user_id):
@@ -224,30 +335,20 @@ def api_gdrive_backup_file(user_id):
     :return: 백업 성공 여부 및 관련 정보
     """
 
-    if 'file_content' not in request.files: # 요청에 파일이 포함되어 있는지 확인
+    # 내용 없이 해시만 보낸 경우: 서버에 이미 있는 동일 내용 백업을 재사용
+    reuse_existing = request.form.get("reuse_existing", "false").lower() == "true"
+
+    if 'file_content' not in request.files and not reuse_existing: # 요청에 파일이 포함되어 있는지 확인
         return jsonify({"error": "No file uploaded"}), 400
 
     # 파일 객체와 기타 폼 데이터 추출
-    file_storage = request.files['file_content']
-    file_content_bytes = file_storage.read()
+    # (업로드 파일은 Werkzeug가 임시 파일로 스풀링하므로 read() 없이 스트림 그대로 사용)
+    file_storage = request.files.get('file_content')
+    file_stream = file_storage.stream if file_storage else None
     relative_path = request.form.get('relative_path')
     is_modified = request.form.get('is_modified', "false").lower() == "true"
     client_provided_hash = request.form.get('file_hash')
-
-    change_time_str = request.form.get("change_time")
-    change_time = None
-
-    if change_time_str:
-        try:
-            change_time = datetime.fromisoformat(change_time_str)
-        except ValueError:
-            # 혹시 ISO 형식이면 파싱 시도
-            try:
-                change_time = datetime.fromisoformat(change_time_str)
-            except ValueError:
-                change_time = datetime.now(timezone.utc)
-    else:
-        change_time = datetime.now(timezone.utc)  # fallback
+    change_time = parse_change_time(request.form.get("change_time"))
 
     # 필수 값 누락시 에러 반환
     if not relative_path:
@@ -256,109 +357,125 @@ def api_gdrive_backup_file(user_id):
     if not client_provided_hash:
         return jsonify({"error": "No file hash provided"}), 400
 
-    # user_id를 사용하여 해당 사용자를 위한 Drive 서비스 가져오기
-    drive_service = get_google_drive_service_for_user(user_id)
-    if not drive_service:
-        return jsonify({"error": "Google Drive service not available"}), 500
+    if file_stream is None:
+        return backup_from_existing_blob(user_id, relative_path, client_provided_hash.lower(), change_time)
+
+    # 압축된 업로드는 해제하면서, 압축되지 않은 업로드는 그대로 읽으며 SHA-256 검증
+    content_encoding = request.form.get("content_encoding")
+    if content_encoding and content_encoding not in SUPPORTED_ENCODINGS:
+        return jsonify({"error": f"Unsupported content encoding: {content_encoding}"}), 415
 
     try:
-        # 1. 파일 정보 등록/업데이트
-        report_result_tuple = db_manager.handle_file_report(
-            user_id=user_id,
-            file_path=relative_path,
-            new_hash=client_provided_hash,
-            detection_source="gdrive_backup_trigger"
-        )
+        file_stream, actual_hash, file_size = decode_and_hash(file_stream, content_encoding)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        report_result_dict, status_code = {}, 500
-
-        if isinstance(report_result_tuple, tuple) and len(report_result_tuple) == 2:
-            report_result_dict, status_code = report_result_tuple
-
-        elif isinstance(report_result_tuple, dict):
-            report_result_dict = report_result_tuple
-            status_code = report_result_dict.get("status_code", 500)
-
-        if report_result_dict.get("status") != "success":
-            error_message = report_result_dict.get("message", "Failed to update file report in DB")
-            return jsonify({"error": error_message}), status_code
-
-        # 파일이 변경되지 않았으면 백업 생략
-        message_from_db = report_result_dict.get("message", "")
-        if "unchanged" in message_from_db:
-            return jsonify({"status": "success", "message": message_from_db}), 200
-
-        # 파일 ID 가져오기
-        original_file_id = report_result_dict.get("file_id")
-        if not original_file_id:
-            print(f"Failed to get file ID from DB report: {report_result_dict}")
-            return jsonify({"error": "Failed to get file ID from DB report"}), 500
-
-        # 2. Google Drive 서비스 가져오기 및 업로드
-        print(f"Uploading file '{os.path.basename(relative_path)}' to Google Drive...")
-
-        drive_service = get_google_drive_service_for_user(user_id)
-        if not drive_service:
-            print("Google Drive service not available")
-            return jsonify({"error": "Google Drive service not available"}), 500
-        print("Google Drive service available")
-
-        # 백업 폴더 생성 또는 가져오기
-        fim_folder_id = get_or_create_drive_folder_id(drive_service, "FIM_Backup")
-        if not fim_folder_id:
-            print("Failed to create FIM_Backup folder")
-            return jsonify({"error": "Failed to create FIM_Backup folder"}), 500
-        print("FIM_Backup folder created")
-
-        # 파일 업로드 수행
-        print(f"Uploading file '{os.path.basename(relative_path)}' to Google Drive...")
-        uploaded_file_info = upload_file_to_google_drive(
-            drive_service,
-            fim_folder_id,
-            relative_path,
-            file_content_bytes,
-            is_modified,
-            change_time,
-        )
+    if actual_hash != client_provided_hash.lower():
+        print(f"Hash mismatch for '{relative_path}': reported {client_provided_hash}, received {actual_hash}")
+        return jsonify({"error": "Uploaded content does not match the reported file hash"}), 400
 
-        # 업로드 성공시 DB에 백업 기록 저장
-        if uploaded_file_info and uploaded_file_info.get("id"):
-            print(f"File '{os.path.basename(relative_path)}' uploaded to Google Drive as '{uploaded_file_info.get('name')}'")
-            backup_record_id = db_manager.save_backup_entry(
-                file_id = original_file_id,
-                backup_path = uploaded_file_info.get("id"),
-                backup_hash = client_provided_hash,
-                created_at = change_time,
-            )
-
-            # DB에 백업 정보 저장 성공 시
-            if backup_record_id:
-                response_data = {
-                    "status": "success",
-                    "message": f"File '{os.path.basename(relative_path)}' backed up to Google Drive as '{uploaded_file_info.get('name')}' and DB record created.",
-                    "drive_file_id": uploaded_file_info.get("id"),
-                    "drive_file_link": uploaded_file_info.get("webViewLink"),
-                }
-                print(f"Backup record for file '{os.path.basename(relative_path)}' created in DB")
-                return jsonify(response_data), 200
-
-            # 업로드 성공했지만 DB 저장은 실패 시
-            else:
-                print(f"Failed to save backup record for file '{os.path.basename(relative_path)}' to DB")
-                return jsonify({
-                    "status": "success_drive_only",
-                    "message": f"File '{os.path.basename(relative_path)}' backed up to Google Drive as '{uploaded_file_info.get('name')}', but DB record failed.",
-                }), 207
-        else:
-            return jsonify({"status": "error", "message": "Failed to upload file to Google Drive."}), 500
+    return store_verified_backup(user_id, relative_path, file_stream, actual_hash, file_size, is_modified, change_time)
 
-    except Exception as e:
-        print(f"Error uploading file to Google Drive: {e}")
-        import traceback
-        traceback.print_exc()
-        if hasattr(e, "content"):
-            print(f"Error details: {e.content}")
-        return jsonify({"status": "error", "message": "Failed to upload file to Google Drive."}), 500
+@app.route("/api/gdrive/backup_delta", methods=["POST"])
+@token_required
+def api_gdrive_backup_delta(user_id):
+    """
+    델타 백업 API
+        - 클라이언트가 보낸 델타(이전 백업 대비 변경 블록)와 이전 백업으로 새 버전을 복원
+        - 복원 결과를 SHA-256으로 검증한 뒤 일반 백업과 동일하게 저장 (업로드는 backup_jobs 워커)
+        - 기준 백업은 로컬 백업 캐시(blob_cache)에 있을 때만 사용 (요청 처리 중 Drive 다운로드/토큰 갱신을 하지 않음)
+          캐시에 없으면 409 base_unavailable -> 클라이언트가 전체 업로드로 전환
+
+    :param user_id: 사용자 ID
+
+    :return: 백업 성공 여부 및 관련 정보
+    """
+
+    if 'file_content' not in request.files:
+        return jsonify({"error": "No delta uploaded"}), 400
+
+    relative_path = request.form.get('relative_path')
+    client_provided_hash = request.form.get('file_hash')
+    base_backup_id = request.form.get('base_backup_id', type=int)
+    is_modified = request.form.get('is_modified', "false").lower() == "true"
+    change_time = parse_change_time(request.form.get("change_time"))
+
+    if not relative_path or not client_provided_hash or not base_backup_id:
+        return jsonify({"error": "relative_path, file_hash and base_backup_id are required"}), 400
+
+    content_encoding = request.form.get("content_encoding")
+    if content_encoding and content_encoding not in SUPPORTED_ENCODINGS:
+        return jsonify({"error": f"Unsupported content encoding: {content_encoding}"}), 415
+
+    # 1. 기준 백업 확인 (사용자 소유 여부 포함)
+    base_backup = db_manager.get_backup_details_by_id(user_id, base_backup_id)
+    if not base_backup:
+        return jsonify({"status": "base_unavailable", "error": "Base backup not found"}), 409
+
+    cached_base_path = blob_cache.get_cached_path(base_backup.get("backup_hash"))
+    if not cached_base_path:
+        return jsonify({"status": "base_unavailable", "error": "Base backup is not cached on this server"}), 409
+
+    try:
+        delta_stream, _, _ = decode_and_hash(request.files['file_content'].stream, content_encoding)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 2. 캐시된 기준 백업에 델타를 적용하여 새 버전 복원
+    with open(cached_base_path, "rb") as base_file:
+        restored = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        digest = hashlib.sha256()
+        try:
+            file_size = apply_delta(base_file, delta_stream, restored, digest)
+        except ValueError as e:
+            restored.close()
+            return jsonify({"error": f"Invalid delta: {e}"}), 400
+
+    # 3. 복원 결과 검증 후 일반 백업과 동일하게 저장
+    with restored:
+        if digest.hexdigest() != client_provided_hash.lower():
+            print(f"Delta restore hash mismatch for '{relative_path}' (base backup {base_backup_id})")
+            return jsonify({"status": "base_unavailable", "error": "Restored content does not match the reported file hash"}), 409
+
+        restored.seek(0)
+        print(f"Restored '{relative_path}' from backup {base_backup_id} + delta ({file_size} bytes)")
+        return store_verified_backup(user_id, relative_path, restored, digest.hexdigest(), file_size, is_modified, change_time)
+
+
+@app.route("/api/backup_jobs/<int:job_id>", methods=["GET"])
+@token_required
+def get_backup_job_status(user_id, job_id):
+    """
+    백업 작업 상태 조회
+
+    :param user_id: 사용자 ID
+    :param job_id: 작업 ID
+
+    :return: 작업 상태 (queued / running / succeeded / failed) 및 진행률
+    """
+
+    job = db_manager.get_backup_job(user_id, job_id)
+    if not job:
+        return jsonify({"error": "Backup job not found"}), 404
+
+    file_size = job["file_size"] or 0
+    return jsonify({
+        "job_id": job["id"],
+        "file_id": job["file_id"],
+        "file": job["relative_path"],
+        "hash": job["file_hash"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "bytes_uploaded": job["bytes_uploaded"],
+        "file_size": file_size,
+        "progress": round(job["bytes_uploaded"] * 100 / file_size, 1) if file_size else (100.0 if job["status"] == "succeeded" else 0.0),
+        "drive_file_id": job["drive_file_id"],
+        "backup_id": job["backup_id"],
+        "error": job["last_error"],
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat(),
+        "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+    }), 200
 
 
 @app.route("/api/files/<int:file_id>/rollback", methods=["POST"])
@@ -436,6 +553,7 @@ def google_logged_in(blueprint, token):
     expires_in = token.get("expires_in")
     expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in) if expires_in else None
     save_or_update_google_tokens(user_id, access_token, refresh_token, expires_at)
+    invalidate_drive_service(user_id)  # 이 워커의 캐시된 자격 증명 교체 (다른 워커는 DRIVE_SERVICE_CACHE_TTL 이후 반영)
 
     # API 토큰을 담아 프론트엔드로 리디렉션
     frontend_url = os.getenv('frontend_url', 'https://www.filemonitor.me')
@@ -466,6 +584,23 @@ def debug_config():
     except Exception as e:
         return {"error": str(e)}
 
+@app.route("/debug/db-stats")
+def debug_db_stats():
+    """
+    현재 워커 프로세스의 쿼리별 실행 통계 (누적 시간이 큰 순)
+        - DB_STATS_TOKEN이 설정된 경우에만 사용 가능 (X-Stats-Token 헤더로 인증)
+        - ?reset=1 이면 조회 후 통계 초기화
+    """
+
+    provided = request.headers.get("X-Stats-Token", "")
+    if not config.DB_STATS_TOKEN or not secrets.compare_digest(provided, config.DB_STATS_TOKEN):
+        return jsonify({"error": "Not found"}), 404
+
+    stats = query_stats.snapshot()
+    if request.args.get("reset") == "1":
+        query_stats.reset()
+    return jsonify({"pid": os.getpid(), "slow_query_ms": config.DB_SLOW_QUERY_MS, "queries": stats}), 200
+
 app.register_blueprint(protected_bp)
 app.register_blueprint(files_bp)
 
@@ -0,0 +1,227 @@
+# backup_jobs.py
+# Google Drive 백업 업로드를 요청 처리와 분리하여 백그라운드 워커에서 수행
+#   - 요청 처리: 검증한 파일 내용을 스풀 디렉토리에 먼저 저장한 뒤, 파일 보고와 backup_jobs 작업 등록을
+#     하나의 트랜잭션으로 반영 (202 응답, 어느 단계든 실패하면 보고도 반영되지 않아 클라이언트 재시도로 다시 백업)
+#   - 스풀 파일은 등록한 서버에만 있으므로 작업에 BACKUP_SPOOL_HOST를 기록하고, 워커는 같은 호스트의 작업만 처리
+#   - 워커: 작업을 가져가 블록 시그니처 계산 -> Drive 업로드 -> backups 기록, 끝나면 스풀 파일 삭제
+#   - 진행 상황(bytes_uploaded)은 청크마다 기록되어 GET /api/backup_jobs/<id>로 확인
+#   - 실패한 작업은 지수 백오프로 재시도하고, 최대 횟수를 넘으면 failed로 표시
+#   - Drive 업로드 세션 URI를 저장해 두어 재시도/워커 재시작 시 이미 전송한 부분은 다시 보내지 않음
+#   - 업로드가 끝난 스풀 파일은 삭제 전에 로컬 백업 캐시(blob_cache)에도 기록 (write-through)
+import os, shutil, socket, tempfile, threading, uuid
+import blob_cache
+from database import DatabaseError, release_connection
+from delta_utils import DELTA_MIN_SIZE, choose_block_size, compute_signatures
+from drive_utils import get_google_drive_service_for_user, upload_file_to_backup_folder
+
+# 스풀 파일은 업로드가 끝날 때까지 남아 있어야 하므로 기본값은 /tmp가 아닌 backend/backup_spool
+BACKUP_SPOOL_DIR = os.getenv("BACKUP_SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "backup_spool"))
+# 같은 스풀 디렉토리를 보는 서버끼리 같은 값 (여러 인스턴스가 공유 디렉토리를 쓰면 모두 같은 이름으로 설정)
+BACKUP_SPOOL_HOST = os.getenv("BACKUP_SPOOL_HOST") or socket.gethostname()
+BACKUP_WORKERS = int(os.getenv("BACKUP_WORKERS", "2"))                        # 워커 프로세스마다 업로드 스레드 수
+BACKUP_POLL_INTERVAL = float(os.getenv("BACKUP_POLL_INTERVAL", "5"))          # 다른 프로세스가 등록한 작업을 확인하는 간격 (초)
+BACKUP_LEASE_SECONDS = int(os.getenv("BACKUP_LEASE_SECONDS", "300"))          # 진행 기록 없이 이 시간이 지나면 다른 워커가 다시 가져감
+BACKUP_MAX_ATTEMPTS = int(os.getenv("BACKUP_MAX_ATTEMPTS", "5"))
+BACKUP_RETRY_BASE = 30                                                        # 재시도 대기 기본값 (초)
+BACKUP_RETRY_MAX = 3600
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+_wakeup = threading.Event()  # 같은 프로세스에서 작업이 등록되면 대기 중인 워커를 깨움
+
+
+def spool_backup_content(file_stream):
+    """
+    검증된 파일 내용을 스풀 디렉토리에 저장 (임시 이름으로 기록 후 이름 변경)
+
+    :param file_stream: 파일 내용 스트림 (처음 위치)
+
+    :return: 스풀 파일 경로
+    """
+
+    os.makedirs(BACKUP_SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(BACKUP_SPOOL_DIR, f"{uuid.uuid4().hex}.blob")
+    fd, partial_path = tempfile.mkstemp(dir=BACKUP_SPOOL_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(file_stream, out, _COPY_BUFFER_SIZE)
+        os.replace(partial_path, spool_path)
+    except BaseException:
+        _remove_spool(partial_path)
+        raise
+    return spool_path
+
+
+def enqueue_backup(db_manager, user_id, relative_path, file_stream, file_hash, file_size, is_modified, change_time):
+    """
+    파일 보고 + 백업 작업 등록 (스풀 저장 후 하나의 트랜잭션으로 반영)
+
+    :param db_manager: DatabaseManager
+    :param user_id: 사용자 ID
+    :param relative_path: 파일의 상대 경로
+    :param file_stream: 검증된 파일 내용 스트림
+    :param file_hash: 검증된 파일 해시값
+    :param file_size: 파일 크기 (바이트)
+    :param is_modified: 파일의 수정 여부
+    :param change_time: 파일의 변경 시간
+
+    :return: handle_file_report 결과 딕셔너리 (백업 작업을 등록했으면 "job_id" 포함, 변경없음이면 없음)
+
+    :raises: OSError: 스풀 저장 실패 시 (DB에는 아무것도 반영되지 않음)
+    :raises: DatabaseError: 보고/작업 등록 실패 시 (둘 다 반영되지 않고 스풀 파일은 삭제)
+    """
+
+    spool_path = spool_backup_content(file_stream)
+    try:
+        report_result = db_manager.handle_file_report(
+            user_id=user_id,
+            file_path=relative_path,
+            new_hash=file_hash,
+            detection_source="gdrive_backup_trigger",
+            use_buffer=False,  # 버퍼의 변경없음 응답으로 실제 수정의 백업을 건너뛰지 않도록 항상 DB에서 판정
+            backup_job={
+                "relative_path": relative_path,
+                "file_size": file_size,
+                "is_modified": is_modified,
+                "change_time": change_time,
+                "spool_path": spool_path,
+                "spool_host": BACKUP_SPOOL_HOST,
+            },
+        )
+    except BaseException:
+        _remove_spool(spool_path)
+        raise
+
+    if report_result.get("job_id") is None:
+        _remove_spool(spool_path)  # 변경없음 -> 백업 생략
+    else:
+        _wakeup.set()
+    return report_result
+
+
+def _remove_spool(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ 스풀 파일 삭제 실패 ({path}): {e}")
+
+
+class BackupWorker(threading.Thread):
+    def __init__(self, db_manager, index):
+        super().__init__(name=f"backup-worker-{index}", daemon=True)
+        self.db = db_manager
+
+    def run(self):
+        while True:
+            try:
+                job = self.db.claim_backup_job(BACKUP_LEASE_SECONDS, BACKUP_SPOOL_HOST)
+                if job is not None:
+                    self._process(job)
+                    continue
+            except Exception as e:
+                print(f"⚠️ 백업 작업 처리 오류: {e}")
+            finally:
+                release_connection()
+
+            _wakeup.wait(BACKUP_POLL_INTERVAL)
+            _wakeup.clear()
+
+    def _process(self, job):
+        """ 백업 작업 1건 수행 후 결과 기록 """
+        relative_path = job["relative_path"]
+
+        try:
+            with open(job["spool_path"], "rb") as file_stream:
+                drive_file_id, backup_id = self._upload(job, file_stream)
+
+        except FileNotFoundError:
+            # 다른 서버에서 등록되었거나 이미 정리된 작업
+            print(f"❌ 백업 작업 {job['id']} 스풀 파일 없음: {relative_path}")
+            self.db.finish_backup_job(job["id"], None, None, "spool file not found")
+            return
+
+        except Exception as e:
+            if job["attempts"] < BACKUP_MAX_ATTEMPTS:
+                delay = min(BACKUP_RETRY_MAX, BACKUP_RETRY_BASE * (2 ** (job["attempts"] - 1)))
+                print(f"⚠️ 백업 작업 {job['id']} 실패, {delay}초 후 재시도 ({relative_path}): {e}")
+                self.db.finish_backup_job(job["id"], None, None, str(e), delay)
+                return
+            print(f"❌ 백업 작업 {job['id']} 최종 실패 ({job['attempts']}회, {relative_path}): {e}")
+            self.db.finish_backup_job(job["id"], None, None, str(e))
+            _remove_spool(job["spool_path"])
+            return
+
+        if backup_id:
+            print(f"✅ 백업 작업 {job['id']} 완료: {relative_path} -> Drive ID '{drive_file_id}'")
+            self.db.finish_backup_job(job["id"], drive_file_id, backup_id)
+            blob_cache.put_file(job["file_hash"], job["spool_path"])
+        else:
+            # 업로드는 끝났으므로 재시도하지 않음 (다시 올리면 Drive에 중복 생성)
+            print(f"❌ 백업 작업 {job['id']}: Drive 업로드 후 DB 기록 실패 ({relative_path})")
+            self.db.finish_backup_job(job["id"], drive_file_id, None, "Failed to save backup record")
+        _remove_spool(job["spool_path"])
+
+    def _upload(self, job, file_stream):
+        """
+        블록 시그니처 계산 -> Drive 업로드 -> backups 기록
+
+        :return: (Drive 파일 ID, 백업 레코드 ID 또는 None)
+        """
+
+        # 1. 다음 델타 업로드의 기준이 될 블록 시그니처 계산
+        block_size, block_signatures = None, None
+        if job["file_size"] >= DELTA_MIN_SIZE:
+            block_size = choose_block_size(job["file_size"])
+            block_signatures = compute_signatures(file_stream, block_size)
+            file_stream.seek(0)
+
+        # 2. Drive 서비스 준비
+        drive_service = get_google_drive_service_for_user(job["user_id"])
+        if not drive_service:
+            raise RuntimeError("Google Drive service not available")
+
+        # 3. 사용자 백업 폴더에 업로드 (청크마다 진행 상황 기록 + 임대 연장, 이전 세션이 있으면 이어서)
+        def report_progress(bytes_uploaded):
+            try:
+                self.db.update_backup_job_progress(job["id"], bytes_uploaded, BACKUP_LEASE_SECONDS)
+            except DatabaseError as e:
+                print(f"⚠️ 백업 작업 {job['id']} 진행 상황 기록 실패: {e}")
+
+        def save_session(session_uri):
+            try:
+                self.db.save_backup_job_session(job["id"], session_uri)
+            except DatabaseError as e:
+                print(f"⚠️ 백업 작업 {job['id']} 업로드 세션 저장 실패: {e}")
+
+        if job["upload_session_uri"]:
+            print(f"백업 작업 {job['id']}: 이전 업로드 세션에서 이어서 전송 ({job['relative_path']})")
+        uploaded_file_info = upload_file_to_backup_folder(
+            drive_service, job["user_id"], job["relative_path"], file_stream,
+            job["is_modified"], job["change_time"], progress_callback=report_progress,
+            resume_uri=job["upload_session_uri"], session_callback=save_session,
+        )
+        drive_file_id = uploaded_file_info.get("id") if uploaded_file_info else None
+        if not drive_file_id:
+            raise RuntimeError("Failed to upload file to Google Drive")
+
+        # 4. DB에 백업 기록 저장
+        backup_id = self.db.save_backup_entry(
+            file_id=job["file_id"],
+            backup_path=drive_file_id,
+            backup_hash=job["file_hash"],
+            created_at=job["change_time"],
+            file_size=job["file_size"],
+            block_size=block_size,
+            block_signatures=block_signatures,
+        )
+        return drive_file_id, backup_id
+
+
+def start_backup_workers(db_manager, count=BACKUP_WORKERS):
+    """ 백업 업로드 워커 스레드 시작 (gunicorn 워커 프로세스마다 호출) """
+    os.makedirs(BACKUP_SPOOL_DIR, exist_ok=True)
+    workers = [BackupWorker(db_manager, index) for index in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
@@ -0,0 +1,286 @@
+# blob_cache.py
+# 최근 접근한 백업 내용을 서버 로컬 디스크에 보관하는 내용 주소(content-addressed) 캐시
+#   - 키는 backup_hash (SHA-256), 파일은 <BLOB_CACHE_DIR>/<해시 앞 2자리>/<해시>.blob
+#   - 새 백업은 업로드 워커가 스풀 파일을 그대로 기록 (write-through)
+#   - 캐시에 없으면 Drive에서 받은 내용을 전체 다운로드일 때만 기록 (해시 검증 후 반영)
+#   - 읽을 때 해시를 검증하고, 일치하지 않는 파일은 삭제 후 캐시 미스로 처리
+#     (검증 결과는 파일 크기/수정 시각과 함께 프로세스 안에 기억하여, 둘 다 그대로일 때만 다시 계산하지 않음)
+#   - 전체 크기가 BLOB_CACHE_MAX_BYTES를 넘으면 마지막 접근 시각(mtime)이 오래된 파일부터 삭제 (LRU)
+#     여러 gunicorn 워커가 같은 디렉토리를 공유하므로 접근 시각은 파일 mtime에 기록
+import hashlib, os, re, shutil, tempfile, threading, time
+
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fim_blob_cache"))
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 0이면 캐시 사용 안 함
+BLOB_CACHE_TOUCH_INTERVAL = 60                                                     # 접근 시각 갱신 최소 간격 (초)
+_READ_BUFFER_SIZE = 1024 * 1024
+_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+_lock = threading.Lock()
+_verified = {}         # 해시 -> 검증 당시 (크기, mtime_ns)
+_total_bytes = None    # 마지막 정리 이후 추정 전체 크기 (None이면 다음 기록 시 디렉토리 검사)
+
+
+def is_enabled():
+    return BLOB_CACHE_MAX_BYTES > 0
+
+
+def _blob_path(file_hash):
+    """ 해시값 -> 캐시 파일 경로 (형식이 잘못된 해시는 None) """
+    if not file_hash:
+        return None
+    file_hash = file_hash.lower()
+    if not _HASH_PATTERN.match(file_hash):
+        return None
+    return os.path.join(BLOB_CACHE_DIR, file_hash[:2], f"{file_hash}.blob")
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_READ_BUFFER_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _discard(file_hash, path):
+    with _lock:
+        _verified.pop(file_hash, None)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ 캐시 파일 삭제 실패 ({path}): {e}")
+
+
+def get_cached_path(file_hash):
+    """
+    캐시에 있는 백업 내용의 경로 조회 (해시 검증 + 접근 시각 갱신)
+
+    :param file_hash: 백업 해시값 (SHA-256)
+
+    :return: 검증된 캐시 파일 경로, 없거나 손상되었으면 None
+    """
+
+    if not is_enabled():
+        return None
+    path = _blob_path(file_hash)
+    if path is None:
+        return None
+    file_hash = file_hash.lower()
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        verified = _verified.get(file_hash)
+
+    # 이 프로세스에서 아직 검증하지 않았거나, 검증 당시와 크기/mtime이 하나라도 다르면 해시 재계산
+    # (같은 크기로 덮어쓰거나 다른 워커가 접근 시각을 갱신한 경우도 다시 검증)
+    if verified != signature:
+        try:
+            actual_hash = _hash_file(path)
+        except FileNotFoundError:
+            return None
+        if actual_hash != file_hash:
+            print(f"⚠️ 캐시 파일 손상 감지, 삭제: {file_hash}")
+            _discard(file_hash, path)
+            return None
+
+    # 접근 시각 갱신 후의 mtime을 기록해야 이 프로세스의 갱신 때문에 다시 검증하지 않음
+    if time.time() - stat.st_mtime >= BLOB_CACHE_TOUCH_INTERVAL:
+        try:
+            os.utime(path)
+            stat = os.stat(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            pass
+
+    with _lock:
+        _verified[file_hash] = signature
+    return path
+
+
+def contains(file_hash):
+    """ 캐시에 파일이 있는지만 확인 (해시 검증 없음, 실제로 읽을 때는 get_cached_path 사용) """
+    path = _blob_path(file_hash) if is_enabled() else None
+    return path is not None and os.path.exists(path)
+
+
+def _commit(file_hash, partial_path, size):
+    """ 임시 파일을 캐시 파일로 반영 후 필요하면 정리 """
+    global _total_bytes
+
+    path = _blob_path(file_hash)
+    os.replace(partial_path, path)
+    os.utime(path)  # 하드 링크는 원본의 mtime을 그대로 가지므로 기록 시각으로 갱신
+    stat = os.stat(path)
+    with _lock:
+        _verified[file_hash] = (stat.st_size, stat.st_mtime_ns)
+        if _total_bytes is not None:
+            _total_bytes += size
+        needs_eviction = _total_bytes is None or _total_bytes > BLOB_CACHE_MAX_BYTES
+    if needs_eviction:
+        evict()
+
+
+def put_file(file_hash, source_path):
+    """
+    검증이 끝난 로컬 파일을 캐시에 기록 (업로드 워커의 write-through)
+        - 같은 파일 시스템이면 하드 링크, 아니면 복사
+
+    :param file_hash: 파일 해시값 (SHA-256, 호출 측에서 이미 검증)
+    :param source_path: 원본 파일 경로 (스풀 파일)
+
+    :return: 기록 여부
+    """
+
+    if not is_enabled():
+        return False
+    path = _blob_path(file_hash)
+    if path is None:
+        return False
+    file_hash = file_hash.lower()
+
+    try:
+        if os.path.exists(path):
+            os.utime(path)
+            return True
+        size = os.path.getsize(source_path)
+        if size > BLOB_CACHE_MAX_BYTES:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            try:
+                os.link(source_path, partial_path)
+            except OSError:
+                shutil.copyfile(source_path, partial_path)
+            _commit(file_hash, partial_path, size)
+        except BaseException:
+            _remove_partial(partial_path)
+            raise
+        return True
+
+    except OSError as e:
+        print(f"⚠️ 백업 캐시 기록 실패 ({file_hash}): {e}")
+        return False
+
+
+class CacheWriter:
+    """
+    스트리밍으로 받은 내용을 캐시에 기록 (Drive 다운로드 중 tee)
+        - write()로 청크를 받고, commit() 시 해시가 일치할 때만 캐시에 반영
+        - 중간에 끊기거나 해시가 다르면 abort()로 임시 파일 삭제
+    """
+
+    def __init__(self, file_hash):
+        self.file_hash = file_hash.lower()
+        self.path = _blob_path(file_hash)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, self.partial_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.digest.update(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        """ :return: 캐시 반영 여부 """
+        self.file.close()
+        if self.digest.hexdigest() != self.file_hash:
+            print(f"⚠️ 다운로드 내용이 백업 해시와 다름, 캐시에 기록하지 않음: {self.file_hash}")
+            _remove_partial(self.partial_path)
+            return False
+        try:
+            _commit(self.file_hash, self.partial_path, self.size)
+            return True
+        except OSError as e:
+            print(f"⚠️ 백업 캐시 기록 실패 ({self.file_hash}): {e}")
+            _remove_partial(self.partial_path)
+            return False
+
+    def abort(self):
+        self.file.close()
+        _remove_partial(self.partial_path)
+
+
+def open_cache_writer(file_hash, expected_size=None):
+    """
+    Drive 다운로드 내용을 캐시에 기록할 CacheWriter 생성
+
+    :param file_hash: 백업 해시값 (SHA-256)
+    :param expected_size: 예상 크기 (바이트, 캐시 상한보다 크면 기록하지 않음)
+
+    :return: CacheWriter, 캐시를 사용하지 않거나 기록할 수 없으면 None
+    """
+
+    if not is_enabled() or _blob_path(file_hash) is None:
+        return None
+    if expected_size is not None and expected_size > BLOB_CACHE_MAX_BYTES:
+        return None
+    try:
+        return CacheWriter(file_hash)
+    except OSError as e:
+        print(f"⚠️ 백업 캐시 임시 파일 생성 실패: {e}")
+        return None
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ 캐시 임시 파일 삭제 실패 ({path}): {e}")
+
+
+def evict():
+    """
+    전체 크기가 상한을 넘으면 mtime이 오래된 캐시 파일부터 삭제 (LRU)
+
+    :return: 삭제한 파일 수
+    """
+
+    global _total_bytes
+
+    entries = []
+    total = 0
+    try:
+        with os.scandir(BLOB_CACHE_DIR) as buckets:
+            for bucket in buckets:
+                if not bucket.is_dir():
+                    continue
+                with os.scandir(bucket.path) as files:
+                    for entry in files:
+                        if not entry.name.endswith(".blob"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.name[:-5], entry.path))
+                        total += stat.st_size
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    if total > BLOB_CACHE_MAX_BYTES:
+        entries.sort()
+        for _, size, file_hash, path in entries:
+            if total <= BLOB_CACHE_MAX_BYTES:
+                break
+            _discard(file_hash, path)
+            total -= size
+            removed += 1
+        print(f"백업 캐시 정리: {removed}개 삭제, 현재 {total} bytes")
+
+    with _lock:
+        _total_bytes = total
+    return removed
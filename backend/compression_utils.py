@@ -0,0 +1,159 @@
+# compression_utils.py
+# 백업 업로드 압축/해제 유틸리티 (클라이언트 api_client와 서버 app.py가 함께 사용)
+import gzip, hashlib, tempfile, zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 지원하는 업로드 압축 방식 (선호 순서)
+SUPPORTED_ENCODINGS = ["zstd", "gzip"] if zstandard else ["gzip"]
+
+COMPRESSION_MIN_SIZE = 4 * 1024         # 이보다 작은 파일은 압축하지 않음 (바이트)
+SNIFF_SIZE = 64 * 1024                  # 압축 여부 판단에 사용할 앞부분 크기 (바이트)
+SNIFF_MIN_SAVING = 0.1                  # 샘플이 이 비율 이상 줄어들어야 압축
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024      # 이 크기를 넘으면 임시 파일을 디스크에 기록
+COPY_BLOCK_SIZE = 64 * 1024
+
+# 이미 압축된 형식의 시그니처 (zip/docx/xlsx, gzip, zstd, 7z, rar, bzip2, xz, png, jpeg, gif, ogg, flac, mp3)
+_COMPRESSED_SIGNATURES = (
+    b"PK\x03\x04", b"\x1f\x8b", b"\x28\xb5\x2f\xfd", b"7z\xbc\xaf\x27\x1c", b"Rar!",
+    b"BZh", b"\xfd7zXZ", b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"OggS", b"fLaC", b"ID3",
+)
+
+
+def is_already_compressed(sample):
+    """
+    파일 앞부분으로 이미 압축된 형식인지 확인
+
+    :param sample: 파일 앞부분 (bytes)
+
+    :return: True or False
+    """
+
+    if sample.startswith(_COMPRESSED_SIGNATURES):
+        return True
+    # MP4/MOV/HEIC 등 ISO BMFF 컨테이너 (4바이트 뒤에 'ftyp')
+    return sample[4:8] == b"ftyp"
+
+
+def choose_encoding(sample, file_size, accepted_encodings):
+    """
+    업로드에 사용할 압축 방식 결정
+        - 작은 파일, 이미 압축된 형식, 샘플 압축률이 낮은 파일은 압축하지 않음
+
+    :param sample: 파일 앞부분 (최대 SNIFF_SIZE 바이트)
+    :param file_size: 전체 파일 크기
+    :param accepted_encodings: 서버가 받을 수 있는 압축 방식 목록
+
+    :return: 압축 방식 이름 or None (압축하지 않음)
+    """
+
+    candidates = [enc for enc in SUPPORTED_ENCODINGS if enc in accepted_encodings]
+    if not candidates or file_size < COMPRESSION_MIN_SIZE or not sample:
+        return None
+
+    if is_already_compressed(sample):
+        return None
+
+    # 빠른 압축 레벨로 샘플을 압축해 보고 효과가 작으면 생략 (랜덤/암호화 데이터 등)
+    if len(zlib.compress(sample, 1)) > len(sample) * (1 - SNIFF_MIN_SAVING):
+        return None
+
+    return candidates[0]
+
+
+def compress_to_spool(file_obj, encoding):
+    """
+    파일 객체 내용을 압축하여 임시 파일에 기록
+
+    :param file_obj: 읽을 파일 객체 (현재 위치부터 끝까지 압축)
+    :param encoding: 압축 방식 ("zstd" or "gzip")
+
+    :return: (처음 위치로 되감긴 임시 파일, 압축된 크기)
+    """
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3)
+        compressor.copy_stream(file_obj, spool, read_size=COPY_BLOCK_SIZE, write_size=COPY_BLOCK_SIZE)
+    elif encoding == "gzip":
+        with gzip.GzipFile(fileobj=spool, mode="wb", compresslevel=6) as gz:
+            while True:
+                block = file_obj.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                gz.write(block)
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    size = spool.tell()
+    spool.seek(0)
+    return spool, size
+
+
+def _make_decompressor(encoding):
+    """ 압축 방식에 맞는 스트리밍 해제 객체 생성 """
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd is not supported on this server")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decode_and_hash(stream, encoding=None):
+    """
+    업로드 스트림을 (필요 시 압축 해제하며) 읽어 SHA-256을 계산
+
+        - encoding이 없으면 원본 스트림을 해시만 계산하고 되감아 그대로 반환
+        - encoding이 있으면 해제된 내용을 임시 파일에 기록하여 반환 (메모리 사용량 제한)
+
+    :param stream: 업로드 스트림 (seek 가능)
+    :param encoding: 압축 방식 (None이면 압축 안 됨)
+
+    :return: (처음 위치로 되감긴 원본 내용 스트림, SHA-256 hex, 원본 크기)
+
+    :raises: ValueError: 지원하지 않는 압축 방식이거나 압축 데이터가 손상된 경우
+    """
+
+    digest = hashlib.sha256()
+    size = 0
+
+    if not encoding:
+        while True:
+            block = stream.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+        stream.seek(0)
+        return stream, digest.hexdigest(), size
+
+    decompressor = _make_decompressor(encoding)
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        while True:
+            block = stream.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            data = decompressor.decompress(block)
+            if data:
+                digest.update(data)
+                spool.write(data)
+                size += len(data)
+        if encoding == "gzip":
+            data = decompressor.flush()
+            if data:
+                digest.update(data)
+                spool.write(data)
+                size += len(data)
+    except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+        spool.close()
+        raise ValueError(f"Corrupted {encoding} content: {e}")
+
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
@@ -12,12 +12,59 @@ DB_PARAMS = {
     "port": os.getenv("DB_PORT", "5432"),
 }
 
+# DB 연결 풀 설정 (gunicorn 워커 프로세스마다 별도의 풀)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))           # 연결 대기 최대 시간 (초)
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "600"))        # 유휴 연결 정리 기준 (초)
+
+# 쿼리 실행 설정 (db/query_stats.py)
+#   - DB_PREPARE_THRESHOLD: 같은 쿼리가 이 횟수만큼 실행되면 서버 측 prepared statement로 전환
+#     (none이면 사용 안 함, pgbouncer transaction 모드 등)
+_prepare_threshold = os.getenv("DB_PREPARE_THRESHOLD", "5").strip().lower()
+DB_PREPARE_THRESHOLD = None if _prepare_threshold in ("", "none", "off") else int(_prepare_threshold)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))  # 이 시간 이상 걸린 쿼리는 로그 출력 (0이면 끔)
+DB_STATS_TOKEN = os.getenv("DB_STATS_TOKEN")                     # 설정 시 /debug/db-stats 사용 가능 (X-Stats-Token 헤더)
+
+# 시작 시 스키마 버전이 낮으면 마이그레이션 자동 적용 여부 (기본: 확인만 하고 경고)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+
+# 변경없음(Unchanged) 보고 일괄 반영 설정 (워커 프로세스별 메모리 버퍼)
+HEARTBEAT_FLUSH_INTERVAL = float(os.getenv("HEARTBEAT_FLUSH_INTERVAL", "30"))       # 버퍼 반영 주기 (초, 0이면 버퍼 사용 안 함)
+HEARTBEAT_FLUSH_MAX_ROWS = int(os.getenv("HEARTBEAT_FLUSH_MAX_ROWS", "5000"))       # 이만큼 쌓이면 주기와 관계없이 반영
+HEARTBEAT_STATE_CACHE_SIZE = int(os.getenv("HEARTBEAT_STATE_CACHE_SIZE", "100000"))  # Unchanged 상태로 확인된 파일 캐시 크기
+
+# 파일 로그 보관/정리 설정 (db/maintenance.py)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "365"))                  # 기본 로그 보관 기간 (사용자별 설정이 없을 때)
+LOG_COMPACTION_MIN_AGE_DAYS = int(os.getenv("LOG_COMPACTION_MIN_AGE_DAYS", "30"))  # 이보다 오래된 로그만 압축
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv("LOG_PARTITION_MONTHS_AHEAD", "3"))     # 미리 만들어 둘 월별 파티션 수
+
+# API 토큰 인증 캐시 설정 (워커 프로세스별, LISTEN/NOTIFY로 무효화)
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))              # 유효 토큰 캐시 유지 시간 (초)
+TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", "30"))  # 잘못된 토큰 캐시 유지 시간 (초)
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+# 알림 이메일 요약(digest) 설정
+ALERT_DIGEST_WINDOW = float(os.getenv("ALERT_DIGEST_WINDOW", "60"))  # 사용자별로 알림을 모아 보내는 시간 (초, 0이면 요약 안 함)
+ALERT_IMMEDIATE_CHANGE_TYPES = {  # 요약하지 않고 즉시 발송할 변경 유형
+    t.strip() for t in os.getenv("ALERT_IMMEDIATE_CHANGE_TYPES", "Deleted").split(",") if t.strip()
+}
+
 FLASK_SECRET_KEY = os.getenv("FLASK_SECRET_KEY")
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://www.filemonitor.me')
 
+# Google Drive 업로드 청크 크기 (256KB의 배수여야 함)
+DRIVE_UPLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+DRIVE_UPLOAD_NUM_RETRIES = int(os.getenv("DRIVE_UPLOAD_NUM_RETRIES", "5"))  # 청크 전송 실패(5xx/429/연결 오류) 시 재시도 횟수
+
+# 사용자별 Google Drive 서비스/자격 증명 캐시 (drive_utils.py)
+DRIVE_SERVICE_CACHE_TTL = float(os.getenv("DRIVE_SERVICE_CACHE_TTL", "1800"))       # 사용자별 Drive 서비스 캐시 유지 시간 (초, 다른 워커의 토큰 변경 반영 주기)
+DRIVE_SERVICE_CACHE_SIZE = int(os.getenv("DRIVE_SERVICE_CACHE_SIZE", "1000"))
+DRIVE_TOKEN_REFRESH_MARGIN = float(os.getenv("DRIVE_TOKEN_REFRESH_MARGIN", "300"))  # 만료 이 시간 전에 백그라운드에서 토큰 갱신 (초)
+
 
 # DLL 경로를 실행 환경에 맞게 처리 (PyInstaller 대응)
 def resource_path(relative_path):
@@ -1,11 +1,22 @@
+import atexit
+import collections
 import collections.abc
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Tuple, Optional, Any, Union
 import os
+import sys
+import threading
 import psycopg
 from psycopg.rows import dict_row
-from alerts import send_notification_email
-from config import DB_PARAMS
+from psycopg_pool import ConnectionPool, PoolTimeout
+from db.query_stats import TimedCursor
+from config import DB_PARAMS, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE
+from config import ALERT_DIGEST_WINDOW, ALERT_IMMEDIATE_CHANGE_TYPES
+from config import DB_PREPARE_THRESHOLD
+from config import HEARTBEAT_FLUSH_INTERVAL, HEARTBEAT_FLUSH_MAX_ROWS, HEARTBEAT_STATE_CACHE_SIZE
+
+ALERT_CHANNEL = "alerts_pending"  # 새 알림 발송 대기 알림 채널 (alert_dispatcher가 수신)
+DRIVE_FOLDER_LOCK_CLASS = 0x46494D44  # 백업 폴더 생성 advisory lock 키 ('FIMD', 두 번째 키는 user_id)
 
 KST = timezone(timedelta(hours=9))
 
@@ -15,17 +26,236 @@ class DatabaseError(Exception):
 class NotFoundError(Exception):
     pass
 
+# =============== 연결 풀 ===============
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_local = threading.local()  # 스레드(요청)별로 빌린 연결
+
+
+def get_pool() -> ConnectionPool:
+    """
+    프로세스 공용 연결 풀 반환 (처음 호출 시 생성)
+        - gunicorn 워커가 fork된 뒤 각 워커에서 생성되도록 지연 생성
+        - 빌려줄 때 연결 상태를 확인하고, 끊어진 연결은 버리고 새로 연결
+        - 자주 실행되는 쿼리는 prepared statement로 전환되고, 실행 통계는 TimedCursor가 기록
+
+    :return: ConnectionPool
+    """
+
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    kwargs={**DB_PARAMS, "prepare_threshold": DB_PREPARE_THRESHOLD, "cursor_factory": TimedCursor},
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    check=ConnectionPool.check_connection,
+                    name=f"fim-{os.getpid()}",
+                    open=True,
+                )
+    return _pool
+
+
+def acquire_connection() -> psycopg.Connection:
+    """
+    현재 스레드(요청)에 할당된 연결 반환 (없으면 풀에서 빌림)
+
+    :return: psycopg.Connection
+
+    :raises: DatabaseError: 풀에서 제한 시간 안에 연결을 얻지 못한 경우
+    """
+
+    conn = getattr(_local, "conn", None)
+    if conn is not None and (conn.closed or conn.broken):
+        release_connection()
+        conn = None
+
+    if conn is None:
+        try:
+            conn = get_pool().getconn()
+        except PoolTimeout as e:
+            raise DatabaseError(f"Database connection is not available: {e}")
+        _local.conn = conn
+    return conn
+
+
+def _return_connection(conn: psycopg.Connection) -> None:
+    """
+    getconn()으로 빌린 연결을 풀에 반환
+        - 조회만 하고 끝난 트랜잭션 등 열린 트랜잭션은 반환 전에 직접 롤백 (풀의 롤백 경고 방지)
+        - 끊어진 연결은 롤백하지 않고 그대로 반환 (풀이 폐기)
+
+    :param conn: 반환할 연결
+    """
+
+    try:
+        if not conn.closed and not conn.broken \
+                and conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            conn.rollback()
+    except psycopg.Error as e:
+        print(f"연결 반환 전 롤백 오류: {e}")
+    get_pool().putconn(conn)
+
+
+def release_connection() -> None:
+    """
+    현재 스레드(요청)가 빌린 연결을 풀에 반환
+        - 요청 종료 시(teardown) 또는 백그라운드 작업 단위가 끝날 때 호출
+        - 커밋되지 않은 트랜잭션은 반환 전에 롤백 (_return_connection)
+    """
+
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        return
+    _local.conn = None
+    try:
+        _return_connection(conn)
+    except Exception as e:
+        print(f"연결 반환 오류: {e}")
+
+
+# =============== 변경없음 보고 버퍼 ===============
+
+class HeartbeatBuffer:
+    """
+    변경없음(Unchanged) 보고의 updated_at 갱신을 모아서 일괄 반영 (워커 프로세스별)
+        - 이미 Unchanged 상태이고 해시가 같다고 확인된 파일의 보고만 버퍼에 넣고 바로 응답
+        - 상태 캐시는 워커마다 따로 있어 다른 워커의 변경을 모르므로 힌트로만 사용
+          (버퍼에 넣기 전 DB 행을 읽어 확인, 쓰기와 행 잠금만 일괄 반영으로 미룸)
+        - 주기마다(또는 버퍼가 가득 차면) UPDATE ... FROM (VALUES ...) 한 번으로 반영
+        - 신규 등록/수정/상태 전이는 기존처럼 동기 처리
+    """
+
+    def __init__(self, flush_interval=HEARTBEAT_FLUSH_INTERVAL, max_rows=HEARTBEAT_FLUSH_MAX_ROWS,
+                 state_cache_size=HEARTBEAT_STATE_CACHE_SIZE):
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._state_cache_size = state_cache_size
+        self._lock = threading.Lock()
+        self._known = collections.OrderedDict()  # (user_id, file_path) -> (file_id, file_hash)
+        self._pending = {}                       # (user_id, file_path) -> (file_id, file_hash, 보고 시각, 감지 유형)
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_interval > 0
+
+    def remember(self, user_id: int, file_path: str, file_id: int, file_hash: str) -> None:
+        """ 동기 처리 결과 Unchanged 상태가 된 파일 기록 (다음 보고부터 버퍼 사용) """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._known[(user_id, file_path)] = (file_id, file_hash)
+            self._known.move_to_end((user_id, file_path))
+            while len(self._known) > self._state_cache_size:
+                self._known.popitem(last=False)
+
+    def forget(self, user_id: int, file_path: str) -> None:
+        """ 동기 처리할 파일은 캐시와 버퍼에서 제거 (이후 보고보다 먼저 반영되지 않도록) """
+        with self._lock:
+            self._known.pop((user_id, file_path), None)
+            self._pending.pop((user_id, file_path), None)
+
+    def forget_file(self, file_id: int) -> None:
+        """ 파일 ID로 캐시와 버퍼에서 제거 (상태 변경/롤백/모니터링 중단 등 경로를 모르는 경우) """
+        with self._lock:
+            for key in [k for k, (fid, _) in self._known.items() if fid == file_id]:
+                del self._known[key]
+            for key in [k for k, entry in self._pending.items() if entry[0] == file_id]:
+                del self._pending[key]
+
+    def add(self, user_id: int, file_path: str, file_id: int, file_hash: str,
+            event_time: datetime, detection_source: Optional[str]) -> None:
+        """ Unchanged 상태로 확인된 파일의 보고를 버퍼에 추가 (같은 파일은 마지막 보고만 유지) """
+        with self._lock:
+            self._pending[(user_id, file_path)] = (file_id, file_hash, event_time, detection_source)
+            full = len(self._pending) >= self.max_rows
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def lookup(self, user_id: int, file_path: str, file_hash: str) -> Optional[int]:
+        """
+        캐시된 상태와 해시가 같은지 확인 (다른 워커의 변경은 반영되지 않으므로 DB 확인 필요)
+
+        :return: Unchanged로 알려진 파일이면 파일 ID, 아니면 None
+        """
+
+        if not self.enabled:
+            return None
+        with self._lock:
+            known = self._known.get((user_id, file_path))
+            if known is None or known[1] != file_hash:
+                return None
+            self._known.move_to_end((user_id, file_path))
+        return known[0]
+
+    def take(self) -> Dict[Tuple[int, str], Tuple]:
+        """ 버퍼에 쌓인 보고를 모두 꺼냄 """
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
+
+    def requeue(self, batch: Dict[Tuple[int, str], Tuple]) -> None:
+        """ 반영에 실패한 보고를 다시 버퍼에 넣음 (그 사이 새로 들어온 보고가 우선) """
+        with self._lock:
+            for key, entry in batch.items():
+                self._pending.setdefault(key, entry)
+
+    def _ensure_flusher(self) -> None:
+        # gunicorn 워커가 fork된 뒤 워커마다 반영 스레드 시작
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="heartbeat-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_once)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush_once()
+
+    def _flush_once(self) -> None:
+        try:
+            DatabaseManager().flush_heartbeats()
+        except Exception as e:
+            print(f"⚠️ 변경없음 보고 일괄 반영 실패: {e}")
+        finally:
+            release_connection()
+
+
+_heartbeats = HeartbeatBuffer()
+
+
 # =============== 기본 연결 및 쿼리 실행 ===============
 
 class DatabaseManager:
-    def __init__(self, conn):
+    def __init__(self, conn: Optional[psycopg.Connection] = None):
         """
         DatabaseManager 초기화
 
-        :param conn: 데이터베이스 연결 객체
+        :param conn: 고정으로 사용할 데이터베이스 연결 객체 (None이면 요청마다 연결 풀에서 빌림)
         """
 
-        self.conn = conn
+        self._conn = conn
+
+    @property
+    def conn(self) -> psycopg.Connection:
+        """ 고정 연결이 있으면 그 연결, 없으면 현재 스레드(요청)에 할당된 풀 연결 """
+        if self._conn is not None:
+            return self._conn
+        return acquire_connection()
     
     @staticmethod
     def connect():
@@ -35,37 +265,46 @@ class DatabaseManager:
         :return: psycopg.Connection: 데이터베이스 연결 객체
         """
 
-        return psycopg.connect(**DB_PARAMS)
+        return psycopg.connect(**DB_PARAMS, prepare_threshold=DB_PREPARE_THRESHOLD, cursor_factory=TimedCursor)
     
     def execute_query(self, query: str, params: Optional[Tuple] = None, 
-                      fetch_all: bool = True, use_dict_row: bool = False) -> Union[List, Tuple, None]:
+                      fetch_all: bool = True, use_dict_row: bool = False,
+                      name: Optional[str] = None) -> Union[List, Tuple, None]:
         """
         SQL 쿼리 실행 및 결과 반환
+            - 첫 실행부터 prepared statement로 실행 (DB_PREPARE_THRESHOLD가 none이면 사용 안 함)
+            - 실행 시간/행 수는 쿼리 이름별로 query_stats에 기록
 
         :param query: 실행할 SQL 쿼리문
         :param params: 쿼리 파라미터
         :param fetch_all: 모든 결과를 가져올지 여부 (False -> 첫 번째 결과만 반환)
         :param use_dict_row: 결과를 딕셔너리 형태로 반환할지 여부
+        :param name: 통계용 쿼리 이름 (None이면 호출한 메서드 이름)
 
-        :return:쿼리 실행 결과
+        :return:쿼리 실행 결과 (결과 집합이 없는 쿼리 또는 오류 시 None)
 
         """
 
+        name = name or f"{__name__}.{sys._getframe(1).f_code.co_name}"
         try:
             with self.conn.cursor(row_factory=dict_row if use_dict_row else None) as cursor:
-                cursor.execute(query, params if params else ())
-                
-                # 쿼리가 SELECT가 아닌 경우 결과를 반환하지 않음
-                if not query.strip().upper().startswith(('SELECT', 'RETURNING')):
+                if isinstance(cursor, TimedCursor):
+                    cursor.stats_name = name
+                cursor.execute(query, params if params else (), prepare=True)
+
+                # 결과 집합이 없는 쿼리(INSERT/UPDATE 등, RETURNING 없음)는 결과를 반환하지 않음
+                if cursor.description is None:
                     return None
-                
+
                 if fetch_all:
                     return cursor.fetchall()
                 else:
                     return cursor.fetchone()
 
-        except Exception as e:
-            print(f"쿼리 실행 오류: {e}")
+        except psycopg.Error as e:
+            # 실패한 트랜잭션에 이후 쿼리가 막히지 않도록 롤백
+            self.conn.rollback()
+            print(f"❌ 쿼리 실행 오류 ({name}): {e}")
             return None
     
     # =============== 파일 정보 / 데이터 조회 메서드 ===============
@@ -130,13 +369,28 @@ class DatabaseManager:
         result = self.execute_query(query, (file_path, user_id), fetch_all=False)
         return result[0] if result else None
     
-    def get_files_for_user(self, user_id: int) -> List[Dict]:
+    def get_files_version(self, user_id: int) -> Optional[int]:
+        """
+        사용자의 파일 목록 변경 버전 조회 (files 변경 시 트리거로 증가)
+
+        :param user_id: 사용자 ID
+
+        :return: 버전 or None (사용자 없음)
         """
-        특정 사용자의 파일 목록 조회
+
+        result = self.execute_query("SELECT files_version FROM users WHERE user_id = %s", (user_id,), fetch_all=False)
+        return result[0] if result else None
+
+    def get_files_for_user(self, user_id: int, after_id: Optional[int] = None,
+                           limit: Optional[int] = None) -> List[Dict]:
+        """
+        특정 사용자의 파일 목록 조회 (id 순서, 변환 없이 DB 값 그대로 반환)
 
         :param user_id: 사용자 ID
+        :param after_id: 이 ID보다 큰 파일부터 조회 (페이지 커서)
+        :param limit: 최대 개수 (None이면 전체)
 
-        :return: 사용자의 파일 목록 (딕셔너리 리스트)
+        :return: 사용자의 파일 목록 (id, file_path, current_hash, check_interval, updated_at 딕셔너리 리스트)
         """
 
         query = """
@@ -147,33 +401,13 @@ class DatabaseManager:
                 check_interval, 
                 updated_at
             FROM files
-            WHERE user_id = %s AND status != 'Deleted'
+            WHERE user_id = %s AND status != 'Deleted' AND id > %s
+            ORDER BY id
+            LIMIT %s
         """
 
-        raw_files = self.execute_query(query, (user_id,), fetch_all=True, use_dict_row=True)
-
-        if not raw_files:
-            return [] # 결과가 없으면 빈 리스트
-
-        processed_files = [] # 최종 반환할 파일 목록
-        for f_dict in raw_files:
-            check_interval_val = f_dict.get('check_interval') # 검사주기 값
-            check_interval_seconds = None # 초 단위로 변환된 체크 주기
-            # 숫자형이면 float형태로 변환
-            if isinstance(check_interval_val, timedelta):
-                check_interval_seconds = check_interval_val.total_seconds()
-            elif isinstance(check_interval_val, (int, float)):
-                check_interval_seconds = float(check_interval_val)
-
-            processed_files.append({
-                "id": f_dict.get('id'),
-                "file_path": f_dict.get('file_path'),
-                "current_hash": f_dict.get('current_hash'),
-                "check_interval": check_interval_seconds,
-                "updated_at": f_dict.get('updated_at').isoformat() if f_dict.get('updated_at') else None
-            })
-
-        return processed_files
+        raw_files = self.execute_query(query, (user_id, after_id or 0, limit), fetch_all=True, use_dict_row=True)
+        return raw_files or [] # 결과가 없으면 빈 리스트
 
     def get_user_email_by_file_id(self, file_id: int) -> Optional[str]:
         """
@@ -201,7 +435,8 @@ class DatabaseManager:
 
     def get_file_logs_for_user(self, user_id: int) -> list:
         """
-        특정 사용자의 파일 변경 로그 조회
+        특정 사용자의 파일 변경 로그 조회 (파일별 최신 로그 1건)
+            - file_logs 트리거가 유지하는 file_latest_events를 조회하므로 로그 이력 길이와 무관
 
         :param user_id: 사용자 ID
 
@@ -209,19 +444,19 @@ class DatabaseManager:
         """
 
         query = """
-            SELECT DISTINCT ON (f.id)
-                l.id,
+            SELECT
+                e.log_id AS id,
                 f.id AS file_id,
                 f.file_path AS file,
-                l.change_type AS status,
-                l.logged_at AS time,
-                l.old_hash AS oldHash,
-                l.new_hash AS newHash,
+                e.change_type AS status,
+                e.logged_at AS time,
+                e.old_hash AS oldHash,
+                e.new_hash AS newHash,
                 f.check_interval AS checkInterval
-            FROM file_logs l
-            JOIN files f ON l.file_id = f.id
-            WHERE f.user_id = %s
-            ORDER BY f.id, l.logged_at DESC;
+            FROM file_latest_events e
+            JOIN files f ON e.file_id = f.id
+            WHERE e.user_id = %s
+            ORDER BY e.file_id;
         """
 
         try:
@@ -235,6 +470,81 @@ class DatabaseManager:
             print(f"❌ Error fetching file logs for user {user_id}: {e}")
             return []
 
+    def get_file_history(self, user_id: int, file_id: Optional[int] = None,
+                         cursor: Optional[Tuple[datetime, int]] = None,
+                         since: Optional[datetime] = None, until: Optional[datetime] = None,
+                         change_types: Optional[List[str]] = None, limit: int = 50) -> Optional[List[Dict]]:
+        """
+        파일 변경 이력 조회 (최신순, (logged_at, id) 기준 키셋 페이지네이션)
+            - 파일마다 file_logs(file_id, logged_at) 인덱스로 최대 limit건만 읽은 뒤 합쳐서 limit건 반환
+              -> 전체 이력 길이와 무관하게 (파일 수 x limit) 이내로 조회
+
+        :param user_id: 사용자 ID
+        :param file_id: 파일 ID (None이면 사용자의 전체 파일)
+        :param cursor: 이전 페이지 마지막 항목의 (logged_at, id), 이보다 오래된 항목부터 조회
+        :param since: 이 시각 이후(포함) 로그만
+        :param until: 이 시각 이전(미포함) 로그만
+        :param change_types: 변경 유형 필터
+        :param limit: 최대 개수
+
+        :return: 로그 딕셔너리 리스트 or None (file_id가 주어졌는데 사용자의 파일이 아닌 경우)
+        """
+
+        conditions = ["l.file_id = f.id"]
+        params: Dict[str, Any] = {"user_id": user_id, "limit": limit}
+
+        if since is not None:
+            conditions.append("l.logged_at >= %(since)s")
+            params["since"] = since
+        if until is not None:
+            conditions.append("l.logged_at < %(until)s")
+            params["until"] = until
+        if change_types:
+            conditions.append("l.change_type = ANY(%(change_types)s)")
+            params["change_types"] = change_types
+        if cursor is not None:
+            # logged_at 범위 조건은 인덱스 탐색용, 행 비교는 같은 시각 내 id 순서용
+            conditions.append("l.logged_at <= %(cursor_time)s")
+            conditions.append("(l.logged_at, l.id) < (%(cursor_time)s, %(cursor_id)s)")
+            params["cursor_time"], params["cursor_id"] = cursor
+
+        file_condition = ""
+        if file_id is not None:
+            file_condition = "AND f.id = %(file_id)s"
+            params["file_id"] = file_id
+
+        query = f"""
+            SELECT h.id, h.file_id, h.file_path, h.change_type, h.logged_at,
+                   h.old_hash, h.new_hash, h.detection_source, h.repeat_count, h.summary_until
+            FROM files f
+            CROSS JOIN LATERAL (
+                SELECT l.id, l.file_id, f.file_path, l.change_type, l.logged_at,
+                       l.old_hash, l.new_hash, l.detection_source, l.repeat_count, l.summary_until
+                FROM file_logs l
+                WHERE {" AND ".join(conditions)}
+                ORDER BY l.logged_at DESC, l.id DESC
+                LIMIT %(limit)s
+            ) h
+            WHERE f.user_id = %(user_id)s {file_condition}
+            ORDER BY h.logged_at DESC, h.id DESC
+            LIMIT %(limit)s
+        """
+
+        try:
+            with self.conn.cursor(row_factory=dict_row) as cur:
+                if file_id is not None:
+                    cur.execute("SELECT 1 FROM files WHERE id = %s AND user_id = %s", (file_id, user_id))
+                    if cur.fetchone() is None:
+                        return None
+
+                cur.execute(query, params)
+                return cur.fetchall()
+
+        except Exception as e:
+            self.conn.rollback()
+            print(f"❌ Error fetching file history for user {user_id} (file {file_id}): {e}")
+            raise DatabaseError(f"Database error while fetching history: {str(e)}")
+
     # =============== 로그 및 알림 관련 메서드 ===============
 
     @staticmethod
@@ -262,29 +572,55 @@ class DatabaseManager:
         )
 
     @staticmethod
-    def create_alert(cur, file_id: int, message: str, event_time: Optional[datetime] = None) -> None:
+    def create_alert(cur, file_id: int, message: str, event_time: Optional[datetime] = None,
+                     subject: Optional[str] = None, body: Optional[str] = None,
+                     change_type: Optional[str] = None, file_path: Optional[str] = None) -> None:
         """
         파일 변경 알림 생성
+            - 이메일 제목/본문이 있으면 발송 대기(pending) 상태로 저장하고 디스패처에 알림
+            - 즉시 발송 유형이 아니면 요약(digest) 대상으로 저장하여 ALERT_DIGEST_WINDOW 뒤에 사용자별로 모아 발송
+            - 알림은 트랜잭션 커밋 시 전달되므로 롤백된 변경은 발송되지 않음
 
         :param cur: 데이터베이스 커서
         :param file_id: 파일 ID
         :param message: 알림 메시지
         :param event_time: 알림 발생 시간
+        :param subject: 이메일 제목 (None이면 이메일 발송 안 함)
+        :param body: 이메일 본문
+        :param change_type: 파일 상태 변경 유형 (요약 이메일 분류용)
+        :param file_path: 파일 경로 (요약 이메일 표시용)
 
         """
 
         alert_time = event_time if event_time else datetime.now(timezone.utc)
+        if subject is None:
+            cur.execute(
+                "INSERT INTO alerts (file_id, message, created_at) "
+                "VALUES (%s, %s, %s)",
+                (file_id, message, alert_time)
+            )
+            return
+
+        digest = ALERT_DIGEST_WINDOW > 0 and change_type not in ALERT_IMMEDIATE_CHANGE_TYPES
         cur.execute(
-            "INSERT INTO alerts (file_id, message, created_at) "
-            "VALUES (%s, %s, %s)",
-            (file_id, message, alert_time)
+            """
+            INSERT INTO alerts (file_id, user_id, message, created_at, subject, body, change_type, file_path,
+                                digest, status, next_attempt_at)
+            VALUES (%s, (SELECT user_id FROM files WHERE id = %s), %s, %s, %s, %s, %s, %s,
+                    %s, 'pending', now() + %s * interval '1 second')
+            """,
+            (file_id, file_id, message, alert_time, subject, body, change_type, file_path,
+             digest, ALERT_DIGEST_WINDOW if digest else 0)
         )
+        if not digest:
+            cur.execute("SELECT pg_notify(%s, '')", (ALERT_CHANNEL,))
     
     def send_notifications(self, cur, file_id: int, file_path: str, old_hash: Optional[str],
                             new_hash: Optional[str], time_now: datetime,
                             change_type: str = "Modified") -> None:
         """
-        파일 변경에 대한 알림 발송 (이메일 / 웹소켓 Toast)flak
+        파일 변경에 대한 알림 생성 및 이메일 발송 예약
+            - 이메일은 alert_dispatcher가 백그라운드에서 발송 (요청은 메일 서버를 기다리지 않음)
 
         :param cur: 데이터베이스 커서
         :param file_id: 파일 ID
@@ -311,25 +647,329 @@ class DatabaseManager:
             alert_message_detail = f"\n- 현재 해시: {new_hash or 'N/A'}"
 
         full_alert_message = alert_message_base + alert_message_detail
-        self.create_alert(cur, file_id, full_alert_message, time_now)
 
-        user_email = self.get_user_email_by_file_id(file_id)
+        subject = f"파일 {change_type} 알림: {file_basename}"
+        body = full_alert_message + f"\n- 변경/감지 시각: {time_now.strftime('%Y-%m-%d %H:%M:%S')}"
+        # body += "\n\n웹사이트에서 확인: [여기에 웹사이트 링크]" # TODO: 사이트 주소 추가
+        self.create_alert(cur, file_id, full_alert_message, time_now, subject=subject, body=body,
+                          change_type=change_type, file_path=file_path)
 
-        if user_email:
-            print(f"알림을 발송할 사용자 이메일: {user_email}")
-            subject = f"파일 {change_type} 알림: {file_basename}"
-            body = full_alert_message + f"\n- 변경/감지 시각: {time_now.strftime('%Y-%m-%d %H:%M:%S')}"
-            # body += "\n\n웹사이트에서 확인: [여기에 웹사이트 링크]" # TODO: 사이트 주소 추가
-            send_notification_email(user_email, subject, body)
-            print(f"이메일 알림 발송 시도 완료: {user_email}")
 
-        else:
-            print(f"file_id {file_id}의 사용자 이메일 찾지 못해 이메일 알림을 보낼 수 없습니다.")
+    # =============== 알림 발송 대기열 ===============
+
+    def claim_pending_alerts(self, limit: int, lease_seconds: int) -> List[Dict]:
+        """
+        즉시 발송할 알림을 가져오고 임대(lease) 상태로 표시
+            - 여러 워커가 동시에 가져가지 않도록 SKIP LOCKED 사용
+            - 발송 중 프로세스가 죽으면 임대 시간이 지난 뒤 다시 가져감
+            - 수신자 이메일을 함께 조회하여 알림마다 별도 조회하지 않음
+
+        :param limit: 최대 개수
+        :param lease_seconds: 임대 시간 (초)
+
+        :return: [{"id", "subject", "body", "attempts", "email"}, ...]
+        """
+
+        query = """
+            WITH claimed AS (
+                SELECT id FROM alerts
+                WHERE status IN ('pending', 'sending') AND NOT digest AND next_attempt_at <= now()
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE alerts a
+            SET status = 'sending',
+                attempts = a.attempts + 1,
+                next_attempt_at = now() + %s * interval '1 second'
+            FROM claimed c
+            WHERE a.id = c.id
+            RETURNING a.id, a.subject, a.body, a.attempts,
+                      (SELECT u.email FROM files f JOIN users u ON u.user_id = f.user_id
+                       WHERE f.id = a.file_id) AS email
+        """
+        try:
+            with self.conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(query, (limit, lease_seconds))
+                rows = cur.fetchall()
+                self.conn.commit()
+                return rows
+
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while claiming alerts: {str(e)}")
+
+    def claim_digest_alerts(self, max_users: int, lease_seconds: int) -> List[Dict]:
+        """
+        요약 발송 시점이 된 사용자의 요약 대상 알림을 모두 가져오고 임대 상태로 표시
+            - 사용자의 가장 오래된 대기 알림이 요약 시간을 넘기면, 그 사용자의 대기 알림 전체를 한 번에 가져감
+
+        :param max_users: 한 번에 처리할 최대 사용자 수
+        :param lease_seconds: 임대 시간 (초)
+
+        :return: [{"id", "user_id", "email", "subject", "body", "change_type", "file_path", "created_at", "attempts"}, ...]
+        """
+
+        query = """
+            WITH due_users AS (
+                SELECT DISTINCT user_id FROM alerts
+                WHERE status IN ('pending', 'sending') AND digest AND next_attempt_at <= now()
+                LIMIT %s
+            ),
+            claimed AS (
+                SELECT a.id FROM alerts a
+                JOIN due_users d ON d.user_id = a.user_id
+                WHERE a.digest
+                  AND (a.status = 'pending' OR (a.status = 'sending' AND a.next_attempt_at <= now()))
+                FOR UPDATE OF a SKIP LOCKED
+            )
+            UPDATE alerts a
+            SET status = 'sending',
+                attempts = a.attempts + 1,
+                next_attempt_at = now() + %s * interval '1 second'
+            FROM claimed c
+            WHERE a.id = c.id
+            RETURNING a.id, a.user_id, a.subject, a.body, a.change_type, a.file_path, a.created_at, a.attempts,
+                      (SELECT u.email FROM users u WHERE u.user_id = a.user_id) AS email
+        """
+        try:
+            with self.conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(query, (max_users, lease_seconds))
+                rows = cur.fetchall()
+                self.conn.commit()
+                return rows
+
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while claiming digest alerts: {str(e)}")
+
+    def seconds_until_next_alert(self) -> Optional[float]:
+        """
+        다음 발송 예정 알림까지 남은 시간
+
+        :return: 초 (대기 중인 알림이 없으면 None)
+        """
+
+        result = self.execute_query(
+            """
+            SELECT EXTRACT(EPOCH FROM min(next_attempt_at) - now())
+            FROM alerts
+            WHERE status IN ('pending', 'sending')
+            """,
+            fetch_all=False
+        )
+        self.conn.commit()
+        if not result or result[0] is None:
+            return None
+        return max(0.0, float(result[0]))
+
+    def mark_alerts_sent(self, alert_ids: List[int]) -> None:
+        """ 알림 발송 완료 표시 """
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE alerts SET status = 'sent', sent_at = now(), last_error = NULL WHERE id = ANY(%s)",
+                    (alert_ids,)
+                )
+                self.conn.commit()
+
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while updating alerts: {str(e)}")
+
+    def mark_alerts_failed(self, alert_ids: List[int], error: str, retry_delay: Optional[float]) -> None:
+        """
+        알림 발송 실패 기록
+
+        :param alert_ids: 알림 ID 목록
+        :param error: 오류 내용
+        :param retry_delay: 재시도까지 대기 시간 (초), None이면 더 이상 재시도하지 않음
+        """
+
+        try:
+            with self.conn.cursor() as cur:
+                if retry_delay is None:
+                    cur.execute(
+                        "UPDATE alerts SET status = 'failed', last_error = %s WHERE id = ANY(%s)",
+                        (error, alert_ids)
+                    )
+                else:
+                    cur.execute(
+                        """
+                        UPDATE alerts
+                        SET status = 'pending', last_error = %s,
+                            next_attempt_at = now() + %s * interval '1 second'
+                        WHERE id = ANY(%s)
+                        """,
+                        (error, retry_delay, alert_ids)
+                    )
+                self.conn.commit()
+
+        except Exception as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while updating alerts: {str(e)}")
+
+    # =============== 백업 작업 대기열 ===============
+
+    # 백업 작업 등록 (handle_file_report의 backup_job 인자로 파일 보고와 같은 트랜잭션에서 실행)
+    _BACKUP_JOB_INSERT = """
+        INSERT INTO backup_jobs (user_id, file_id, relative_path, file_hash, file_size, is_modified,
+                                 change_time, spool_path, spool_host)
+        VALUES (%(user_id)s, %(file_id)s, %(relative_path)s, %(file_hash)s, %(file_size)s, %(is_modified)s,
+                %(change_time)s, %(spool_path)s, %(spool_host)s)
+        RETURNING id
+    """
+
+    def claim_backup_job(self, lease_seconds: int, spool_host: str) -> Optional[Dict]:
+        """
+        대기 중인 백업 작업 하나를 가져오고 임대(lease) 상태로 표시
+            - 여러 워커가 동시에 가져가지 않도록 SKIP LOCKED 사용
+            - 업로드 중 프로세스가 죽으면 임대 시간이 지난 뒤 다시 가져감 (저장된 업로드 세션으로 이어서 전송)
+            - 스풀 파일이 있는 호스트에서 등록된 작업만 가져감
+
+        :param lease_seconds: 임대 시간 (초)
+        :param spool_host: 이 서버의 스풀 호스트 이름 (BACKUP_SPOOL_HOST)
+
+        :return: 작업 정보 딕셔너리 or None (대기 작업 없음)
+        """
+
+        query = """
+            WITH claimed AS (
+                SELECT id FROM backup_jobs
+                WHERE status IN ('queued', 'running') AND next_attempt_at <= now()
+                  AND (spool_host = %s OR spool_host IS NULL)
+                ORDER BY next_attempt_at, id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE backup_jobs j
+            SET status = 'running',
+                attempts = j.attempts + 1,
+                updated_at = now(),
+                next_attempt_at = now() + %s * interval '1 second'
+            FROM claimed c
+            WHERE j.id = c.id
+            RETURNING j.id, j.user_id, j.file_id, j.relative_path, j.file_hash, j.file_size,
+                      j.is_modified, j.change_time, j.spool_path, j.attempts, j.upload_session_uri
+        """
+        try:
+            with self.conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(query, (spool_host, lease_seconds))
+                job = cur.fetchone()
+                self.conn.commit()
+                return job
+
+        except psycopg.Error as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while claiming backup job: {str(e)}")
+
+    def update_backup_job_progress(self, job_id: int, bytes_uploaded: int, lease_seconds: int) -> None:
+        """ 업로드 진행 상황 기록 및 임대 시간 연장 """
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE backup_jobs
+                    SET bytes_uploaded = %s, updated_at = now(),
+                        next_attempt_at = now() + %s * interval '1 second'
+                    WHERE id = %s AND status = 'running'
+                    """,
+                    (bytes_uploaded, lease_seconds, job_id)
+                )
+                self.conn.commit()
+
+        except psycopg.Error as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while updating backup job: {str(e)}")
+
+    def save_backup_job_session(self, job_id: int, session_uri: str) -> None:
+        """ Drive 업로드 세션 URI 저장 (재시도/재시작 시 이어서 업로드) """
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE backup_jobs SET upload_session_uri = %s, bytes_uploaded = 0, updated_at = now() WHERE id = %s",
+                    (session_uri, job_id)
+                )
+                self.conn.commit()
+
+        except psycopg.Error as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while updating backup job: {str(e)}")
+
+    def finish_backup_job(self, job_id: int, drive_file_id: Optional[str], backup_id: Optional[int],
+                          error: Optional[str] = None, retry_delay: Optional[float] = None) -> None:
+        """
+        백업 작업 결과 기록
+
+        :param job_id: 작업 ID
+        :param drive_file_id: 업로드된 Google Drive 파일 ID
+        :param backup_id: 생성된 backups 레코드 ID
+        :param error: 오류 내용 (None이면 성공)
+        :param retry_delay: 재시도까지 대기 시간 (초), None이면 더 이상 재시도하지 않음 (재시도 시 업로드 세션 유지)
+        """
+
+        try:
+            with self.conn.cursor() as cur:
+                if error is None:
+                    cur.execute(
+                        """
+                        UPDATE backup_jobs
+                        SET status = 'succeeded', drive_file_id = %s, backup_id = %s, bytes_uploaded = file_size,
+                            last_error = NULL, upload_session_uri = NULL, updated_at = now(), finished_at = now()
+                        WHERE id = %s
+                        """,
+                        (drive_file_id, backup_id, job_id)
+                    )
+                elif retry_delay is None:
+                    cur.execute(
+                        """
+                        UPDATE backup_jobs
+                        SET status = 'failed', drive_file_id = %s, last_error = %s, upload_session_uri = NULL,
+                            updated_at = now(), finished_at = now()
+                        WHERE id = %s
+                        """,
+                        (drive_file_id, error, job_id)
+                    )
+                else:
+                    cur.execute(
+                        """
+                        UPDATE backup_jobs
+                        SET status = 'queued', last_error = %s, updated_at = now(),
+                            next_attempt_at = now() + %s * interval '1 second'
+                        WHERE id = %s
+                        """,
+                        (error, retry_delay, job_id)
+                    )
+                self.conn.commit()
+
+        except psycopg.Error as e:
+            self.conn.rollback()
+            raise DatabaseError(f"Database error while updating backup job: {str(e)}")
+
+    def get_backup_job(self, user_id: int, job_id: int) -> Optional[Dict]:
+        """
+        사용자의 백업 작업 상태 조회
+
+        :param user_id: 사용자 ID
+        :param job_id: 작업 ID
+
+        :return: 작업 정보 딕셔너리 or None (없거나 다른 사용자의 작업)
+        """
+
+        query = """
+            SELECT id, file_id, relative_path, file_hash, file_size, status, attempts, bytes_uploaded,
+                   drive_file_id, backup_id, last_error, created_at, updated_at, finished_at
+            FROM backup_jobs
+            WHERE id = %s AND user_id = %s
+        """
 
+        return self.execute_query(query, (job_id, user_id), fetch_all=False, use_dict_row=True)
 
     # =============== 백업 관련 ===============
 
-    def save_backup_entry(self, file_id: int, backup_path: str, backup_hash: str, created_at: datetime) -> Optional[int]:
+    def save_backup_entry(self, file_id: int, backup_path: str, backup_hash: str, created_at: datetime,
+                          file_size: Optional[int] = None, block_size: Optional[int] = None,
+                          block_signatures: Optional[bytes] = None) -> Optional[int]:
         """
         백업 정보를 backups 테이블에 저장
 
@@ -337,13 +977,16 @@ class DatabaseManager:
         :param backup_path: Google Drive에 저장된 파일의 경로
         :param backup_hash: 백업된 파일 내용의 해시
         :param created_at: 백업 생성 시간
+        :param file_size: 백업된 파일 크기 (바이트)
+        :param block_size: 델타 업로드용 블록 시그니처의 블록 크기
+        :param block_signatures: 델타 업로드용 블록 시그니처 (delta_utils.compute_signatures)
 
         :return: 성공시 백업 레코드의 ID, 실패 시 None.
         """
 
         query = """
-            INSERT INTO backups (file_id, backup_path, backup_hash, created_at)
-            VALUES (%s, %s, %s, %s) RETURNING id
+            INSERT INTO backups (file_id, backup_path, backup_hash, created_at, file_size, block_size, block_signatures)
+            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
         """
 
         try:
@@ -353,7 +996,8 @@ class DatabaseManager:
                 aware_created_at = datetime.now(timezone.utc)
 
             with self.conn.cursor(row_factory=dict_row) as cur:
-                cur.execute(query, (file_id, backup_path, backup_hash, aware_created_at))
+                cur.execute(query, (file_id, backup_path, backup_hash, aware_created_at,
+                                    file_size, block_size, block_signatures))
                 backup_id_row = cur.fetchone()
                 self.conn.commit()
 
@@ -400,6 +1044,72 @@ class DatabaseManager:
 
         return self.execute_query(query, (backup_id, user_id), fetch_all=False, use_dict_row=True)
 
+    def find_backup_by_hash(self, user_id: int, backup_hash: str) -> Optional[Dict]:
+        """
+        사용자의 백업 중 해시가 같은 가장 최근 백업 조회 (내용 기반 중복 업로드 방지)
+
+        :param user_id: 사용자 ID
+        :param backup_hash: 백업 내용의 해시
+
+        :return: 백업 정보 딕셔너리 (id, backup_path) or None
+        """
+
+        query = """
+                SELECT b.id, b.backup_path, b.file_size, b.block_size, b.block_signatures
+                FROM Backups b
+                         JOIN Files f ON b.file_id = f.id
+                WHERE f.user_id = %s
+                  AND b.backup_hash = %s
+                ORDER BY b.created_at DESC
+                LIMIT 1
+                """
+
+        return self.execute_query(query, (user_id, backup_hash), fetch_all=False, use_dict_row=True)
+
+    def get_delta_base(self, user_id: int, file_path: str) -> Optional[Dict]:
+        """
+        델타 업로드의 기준이 될 파일의 최신 백업 조회 (블록 시그니처가 있는 백업만)
+
+        :param user_id: 사용자 ID
+        :param file_path: 파일 경로
+
+        :return: 백업 정보 딕셔너리 (id, backup_hash, file_size, block_size, block_signatures) or None
+        """
+
+        query = """
+                SELECT b.id, b.backup_hash, b.file_size, b.block_size, b.block_signatures
+                FROM Backups b
+                         JOIN Files f ON b.file_id = f.id
+                WHERE f.user_id = %s
+                  AND f.file_path = %s
+                  AND b.block_signatures IS NOT NULL
+                ORDER BY b.created_at DESC
+                LIMIT 1
+                """
+
+        return self.execute_query(query, (user_id, file_path), fetch_all=False, use_dict_row=True)
+
+    def get_existing_backup_hashes(self, user_id: int, hashes: List[str]) -> set:
+        """
+        주어진 해시 중 사용자의 백업으로 이미 저장된 해시 목록 조회
+
+        :param user_id: 사용자 ID
+        :param hashes: 확인할 해시 리스트
+
+        :return: 이미 존재하는 해시 집합
+        """
+
+        query = """
+                SELECT DISTINCT b.backup_hash
+                FROM Backups b
+                         JOIN Files f ON b.file_id = f.id
+                WHERE f.user_id = %s
+                  AND b.backup_hash = ANY(%s)
+                """
+
+        rows = self.execute_query(query, (user_id, hashes), fetch_all=True)
+        return {row[0] for row in rows} if rows else set()
+
     def get_backups_for_file(self, user_id: int, file_id: int) -> List[Dict]:
         """
         특정 파일의 모든 백업 기록을 조회
@@ -437,6 +1147,7 @@ class DatabaseManager:
         :raises: DatabaseError: DB 작업 중 오류 발생
         """
 
+        _heartbeats.forget_file(file_id)
         try:
             with self.conn.cursor(row_factory=dict_row) as cur:
                 # 1. 롤백할 백업 정보 가져오기
@@ -487,103 +1198,101 @@ class DatabaseManager:
 
     # =============== 내부 파일 상태 관리 메서드 (handle_file_report 등에서 사용) ===============
     
-    def _update_unchanged_file_status(self, cur, file_id: int, current_db_status: str, current_db_hash: str, 
-                                      time_now: datetime, detection_source: Optional[str]) -> None:
-        """
-        파일이 변경되지 않을시 상태 업데에트
-
-        :param cur: 데이터베이스 커서
-        :param file_id: 파일 ID
-        :param current_db_status: 현재 파일 상태
-        :param current_db_hash: 현재 파일 해시값
-        :param time_now: 현재 시간
-        :param detection_source: 변경 감지 유형
-        """
-
-        if current_db_status != 'Unchanged': # 상태가 실제로 변경될 때만 로그 기록
-            self.create_file_log(cur, file_id, current_db_hash, current_db_hash, 'Unchanged', detection_source=detection_source, event_time=time_now)
-
-        cur.execute( # 상태가 Unchanged가 아니었다면 Unchanged로 변경, 시간 업데이트. 이미 Unchanged면 시간만 업데이트.
-            "UPDATE Files SET updated_at = %s, status = 'Unchanged' WHERE id = %s",
-            (time_now, file_id)
-        )
-    
-    def _update_modified_file_status(self, cur, file_id: int, old_hash: str, new_hash: str,
-                                     file_path: str, time_now: datetime, detection_source: Optional[str]) -> None:
-        """
-        파일이 변경됐을 때 상태 업데이트
-
-        :param cur: 데이터베이스 커서
-        :param file_id: 파일 ID
-        :param old_hash: 이전 해시값
-        :param new_hash: 새 해식값
-        :param file_path: 파일 경로
-        :param time_now: 현재 시간
-        :param detection_source: 파일 감지 유형
-        """
-
-        # 파일 상태 업데이트
-        cur.execute(
-            "UPDATE Files SET file_hash = %s, updated_at = %s, status = 'Modified' WHERE id = %s",
-            (new_hash, time_now, file_id)
-        )
-        
-        # 변경 로그 생성
-        self.create_file_log(cur, file_id, old_hash, new_hash, 'Modified', detection_source=detection_source, event_time=time_now)
-        
-        # 알림 발송
-        self.send_notifications(cur, file_id, file_path, old_hash, new_hash, time_now, "Modified")
-
-    def _register_new_file_entry(self, cur, file_path: str, new_hash: str, user_id: int,
-                                 time_now: datetime, detection_source: Optional[str],
-                                 check_interval_seconds: int = 86400) -> int:
-        """
-        새 파일 레코드 생성
-
-        :param cur: 데이터베이스 커서
-        :param file_path: 파일 경로
-        :param new_hash: 새 해시값
-        :param user_id: 사용자 ID
-        :param time_now: 현재 시간
-        :param detection_source: 변경 감지 유형
-        :param check_interval_seconds: 검사 주기 (기본 24H)
-
-        :return: 파일 ID
-        """
-
-        check_interval_for_db = f"{check_interval_seconds} seconds"
-
-        cur.execute(
-            "INSERT INTO Files "
-            "(user_id, file_path, file_hash, status, check_interval, created_at, updated_at) "
-            "VALUES (%s, %s, %s, 'Unchanged', %s::INTERVAL, %s, %s) RETURNING id",
-            (user_id, file_path, new_hash, check_interval_for_db, time_now, time_now)
+    # 파일 보고 1건을 한 번의 왕복으로 처리하는 upsert
+    #   - prev: 갱신 전 행 (이전 해시/상태를 로그에 남기기 위함)
+    #   - upsert: (user_id, file_path) 고유 인덱스 기준 INSERT ... ON CONFLICT DO UPDATE
+    #             (동시에 같은 경로가 보고되어도 행이 중복 생성되지 않음)
+    #   - log: 새 파일, 수정, 상태 변경(-> Unchanged)일 때만 변경 로그 기록
+    _FILE_REPORT_UPSERT = """
+        WITH prev AS (
+            SELECT id, file_hash, status FROM files
+            WHERE user_id = %(user_id)s AND file_path = %(file_path)s
+        ),
+        upsert AS (
+            INSERT INTO files (user_id, file_path, file_hash, status, check_interval, created_at, updated_at)
+            VALUES (%(user_id)s, %(file_path)s, %(new_hash)s, 'Unchanged', %(check_interval)s::INTERVAL,
+                    %(time_now)s, %(time_now)s)
+            ON CONFLICT (user_id, file_path) DO UPDATE
+            SET file_hash = EXCLUDED.file_hash,
+                updated_at = EXCLUDED.updated_at,
+                status = CASE WHEN files.file_hash IS NOT DISTINCT FROM EXCLUDED.file_hash
+                              THEN 'Unchanged' ELSE 'Modified' END
+            RETURNING id, status, (xmax = 0) AS inserted
+        ),
+        result AS (
+            SELECT u.id, u.inserted, p.file_hash AS old_hash, p.status AS old_status,
+                   CASE WHEN u.inserted THEN 'Registered' ELSE u.status END AS outcome
+            FROM upsert u
+            LEFT JOIN prev p ON p.id = u.id
+        ),
+        log AS (
+            INSERT INTO file_logs (file_id, old_hash, new_hash, change_type, logged_at, detection_source)
+            SELECT id,
+                   old_hash,
+                   %(new_hash)s,
+                   CASE WHEN outcome = 'Registered' THEN 'UserUpdated' ELSE outcome END,
+                   %(time_now)s,
+                   %(detection_source)s
+            FROM result
+            WHERE outcome <> 'Unchanged' OR COALESCE(old_status, 'Unchanged') <> 'Unchanged'
         )
-        id_row = cur.fetchone()
-        file_id = id_row['id']
-        self.create_file_log(cur, file_id, None, new_hash, 'UserUpdated', detection_source, event_time=time_now)
-        return file_id
+        SELECT id, outcome, old_hash FROM result
+    """
 
     # =============== 공개 API 메서드 ===============
 
     def handle_file_report(self, user_id: int, file_path: str, new_hash: str,
                            detection_source: Optional[str] = "Unknown",
-                           file_content_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+                           file_content_bytes: Optional[bytes] = None,
+                           event_time: Optional[datetime] = None,
+                           use_buffer: bool = True,
+                           backup_job: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         클라이언트로부터 파일 상태 보고 처리(신규/수정/변경없음)
+            - 조회/갱신/로그 기록을 하나의 upsert 문으로 처리 (수정된 경우에만 알림 생성 추가)
+            - 이미 Unchanged로 확인된 파일의 변경없음 보고는 DB 행을 읽어 확인한 뒤
+              버퍼에 넣고 일괄 반영 (flush_heartbeats)
+            - backup_job이 있으면 신규/수정인 경우 백업 작업을 같은 트랜잭션에서 등록
+              (보고만 반영되고 작업 등록이 실패하면 재시도 보고가 변경없음으로 처리되어 백업이 누락되므로)
 
         :param user_id: 사용자 ID
         :param file_path: 파일 경로
         :param new_hash: 새 해시값
         :param detection_source: 변경 감지 유형
         :param file_content_bytes: 파일 데이터(바이트)
+        :param event_time: 보고 시각 (버퍼에서 다시 처리할 때 사용, None이면 현재 시각이며 버퍼 사용 가능)
+        :param use_buffer: 변경없음 보고에 버퍼 사용 여부 (백업 경로는 결과로 백업 여부를 정하므로 False)
+        :param backup_job: 백업 작업 정보 {"relative_path", "file_size", "is_modified", "change_time",
+                           "spool_path", "spool_host"} (None이면 등록 안 함)
 
-        :return: 성공 시 처리 결과 딕셔너리
+        :return: 성공 시 처리 결과 딕셔너리 (백업 작업을 등록했으면 "job_id" 포함)
 
         :raises: DatabaseError: DB 작업 오류 시
         """
 
-        time_now = datetime.now(timezone.utc)
+        time_now = event_time or datetime.now(timezone.utc)
+
+        if event_time is None and use_buffer and backup_job is None:
+            known_file_id = _heartbeats.lookup(user_id, file_path, new_hash)
+            if known_file_id is not None:
+                # 다른 워커가 그 사이 수정으로 처리했을 수 있으므로 현재 행을 읽어 확인 (잠금/쓰기 없음)
+                current = self.execute_query(
+                    """
+                    SELECT id FROM Files
+                    WHERE id = %s AND user_id = %s AND file_path = %s
+                      AND file_hash = %s AND status = 'Unchanged'
+                    """,
+                    (known_file_id, user_id, file_path, new_hash),
+                    fetch_all=False,
+                )
+                if current:
+                    _heartbeats.add(user_id, file_path, known_file_id, new_hash, time_now, detection_source)
+                    return {
+                        "status": "success",
+                        "message": f"File '{file_path}' is unchanged. Timestamp updated.",
+                        "file_id": known_file_id,
+                    }
+        _heartbeats.forget(user_id, file_path)
 
         # DB 연결 및 트랜잭션 관리
         if self.conn is None or self.conn.closed:
@@ -591,54 +1300,49 @@ class DatabaseManager:
 
         with self.conn.cursor(row_factory=dict_row) as cur:
             try:
-                cur.execute(
-                    "SELECT id, file_hash, status FROM Files WHERE user_id = %s AND file_path = %s",
-                    (user_id, file_path)
-                )
-                file_record = cur.fetchone()
-
-                if file_record: # 기존 파일 (삭제되지 않음)
-                    file_id_for_response = file_record["id"]
-                    old_hash = file_record["file_hash"]
-                    current_status = file_record["status"]
-
-                    if new_hash == old_hash: # 해시값 동일 변경 없음
-                        self._update_unchanged_file_status(cur, file_id_for_response, current_status, old_hash, time_now, detection_source)
-                        response_message = f"File '{file_path}' is unchanged. Timestamp updated."
-                    else: # 해시값이 다름 -> 수정된 파일
-                        self._update_modified_file_status(cur, file_id_for_response, old_hash, new_hash, file_path, time_now, detection_source)
-                        response_message = f"File '{file_path}' is modified. Timestamp updated."
-                else:
-                    # 새 파일이거나, 이전에 삭제된 파일과 동일한 경로로 다시 생성된 경우
-                    # 이전에 삭제된 동일 경로 파일이 있는 지 확인
-                    cur.execute(
-                        "SELECT id, file_hash, status FROM Files WHERE user_id = %s AND file_path = %s AND status = 'Deleted'",
-                        (user_id, file_path)
-                    )
-                    deleted_file_record = cur.fetchone()
-                    if deleted_file_record: # 이전에 삭제되었던 파일이면, 해당 레코드 업데이트 (복구 개념)
-                        file_id_for_response = deleted_file_record["id"]
-                        print(f"[{detection_source or 'RE_REGISTER'}] 이전에 삭제된 파일 재등록: {file_path}")
-                        cur.execute(
-                            "UPDATE Files SET file_hash = %s, status = 'Unchanged', updated_at = %s, check_interval = %s::INTERVAL WHERE id = %s",
-                            (new_hash, time_now, f"{86400} seconds", file_id_for_response)  # 기본 24시간 인터벌로 복구
-                        )
-                        self.create_file_log(cur, file_id_for_response, None, new_hash, 'Recovered', detection_source=detection_source, event_time=time_now)
-                        response_message = f"File '{file_path}' is re-registered. Timestamp updated."
-
-                    else: # 완전한 새 파일
-                        file_id_for_response = self._register_new_file_entry(cur, file_path, new_hash, user_id, time_now, detection_source)
-                        response_message = f"File '{file_path}' is registered. Timestamp updated."
-
+                cur.execute(self._FILE_REPORT_UPSERT, {
+                    "user_id": user_id,
+                    "file_path": file_path,
+                    "new_hash": new_hash,
+                    "check_interval": f"{86400} seconds",  # 새 파일 기본 검사 주기 24시간
+                    "time_now": time_now,
+                    "detection_source": detection_source,
+                })
+                result = cur.fetchone()
+                file_id_for_response = result["id"]
+                outcome = result["outcome"]
+
+                if outcome == "Modified": # 해시값이 다름 -> 수정된 파일 알림
+                    self.send_notifications(cur, file_id_for_response, file_path, result["old_hash"], new_hash, time_now, "Modified")
+                    response_message = f"File '{file_path}' is modified. Timestamp updated."
+                elif outcome == "Unchanged": # 해시값 동일 변경 없음
+                    response_message = f"File '{file_path}' is unchanged. Timestamp updated."
+                else: # 완전한 새 파일
+                    response_message = f"File '{file_path}' is registered. Timestamp updated."
                     if file_content_bytes:
                         print(f"  ㄴ 파일 내용 수신됨: {file_path}, {len(file_content_bytes)} bytes")
 
+                job_id = None
+                if backup_job is not None and outcome != "Unchanged":
+                    cur.execute(self._BACKUP_JOB_INSERT, {
+                        **backup_job,
+                        "user_id": user_id,
+                        "file_id": file_id_for_response,
+                        "file_hash": new_hash,
+                    })
+                    job_id = cur.fetchone()["id"]
+
                 self.conn.commit()  # 모든 작업 성공 시 커밋
-                return {
+                if outcome != "Modified":  # 신규 등록도 Unchanged 상태로 저장됨
+                    _heartbeats.remember(user_id, file_path, file_id_for_response, new_hash)
+                response = {
                     "status": "success",
                     "message": response_message,
                     "file_id": file_id_for_response,
                 }
+                if job_id is not None:
+                    response["job_id"] = job_id
+                return response
 
             except psycopg.Error as db_err:
                 self.conn.rollback()
@@ -650,6 +1354,234 @@ class DatabaseManager:
                 print(f"파일 보고 처리 중 일반 오류 발생 ({file_path}, user: {user_id}): {e}")
                 raise DatabaseError(f"Error processing file report: {str(e)}")
 
+    def handle_file_reports_batch(self, user_id: int, reports: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        여러 파일의 해시 보고를 하나의 트랜잭션에서 일괄 처리 (handle_file_report의 배치 버전)
+            - 파일 조회 1회 + 상태별 UPDATE/INSERT 1회씩 + 로그 INSERT 1회 (unnest 배열 사용)
+            - 동일 경로가 여러 번 보고되면 마지막 보고만 반영
+
+        :param user_id: 사용자 ID
+        :param reports: 보고 목록 [{"file_path", "new_hash", "detection_source", "detected_at"(datetime)}]
+
+        :return: 경로별 처리 결과 리스트 [{"file_path", "file_id", "result"}]
+
+        :raises: DatabaseError: DB 작업 오류 시
+        """
+
+        if self.conn is None or self.conn.closed:
+            raise DatabaseError("Database connection is not available.")
+
+        time_now = datetime.now(timezone.utc)
+
+        # 경로별 마지막 보고만 사용
+        latest_reports: Dict[str, Dict[str, Any]] = {}
+        for report in reports:
+            latest_reports[report["file_path"]] = report
+        if not latest_reports:
+            return []
+
+        def event_time_of(report):
+            detected_at = report.get("detected_at")
+            return min(detected_at, time_now) if detected_at else time_now
+
+        with self.conn.cursor(row_factory=dict_row) as cur:
+            try:
+                # 1. 보고된 경로의 기존 파일 레코드를 한 번에 조회
+                cur.execute(
+                    """
+                    SELECT DISTINCT ON (file_path) id, file_path, file_hash, status
+                    FROM Files
+                    WHERE user_id = %s AND file_path = ANY(%s)
+                    ORDER BY file_path, id
+                    """,
+                    (user_id, list(latest_reports.keys()))
+                )
+                existing = {row["file_path"]: row for row in cur.fetchall()}
+
+                unchanged, buffered, modified, new_files, logs, results = [], [], [], [], [], []
+
+                # 2. 보고를 변경없음 / 수정 / 신규로 분류
+                for file_path, report in latest_reports.items():
+                    new_hash = report["new_hash"]
+                    detection_source = report.get("detection_source")
+                    event_time = event_time_of(report)
+                    record = existing.get(file_path)
+
+                    if record is None:
+                        new_files.append((file_path, new_hash, event_time, detection_source))
+                        continue
+
+                    if record["file_hash"] == new_hash:
+                        if record["status"] == 'Unchanged' and _heartbeats.enabled:
+                            # 상태 변화 없음 -> updated_at 갱신만 버퍼에 넣어 일괄 반영
+                            buffered.append((file_path, record["id"], new_hash, event_time, detection_source))
+                        else:
+                            unchanged.append((record["id"], event_time))
+                            if record["status"] != 'Unchanged':
+                                logs.append((record["id"], new_hash, new_hash, 'Unchanged', event_time, detection_source))
+                        results.append({"file_path": file_path, "file_id": record["id"], "result": "unchanged"})
+                    else:
+                        modified.append((record["id"], record["file_hash"], new_hash, file_path, event_time))
+                        logs.append((record["id"], record["file_hash"], new_hash, 'Modified', event_time, detection_source))
+                        results.append({"file_path": file_path, "file_id": record["id"], "result": "modified"})
+
+                # 3. 상태별 일괄 반영
+                if unchanged:
+                    cur.execute(
+                        """
+                        UPDATE Files AS f
+                        SET updated_at = v.ts, status = 'Unchanged'
+                        FROM unnest(%s::bigint[], %s::timestamptz[]) AS v(id, ts)
+                        WHERE f.id = v.id
+                        """,
+                        ([u[0] for u in unchanged], [u[1] for u in unchanged])
+                    )
+
+                if modified:
+                    cur.execute(
+                        """
+                        UPDATE Files AS f
+                        SET file_hash = v.hash, updated_at = v.ts, status = 'Modified'
+                        FROM unnest(%s::bigint[], %s::text[], %s::timestamptz[]) AS v(id, hash, ts)
+                        WHERE f.id = v.id
+                        """,
+                        ([m[0] for m in modified], [m[2] for m in modified], [m[4] for m in modified])
+                    )
+
+                if new_files:
+                    # 조회 이후 다른 요청이 같은 경로를 먼저 등록했을 수 있으므로 단건 보고(_FILE_REPORT_UPSERT)와
+                    # 같은 규칙으로 upsert하고, xmax = 0 여부로 신규 등록/기존 행 갱신을 구분
+                    cur.execute(
+                        """
+                        INSERT INTO Files (user_id, file_path, file_hash, status, check_interval, created_at, updated_at)
+                        SELECT %s, v.path, v.hash, 'Unchanged', %s::INTERVAL, v.ts, v.ts
+                        FROM unnest(%s::text[], %s::text[], %s::timestamptz[]) AS v(path, hash, ts)
+                        ON CONFLICT (user_id, file_path) DO UPDATE
+                        SET file_hash = EXCLUDED.file_hash,
+                            updated_at = EXCLUDED.updated_at,
+                            status = CASE WHEN Files.file_hash IS NOT DISTINCT FROM EXCLUDED.file_hash
+                                          THEN 'Unchanged' ELSE 'Modified' END
+                        RETURNING id, file_path, status, (xmax = 0) AS inserted
+                        """,
+                        (user_id, f"{86400} seconds",
+                         [n[0] for n in new_files], [n[1] for n in new_files], [n[2] for n in new_files])
+                    )
+                    upserted = {row["file_path"]: row for row in cur.fetchall()}
+                    for file_path, new_hash, event_time, detection_source in new_files:
+                        row = upserted[file_path]
+                        file_id = row["id"]
+                        if row["inserted"]:
+                            logs.append((file_id, None, new_hash, 'UserUpdated', event_time, detection_source))
+                            results.append({"file_path": file_path, "file_id": file_id, "result": "registered"})
+                        elif row["status"] == 'Modified':
+                            # 이전 해시는 동시에 등록된 행이라 이 문장에서 보이지 않음 (단건 upsert와 동일)
+                            modified.append((file_id, None, new_hash, file_path, event_time))
+                            logs.append((file_id, None, new_hash, 'Modified', event_time, detection_source))
+                            results.append({"file_path": file_path, "file_id": file_id, "result": "modified"})
+                        else:
+                            results.append({"file_path": file_path, "file_id": file_id, "result": "unchanged"})
+
+                if logs:
+                    cur.execute(
+                        """
+                        INSERT INTO File_logs (file_id, old_hash, new_hash, change_type, logged_at, detection_source)
+                        SELECT * FROM unnest(%s::bigint[], %s::text[], %s::text[], %s::text[], %s::timestamptz[], %s::text[])
+                        """,
+                        tuple(list(column) for column in zip(*logs))
+                    )
+
+                # 4. 수정된 파일 알림
+                for file_id, old_hash, new_hash, file_path, event_time in modified:
+                    self.send_notifications(cur, file_id, file_path, old_hash, new_hash, event_time, "Modified")
+
+                self.conn.commit()
+
+                # 5. 변경없음 보고 버퍼 / 상태 캐시 갱신
+                for file_path, file_id, new_hash, event_time, detection_source in buffered:
+                    _heartbeats.add(user_id, file_path, file_id, new_hash, event_time, detection_source)
+                for result in results:
+                    if result["result"] == "modified":
+                        _heartbeats.forget(user_id, result["file_path"])
+                    else:
+                        _heartbeats.remember(user_id, result["file_path"], result["file_id"],
+                                             latest_reports[result["file_path"]]["new_hash"])
+                return results
+
+            except psycopg.Error as db_err:
+                self.conn.rollback()
+                print(f"DB 오류 발생 (batch report, user: {user_id}, {len(latest_reports)} files): {db_err}")
+                raise DatabaseError(f"Database error: {str(db_err)}")
+
+            except Exception as e:
+                self.conn.rollback()
+                print(f"일괄 파일 보고 처리 중 일반 오류 발생 (user: {user_id}): {e}")
+                raise DatabaseError(f"Error processing batch file report: {str(e)}")
+
+    def flush_heartbeats(self) -> int:
+        """
+        버퍼에 쌓인 변경없음 보고를 UPDATE ... FROM (VALUES ...)로 일괄 반영
+            - 보고 이후 해시/상태가 바뀐 파일은 건너뛰고, 보고가 더 최신이면 동기 처리로 다시 반영
+            - DB 오류 시 보고를 버퍼에 되돌림
+
+        :return: 일괄 반영한 파일 수
+
+        :raises: DatabaseError: DB 작업 오류 시
+        """
+
+        batch = _heartbeats.take()
+        if not batch:
+            return 0
+
+        items = list(batch.items())
+        matched = set()
+        stale = []
+        try:
+            with self.conn.cursor() as cur:
+                for start in range(0, len(items), HEARTBEAT_FLUSH_MAX_ROWS):
+                    chunk = items[start:start + HEARTBEAT_FLUSH_MAX_ROWS]
+                    values = ", ".join(["(%s::BIGINT, %s::TEXT, %s::TIMESTAMPTZ)"] * len(chunk))
+                    params = [value for _, (file_id, file_hash, event_time, _) in chunk
+                              for value in (file_id, file_hash, event_time)]
+                    cur.execute(
+                        f"""
+                        UPDATE Files AS f
+                        SET updated_at = v.ts
+                        FROM (VALUES {values}) AS v(id, file_hash, ts)
+                        WHERE f.id = v.id
+                          AND f.file_hash = v.file_hash
+                          AND f.status = 'Unchanged'
+                          AND f.updated_at < v.ts
+                        RETURNING f.id
+                        """,
+                        params
+                    )
+                    matched.update(row[0] for row in cur.fetchall())
+
+                leftovers = [(key, entry) for key, entry in items if entry[0] not in matched]
+                if leftovers:
+                    cur.execute(
+                        "SELECT id, updated_at FROM Files WHERE id = ANY(%s)",
+                        ([entry[0] for _, entry in leftovers],)
+                    )
+                    current = dict(cur.fetchall())
+                    stale = [(key, entry) for key, entry in leftovers
+                             if entry[0] in current and current[entry[0]] < entry[2]]
+            self.conn.commit()
+
+        except psycopg.Error as db_err:
+            self.conn.rollback()
+            _heartbeats.requeue(batch)
+            raise DatabaseError(f"Database error: {str(db_err)}")
+
+        # 캐시와 달리 해시/상태가 바뀌어 있던 파일은 보고 시각 기준으로 동기 처리
+        for (user_id, file_path), (file_id, file_hash, event_time, detection_source) in stale:
+            try:
+                self.handle_file_report(user_id, file_path, file_hash, detection_source, event_time=event_time)
+            except DatabaseError as e:
+                print(f"변경없음 보고 재처리 실패 ({file_path}, user: {user_id}): {e}")
+
+        return len(matched)
+
     def handle_file_deletion_report(self, user_id: int, file_path: str, detection_source: Optional[str] = "Unknown") -> Dict[str, Any]:
         """
         클라이어트로부터 파일 삭제 보고 처리
@@ -665,6 +1597,7 @@ class DatabaseManager:
         """
 
         time_now = datetime.now(timezone.utc) # 현재 시간
+        _heartbeats.forget(user_id, file_path)
 
         if self.conn is None or self.conn.closed:
             raise DatabaseError("Database connection is not available.")
@@ -726,6 +1659,7 @@ class DatabaseManager:
                 WHERE id = %s AND user_id = %s AND status != 'Deleted'
                 RETURNING id, file_hash
             """
+        _heartbeats.forget_file(file_id)
         try:
             with self.conn.cursor(row_factory=dict_row) as cur:
                 cur.execute(query, (new_status, datetime.now(timezone.utc), file_id, user_id))
@@ -808,6 +1742,7 @@ class DatabaseManager:
             raise NotFoundError(f"File not found for soft delete: {file_id} (user {user_id})")
 
         assert isinstance(file_info, collections.abc.Mapping)
+        _heartbeats.forget(user_id, file_info['file_path'])
 
         try:
             with self.conn.cursor() as cur:
@@ -851,7 +1786,7 @@ def get_or_create_user(username: str, email: str) -> Optional[Dict[str, Any]]:
     conn = None
 
     try:
-        conn = DatabaseManager.connect()
+        conn = get_pool().getconn()
         with conn.cursor(row_factory=dict_row) as cur:
             # 1. 이메일 기준으로 사용자 조회
             cur.execute("SELECT user_id, username, email FROM Users WHERE email = %s", (email,))
@@ -899,7 +1834,7 @@ def get_or_create_user(username: str, email: str) -> Optional[Dict[str, Any]]:
 
     finally:
         if conn:
-            conn.close()
+            _return_connection(conn)
 
 def save_or_update_google_tokens(user_id: int, access_token: str, refresh_token: Optional[str], expires_at: Optional[datetime]) -> bool:
     """
@@ -916,7 +1851,7 @@ def save_or_update_google_tokens(user_id: int, access_token: str, refresh_token:
     conn = None
 
     try:
-        conn = DatabaseManager.connect()
+        conn = get_pool().getconn()
         with conn.cursor() as cur:
             if refresh_token: # 리프레시 토큰이 있는 경우 -> 전체 토큰 정보 업데이트
                 cur.execute(
@@ -948,7 +1883,50 @@ def save_or_update_google_tokens(user_id: int, access_token: str, refresh_token:
         return False
 
     finally:
-        if conn: conn.close()
+        if conn: _return_connection(conn)
+
+def get_or_create_drive_folder_record(user_id: int, create_folder) -> Optional[str]:
+    """
+    사용자의 Google Drive 백업 폴더 ID 조회 (없으면 advisory lock 안에서 생성 후 저장)
+        - 여러 워커가 동시에 첫 업로드를 해도 폴더는 하나만 생성됨
+
+    :param user_id: 사용자 ID
+    :param create_folder: 폴더 ID가 없을 때 호출할 함수 (Drive에서 폴더를 찾거나 만들어 ID 반환)
+
+    :return: 폴더 ID or None
+    """
+
+    with get_pool().connection() as conn:
+        row = conn.execute("SELECT drive_backup_folder_id FROM users WHERE user_id = %s", (user_id,)).fetchone()
+        conn.commit()
+        if row and row[0]:
+            return row[0]
+
+        conn.execute("SELECT pg_advisory_lock(%s, %s)", (DRIVE_FOLDER_LOCK_CLASS, user_id))
+        try:
+            # lock을 기다리는 동안 다른 워커가 만들었을 수 있으므로 다시 확인
+            row = conn.execute("SELECT drive_backup_folder_id FROM users WHERE user_id = %s", (user_id,)).fetchone()
+            conn.commit()
+            if row and row[0]:
+                return row[0]
+
+            folder_id = create_folder()
+            if folder_id:
+                conn.execute("UPDATE users SET drive_backup_folder_id = %s WHERE user_id = %s", (folder_id, user_id))
+                conn.commit()
+            return folder_id
+        finally:
+            conn.rollback()
+            conn.execute("SELECT pg_advisory_unlock(%s, %s)", (DRIVE_FOLDER_LOCK_CLASS, user_id))
+            conn.commit()
+
+def clear_drive_folder_record(user_id: int, folder_id: str) -> None:
+    """ 더 이상 존재하지 않는 백업 폴더 ID 삭제 (다른 워커가 이미 새 폴더로 바꿨으면 유지) """
+    with get_pool().connection() as conn:
+        conn.execute(
+            "UPDATE users SET drive_backup_folder_id = NULL WHERE user_id = %s AND drive_backup_folder_id = %s",
+            (user_id, folder_id)
+        )
 
 def get_google_tokens_by_user_id(user_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -961,7 +1939,7 @@ def get_google_tokens_by_user_id(user_id: int) -> Optional[Dict[str, Any]]:
 
     conn = None
     try:
-        conn = DatabaseManager.connect()
+        conn = get_pool().getconn()
         with conn.cursor(row_factory=dict_row) as cur:
             cur.execute(
                 """
@@ -985,4 +1963,4 @@ def get_google_tokens_by_user_id(user_id: int) -> Optional[Dict[str, Any]]:
 
     finally:
         if conn:
-            conn.close()
\ No newline at end of file
+            _return_connection(conn)
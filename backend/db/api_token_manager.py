@@ -1,46 +1,148 @@
-from connection import get_db_connection
-from psycopg import connect
-from flask import current_app
-from dotenv import load_dotenv
-import os
+import threading, time
+from collections import OrderedDict
+import psycopg
+from config import DB_PARAMS, TOKEN_CACHE_TTL, TOKEN_CACHE_NEGATIVE_TTL, TOKEN_CACHE_MAX_SIZE
+from database import get_pool
+
+TOKEN_CHANGE_CHANNEL = "api_tokens_changed"  # 토큰 발급/폐기 알림 채널 (payload: user_id)
+LISTENER_RETRY_DELAY = 5                     # 알림 수신 연결이 끊겼을 때 재연결 대기 (초)
+
+
+class TokenCache:
+    """
+    API 토큰 -> user_id 캐시 (TTL + LRU)
+        - 잘못된 토큰도 짧은 시간 동안 캐시 (negative caching)
+        - 토큰 발급/폐기 알림을 받으면 해당 사용자 항목과 모든 negative 항목을 삭제
+    """
+
+    def __init__(self, ttl=TOKEN_CACHE_TTL, negative_ttl=TOKEN_CACHE_NEGATIVE_TTL, max_size=TOKEN_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # token -> (user_id or None, 만료 시각)
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """
+        캐시 조회
+
+        :param token: API 토큰
+
+        :return: (캐시 적중 여부, user_id or None)
+        """
+
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return False, None
+            user_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[token]
+                return False, None
+            self._entries.move_to_end(token)
+            return True, user_id
+
+    def put(self, token, user_id):
+        """ 조회 결과 저장 (user_id가 None이면 negative 항목) """
+        ttl = self.ttl if user_id is not None else self.negative_ttl
+        with self._lock:
+            self._entries[token] = (user_id, time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        """ 사용자의 토큰 항목과 모든 negative 항목 삭제 """
+        with self._lock:
+            for token in [t for t, (uid, _) in self._entries.items() if uid is None or uid == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = TokenCache()
+_listener_started = False
+_listener_lock = threading.Lock()
+
+
+def _notify_token_change(cur, user_id):
+    """ 같은 트랜잭션에서 토큰 변경 알림 발행 (커밋 시 모든 워커에 전달) """
+    cur.execute("SELECT pg_notify(%s, %s)", (TOKEN_CHANGE_CHANNEL, str(user_id)))
+
+
+def _listen_for_token_changes():
+    """
+    (백그라운드 스레드) 토큰 변경 알림을 받아 캐시 무효화
+        - 연결이 끊기면 놓친 알림이 있을 수 있으므로 캐시를 비우고 재연결
+    """
+
+    while True:
+        try:
+            with psycopg.connect(**DB_PARAMS, autocommit=True) as conn:
+                conn.execute(f"LISTEN {TOKEN_CHANGE_CHANNEL}")
+                for notify in conn.notifies():
+                    try:
+                        _token_cache.invalidate_user(int(notify.payload))
+                    except ValueError:
+                        _token_cache.clear()
+        except Exception as e:
+            print(f"⚠️ 토큰 변경 알림 수신 오류, {LISTENER_RETRY_DELAY}초 후 재연결: {e}")
+        _token_cache.clear()
+        time.sleep(LISTENER_RETRY_DELAY)
+
+
+def _ensure_listener():
+    """ 알림 수신 스레드를 워커 프로세스마다 한 번만 시작 """
+    global _listener_started
+    if _listener_started:
+        return
+    with _listener_lock:
+        if not _listener_started:
+            threading.Thread(target=_listen_for_token_changes, name="token-cache-listener", daemon=True).start()
+            _listener_started = True
 
-load_dotenv()
 
 def get_token_by_user_id(user_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT token FROM api_tokens WHERE user_id = %s", (user_id,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT token FROM api_tokens WHERE user_id = %s", (user_id,))
+            row = cur.fetchone()
     return row[0] if row else None
 
 def save_token_to_db(user_id, token):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO api_tokens (user_id, token) VALUES (%s, %s)", (user_id, token))
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO api_tokens (user_id, token) VALUES (%s, %s)", (user_id, token))
+            _notify_token_change(cur, user_id)
+    _token_cache.invalidate_user(user_id)
+
+def revoke_tokens_for_user(user_id):
+    """ 사용자의 모든 API 토큰 폐기 (모든 워커의 캐시에서도 제거) """
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM api_tokens WHERE user_id = %s", (user_id,))
+            revoked = cur.rowcount
+            _notify_token_change(cur, user_id)
+    _token_cache.invalidate_user(user_id)
+    return revoked
 
 def get_user_id_by_token(token):  # <-- 이 함수가 반드시 있어야 함
-    with get_db_connection() as conn:
+    _ensure_listener()
+
+    hit, user_id = _token_cache.get(token)
+    if hit:
+        return user_id
+
+    with get_pool().connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 "SELECT user_id FROM api_tokens WHERE token = %s",
                 (token,)
             )
             result = cur.fetchone()
-            if result:
-                return result[0]
-            return None
-
-
-def get_db_connection():
-    return connect(
-        dbname=os.environ["DB_NAME"],
-        user=os.environ["DB_USER"],
-        password=os.environ["DB_PASSWORD"],
-        host=os.environ["DB_HOST"],
-        port=os.environ["DB_PORT"]
-    )
+            user_id = result[0] if result else None
+
+    _token_cache.put(token, user_id)
+    return user_id
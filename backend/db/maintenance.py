@@ -0,0 +1,223 @@
+# db/maintenance.py
+# file_logs 파티션 관리 / 보관 기간 정리 / Unchanged 로그 압축
+#   - 실행: (backend 디렉토리에서) python -m db.maintenance [partitions|retention|compact|all]
+#   - cron 등으로 하루 1회 실행 권장
+import re, sys
+from datetime import date, datetime, timedelta, timezone
+import psycopg
+from config import DB_PARAMS, LOG_RETENTION_DAYS, LOG_COMPACTION_MIN_AGE_DAYS, LOG_PARTITION_MONTHS_AHEAD
+
+RETENTION_DELETE_BATCH = 10000       # 사용자별 보관 기간 정리 시 한 번에 삭제할 행 수
+COMPACTION_LOOKBACK_MONTHS = 2       # 압축 대상: 압축 기준 시각 이전 몇 개월
+_PARTITION_NAME = re.compile(r"^file_logs_(\d{4})(\d{2})$")
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def ensure_partitions(conn, months_ahead=LOG_PARTITION_MONTHS_AHEAD):
+    """
+    이번 달부터 months_ahead 개월 뒤까지 월별 파티션 생성
+        - 점검이 밀려 기본 파티션에 쌓인 로그가 있으면 그 가장 오래된 월부터 만들고 행을 옮김
+
+    :return: 새로 만든 파티션 수
+    """
+
+    created = conn.execute(
+        """
+        SELECT ensure_file_logs_partitions(
+            LEAST(now()::DATE, (SELECT min(logged_at)::DATE FROM file_logs_default)), %s
+        )
+        """,
+        (months_ahead,)
+    ).fetchone()[0]
+    conn.commit()
+    return created
+
+
+def list_partitions(conn):
+    """
+    월별 파티션 목록
+
+    :return: [(파티션 이름, 시작 월(date)), ...] (오래된 순)
+    """
+
+    rows = conn.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'file_logs'::regclass
+        """
+    ).fetchall()
+    conn.commit()
+
+    partitions = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    partitions.sort(key=lambda p: p[1])
+    return partitions
+
+
+def drop_expired_partitions(conn, default_days=LOG_RETENTION_DAYS):
+    """
+    모든 사용자의 보관 기간을 지난 월별 파티션을 분리(DETACH) 후 삭제
+        - 행 단위 DELETE 없이 메타데이터 변경만으로 제거
+
+    :return: 삭제한 파티션 이름 목록
+    """
+
+    longest_days = conn.execute(
+        "SELECT GREATEST(%s, COALESCE(max(log_retention_days), 0)) FROM users", (default_days,)
+    ).fetchone()[0]
+    conn.commit()
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=longest_days)
+
+    dropped = []
+    for name, month in list_partitions(conn):
+        if _next_month(month) > cutoff:
+            break
+        with conn.transaction():
+            conn.execute(f'ALTER TABLE file_logs DETACH PARTITION "{name}"')
+            conn.execute(f'DROP TABLE "{name}"')
+        print(f"🗑️ 보관 기간이 지난 로그 파티션 삭제: {name}")
+        dropped.append(name)
+    return dropped
+
+
+def purge_expired_logs(conn, default_days=LOG_RETENTION_DAYS, batch_size=RETENTION_DELETE_BATCH):
+    """
+    보관 기간을 짧게 설정한 사용자의 로그를 배치 단위로 삭제 (파티션 삭제로 처리되지 않는 부분)
+
+    :return: 삭제한 행 수
+    """
+
+    total = 0
+    while True:
+        with conn.transaction():
+            cur = conn.execute(
+                """
+                DELETE FROM file_logs l
+                WHERE (l.id, l.logged_at) IN (
+                    SELECT l2.id, l2.logged_at
+                    FROM file_logs l2
+                    JOIN files f ON f.id = l2.file_id
+                    JOIN users u ON u.user_id = f.user_id
+                    WHERE u.log_retention_days IS NOT NULL
+                      AND u.log_retention_days < %(default_days)s
+                      AND l2.logged_at < now() - make_interval(days => u.log_retention_days)
+                    LIMIT %(batch_size)s
+                )
+                """,
+                {"default_days": default_days, "batch_size": batch_size}
+            )
+            deleted = cur.rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+# 기간 안에서 같은 해시의 연속된 Unchanged 로그를 첫 행 하나로 합침
+#   - starts_run: 직전 로그가 같은 해시의 Unchanged가 아니면 새 묶음 시작
+#   - 남기는 행에 합쳐진 개수(repeat_count)와 마지막 시각(summary_until)을 기록
+_COMPACT_UNCHANGED = """
+    WITH ordered AS (
+        SELECT id, logged_at, file_id, change_type, repeat_count,
+               COALESCE(summary_until, logged_at) AS until_at,
+               CASE WHEN change_type = 'Unchanged'
+                     AND lag(change_type) OVER w = 'Unchanged'
+                     AND lag(new_hash) OVER w IS NOT DISTINCT FROM new_hash
+                    THEN 0 ELSE 1 END AS starts_run
+        FROM file_logs
+        WHERE logged_at >= %(start)s AND logged_at < %(end)s
+        WINDOW w AS (PARTITION BY file_id ORDER BY logged_at, id)
+    ),
+    grouped AS (
+        SELECT *, sum(starts_run) OVER (PARTITION BY file_id ORDER BY logged_at, id) AS run_no
+        FROM ordered
+    ),
+    runs AS (
+        SELECT file_id, run_no,
+               (array_agg(id ORDER BY logged_at, id))[1] AS keep_id,
+               min(logged_at) AS keep_logged_at,
+               sum(repeat_count) AS total_count,
+               max(until_at) AS last_at
+        FROM grouped
+        WHERE change_type = 'Unchanged'
+        GROUP BY file_id, run_no
+        HAVING count(*) > 1
+    ),
+    removed AS (
+        DELETE FROM file_logs l
+        USING grouped g
+        JOIN runs r ON r.file_id = g.file_id AND r.run_no = g.run_no
+        WHERE l.id = g.id AND l.logged_at = g.logged_at AND g.id <> r.keep_id
+          AND l.logged_at >= %(start)s AND l.logged_at < %(end)s
+        RETURNING 1
+    ),
+    summarized AS (
+        UPDATE file_logs l
+        SET repeat_count = r.total_count, summary_until = r.last_at
+        FROM runs r
+        WHERE l.id = r.keep_id AND l.logged_at = r.keep_logged_at
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM removed), (SELECT count(*) FROM summarized)
+"""
+
+
+def compact_unchanged_logs(conn, min_age_days=LOG_COMPACTION_MIN_AGE_DAYS, lookback_months=COMPACTION_LOOKBACK_MONTHS):
+    """
+    오래된 로그의 연속된 Unchanged 항목을 요약 1행으로 압축 (월 단위로 처리)
+        - 최근 min_age_days 이내 로그는 그대로 유지
+
+    :return: 삭제(병합)한 행 수
+    """
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=min_age_days)
+    month = _month_start(cutoff)
+    for _ in range(lookback_months):
+        month = date(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+
+    total_removed = 0
+    while month <= cutoff.date():
+        start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        end = min(datetime.combine(_next_month(month), datetime.min.time(), tzinfo=timezone.utc), cutoff)
+        with conn.transaction():
+            removed, summarized = conn.execute(_COMPACT_UNCHANGED, {"start": start, "end": end}).fetchone()
+        if removed:
+            print(f"🗜️ {month.strftime('%Y-%m')} Unchanged 로그 압축: {removed}행 -> 요약 {summarized}행")
+        total_removed += removed
+        month = _next_month(month)
+    return total_removed
+
+
+def main(task="all"):
+    with psycopg.connect(**DB_PARAMS) as conn:
+        if task in ("partitions", "all"):
+            print(f"월별 파티션 생성: {ensure_partitions(conn)}개")
+        if task in ("retention", "all"):
+            dropped = drop_expired_partitions(conn)
+            purged = purge_expired_logs(conn)
+            print(f"보관 기간 정리: 파티션 {len(dropped)}개, 로그 {purged}행 삭제")
+        if task in ("compact", "all"):
+            print(f"Unchanged 로그 압축: {compact_unchanged_logs(conn)}행 병합")
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if selected not in ("partitions", "retention", "compact", "all"):
+        print("사용법: python -m db.maintenance [partitions|retention|compact|all]")
+        sys.exit(2)
+    try:
+        main(selected)
+    except Exception as e:
+        print(f"❌ 로그 유지보수 실패: {e}")
+        sys.exit(1)
@@ -0,0 +1,132 @@
+# db/migrate.py
+# 버전별 스키마 마이그레이션
+#   - db/migrations/NNNN_설명.sql 파일을 번호 순서대로 적용
+#   - 적용 이력은 schema_migrations 테이블에 기록
+#   - 실행: (backend 디렉토리에서) python -m db.migrate
+import os, re, sys
+import psycopg
+from config import DB_PARAMS
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_LOCK_KEY = 0x46494D4D  # 동시에 하나의 프로세스만 마이그레이션 ('FIMM')
+_MIGRATION_FILE = re.compile(r"^(\d{4})_[\w\-]+\.sql$")
+
+
+def list_migrations():
+    """
+    마이그레이션 파일 목록
+
+    :return: [(버전, 파일명, 경로), ...] (버전 오름차순)
+    """
+
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), filename, os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+    return migrations
+
+
+EXPECTED_SCHEMA_VERSION = max((version for version, _, _ in list_migrations()), default=0)
+
+
+def _ensure_migrations_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+
+
+def get_schema_version(conn):
+    """
+    현재 DB에 적용된 마지막 마이그레이션 버전
+
+    :param conn: psycopg 연결
+
+    :return: 버전 (마이그레이션 이력이 없으면 0)
+    """
+
+    row = conn.execute("SELECT to_regclass('schema_migrations') IS NOT NULL").fetchone()
+    if not row[0]:
+        return 0
+    row = conn.execute("SELECT COALESCE(max(version), 0) FROM schema_migrations").fetchone()
+    return row[0]
+
+
+def apply_migrations(conn):
+    """
+    적용되지 않은 마이그레이션을 순서대로 적용 (마이그레이션마다 하나의 트랜잭션)
+
+    :param conn: psycopg 연결 (autocommit 아님)
+
+    :return: 적용한 마이그레이션 파일명 목록
+    """
+
+    applied = []
+    conn.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    try:
+        _ensure_migrations_table(conn)
+        conn.commit()
+        current = get_schema_version(conn)
+
+        for version, filename, path in list_migrations():
+            if version <= current:
+                continue
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+            try:
+                with conn.transaction():
+                    conn.execute(sql)
+                    conn.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, filename)
+                    )
+            except psycopg.Error as e:
+                raise RuntimeError(f"Migration {filename} failed: {e}") from e
+            print(f"✅ 마이그레이션 적용: {filename}")
+            applied.append(filename)
+    finally:
+        conn.rollback()
+        conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        conn.commit()
+
+    return applied
+
+
+def check_schema_version(conn):
+    """
+    DB 스키마가 코드가 기대하는 버전인지 확인
+
+    :param conn: psycopg 연결
+
+    :return: (일치 여부, 현재 버전)
+    """
+
+    current = get_schema_version(conn)
+    conn.rollback()
+    return current == EXPECTED_SCHEMA_VERSION, current
+
+
+def main():
+    with psycopg.connect(**DB_PARAMS) as conn:
+        before = get_schema_version(conn)
+        conn.rollback()
+        applied = apply_migrations(conn)
+        if applied:
+            print(f"스키마 버전 {before} -> {EXPECTED_SCHEMA_VERSION}")
+        else:
+            print(f"스키마가 최신입니다 (버전 {before})")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ 마이그레이션 실패: {e}")
+        sys.exit(1)
@@ -0,0 +1,127 @@
+-- 0001: 기본 스키마
+--   - 새 DB에서는 전체 테이블을 생성
+--   - 기존 운영 DB에서는 CREATE TABLE을 건너뛰고, 이후 추가된 컬럼/인덱스만 적용 (여러 번 실행해도 안전)
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id                 SERIAL PRIMARY KEY,
+    username                VARCHAR(255),
+    email                   VARCHAR(255) NOT NULL UNIQUE,
+    created_at              TIMESTAMPTZ NOT NULL DEFAULT now(),
+    google_access_token     TEXT,
+    google_refresh_token    TEXT,
+    google_token_expires_at TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS api_tokens (
+    id         SERIAL PRIMARY KEY,
+    user_id    INTEGER NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+    token      VARCHAR(128) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    id             SERIAL PRIMARY KEY,
+    user_id        INTEGER NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+    file_path      TEXT NOT NULL,
+    file_hash      VARCHAR(64),
+    status         VARCHAR(32) NOT NULL DEFAULT 'Unchanged',
+    check_interval INTERVAL NOT NULL DEFAULT INTERVAL '24 hours',
+    created_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS file_logs (
+    id               BIGSERIAL PRIMARY KEY,
+    file_id          INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    old_hash         VARCHAR(64),
+    new_hash         VARCHAR(64),
+    change_type      VARCHAR(32) NOT NULL,
+    logged_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    detection_source VARCHAR(64)
+);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id         BIGSERIAL PRIMARY KEY,
+    file_id    INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    message    TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS backups (
+    id          SERIAL PRIMARY KEY,
+    file_id     INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    backup_path TEXT NOT NULL,
+    backup_hash VARCHAR(64),
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 델타 업로드: 백업 크기와 블록 시그니처 저장
+ALTER TABLE backups ADD COLUMN IF NOT EXISTS file_size BIGINT;
+ALTER TABLE backups ADD COLUMN IF NOT EXISTS block_size INTEGER;
+ALTER TABLE backups ADD COLUMN IF NOT EXISTS block_signatures BYTEA;
+
+-- 알림 발송 대기열: alerts 테이블을 이메일 발송 큐로 사용 (기존 행은 이미 발송된 것으로 간주)
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS subject TEXT;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS body TEXT;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'sent';
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sent_at TIMESTAMPTZ;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS last_error TEXT;
+CREATE INDEX IF NOT EXISTS idx_alerts_dispatch ON alerts (next_attempt_at) WHERE status IN ('pending', 'sending');
+
+-- 알림 요약(digest): 사용자별로 모아 발송하기 위한 정보
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS user_id INTEGER;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS change_type VARCHAR(32);
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS file_path TEXT;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS digest BOOLEAN NOT NULL DEFAULT FALSE;
+CREATE INDEX IF NOT EXISTS idx_alerts_digest_user ON alerts (user_id) WHERE digest AND status IN ('pending', 'sending');
+
+-- 파일 보고 upsert: (user_id, file_path) 고유 인덱스 (ON CONFLICT 대상)
+-- 기존 DB에는 동시 보고로 생긴 중복 행이 있을 수 있으므로 인덱스 생성 전에 병합
+--   - 같은 (user_id, file_path)의 가장 작은 id 행을 남기고, 해시/상태/갱신 시각은 가장 최근 행의 값으로 갱신
+--   - file_logs / backups / alerts는 남는 행을 가리키도록 변경한 뒤 나머지 행 삭제
+DO $$
+DECLARE
+    merged INTEGER;
+BEGIN
+    IF to_regclass('uq_files_user_path') IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    CREATE TEMP TABLE files_duplicate_map ON COMMIT DROP AS
+    SELECT id AS dup_id, keep_id
+    FROM (
+        SELECT id, min(id) OVER (PARTITION BY user_id, file_path) AS keep_id
+        FROM files
+    ) AS d
+    WHERE id <> keep_id;
+
+    SELECT count(*) INTO merged FROM files_duplicate_map;
+    IF merged = 0 THEN
+        RETURN;
+    END IF;
+
+    UPDATE files AS k
+    SET file_hash = latest.file_hash,
+        status = latest.status,
+        updated_at = latest.updated_at
+    FROM (
+        SELECT DISTINCT ON (user_id, file_path) user_id, file_path, file_hash, status, updated_at
+        FROM files
+        ORDER BY user_id, file_path, updated_at DESC, id DESC
+    ) AS latest
+    WHERE k.user_id = latest.user_id
+      AND k.file_path = latest.file_path
+      AND k.id IN (SELECT keep_id FROM files_duplicate_map);
+
+    UPDATE file_logs AS l SET file_id = m.keep_id FROM files_duplicate_map AS m WHERE l.file_id = m.dup_id;
+    UPDATE backups AS b SET file_id = m.keep_id FROM files_duplicate_map AS m WHERE b.file_id = m.dup_id;
+    UPDATE alerts AS a SET file_id = m.keep_id FROM files_duplicate_map AS m WHERE a.file_id = m.dup_id;
+    DELETE FROM files WHERE id IN (SELECT dup_id FROM files_duplicate_map);
+
+    RAISE NOTICE 'files: merged % duplicate (user_id, file_path) rows', merged;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_files_user_path ON files (user_id, file_path);
@@ -0,0 +1,24 @@
+-- 0002: DatabaseManager 주요 조회용 인덱스
+--   files(user_id, file_path)는 0001의 uq_files_user_path가 담당
+
+-- 사용자별 파일 목록 / 상태 필터 (get_files_for_user, status != 'Deleted')
+CREATE INDEX IF NOT EXISTS idx_files_user_status ON files (user_id, status);
+
+-- 경로 접두사 조회 (file_path LIKE 'dir/%'), 로케일과 무관하게 인덱스 사용
+CREATE INDEX IF NOT EXISTS idx_files_user_path_prefix ON files (user_id, file_path text_pattern_ops);
+
+-- 파일별 최신 로그 (get_file_logs_for_user)
+CREATE INDEX IF NOT EXISTS idx_file_logs_file_logged_at ON file_logs (file_id, logged_at DESC);
+
+-- 파일별 백업 목록 / 델타 기준 백업 (get_backups_for_file, get_delta_base)
+CREATE INDEX IF NOT EXISTS idx_backups_file_created_at ON backups (file_id, created_at);
+
+-- 같은 내용의 백업 재사용 (find_backup_by_hash, get_existing_backup_hashes)
+CREATE INDEX IF NOT EXISTS idx_backups_hash ON backups (backup_hash);
+
+-- 토큰 인증 (get_user_id_by_token), 사용자별 토큰 (get_token_by_user_id)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_api_tokens_token ON api_tokens (token);
+CREATE INDEX IF NOT EXISTS idx_api_tokens_user ON api_tokens (user_id);
+
+-- 알림의 파일 조인
+CREATE INDEX IF NOT EXISTS idx_alerts_file ON alerts (file_id);
@@ -0,0 +1,46 @@
+-- 0003: 파일별 최신 로그 읽기 모델
+--   - file_logs에 행이 추가될 때 같은 트랜잭션에서 트리거로 갱신
+--   - /api/files/logs는 전체 로그 이력 대신 파일당 1행인 이 테이블만 조회
+
+CREATE TABLE IF NOT EXISTS file_latest_events (
+    file_id     INTEGER PRIMARY KEY REFERENCES files (id) ON DELETE CASCADE,
+    user_id     INTEGER NOT NULL,
+    log_id      BIGINT NOT NULL,
+    change_type VARCHAR(32) NOT NULL,
+    logged_at   TIMESTAMPTZ NOT NULL,
+    old_hash    VARCHAR(64),
+    new_hash    VARCHAR(64)
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_latest_events_user ON file_latest_events (user_id, file_id);
+
+CREATE OR REPLACE FUNCTION file_logs_update_latest_event() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO file_latest_events (file_id, user_id, log_id, change_type, logged_at, old_hash, new_hash)
+    SELECT NEW.file_id, f.user_id, NEW.id, NEW.change_type, NEW.logged_at, NEW.old_hash, NEW.new_hash
+    FROM files f
+    WHERE f.id = NEW.file_id
+    ON CONFLICT (file_id) DO UPDATE
+    SET log_id      = EXCLUDED.log_id,
+        change_type = EXCLUDED.change_type,
+        logged_at   = EXCLUDED.logged_at,
+        old_hash    = EXCLUDED.old_hash,
+        new_hash    = EXCLUDED.new_hash
+    -- 늦게 도착한 과거 시각의 로그가 최신 상태를 덮어쓰지 않도록 함
+    WHERE (file_latest_events.logged_at, file_latest_events.log_id) <= (EXCLUDED.logged_at, EXCLUDED.log_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_file_logs_latest_event ON file_logs;
+CREATE TRIGGER trg_file_logs_latest_event
+    AFTER INSERT ON file_logs
+    FOR EACH ROW EXECUTE FUNCTION file_logs_update_latest_event();
+
+-- 기존 로그로 초기 데이터 채우기
+INSERT INTO file_latest_events (file_id, user_id, log_id, change_type, logged_at, old_hash, new_hash)
+SELECT DISTINCT ON (l.file_id) l.file_id, f.user_id, l.id, l.change_type, l.logged_at, l.old_hash, l.new_hash
+FROM file_logs l
+JOIN files f ON f.id = l.file_id
+ORDER BY l.file_id, l.logged_at DESC, l.id DESC
+ON CONFLICT (file_id) DO NOTHING;
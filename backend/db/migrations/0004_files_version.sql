@@ -0,0 +1,49 @@
+-- 0004: 사용자별 파일 목록 변경 버전 (GET /api/files의 ETag)
+--   - files 행이 추가/삭제되거나 목록에 영향을 주는 컬럼(file_path/file_hash/check_interval/status)이
+--     바뀌면 문장 단위 트리거로 해당 사용자의 버전 증가
+--   - updated_at만 바뀌는 변경없음 보고/일괄 반영은 버전을 올리지 않음
+--     (users 행 잠금으로 같은 사용자의 보고가 직렬화되지 않도록, 에이전트는 보고 성공 시 캐시된 목록의 updated_at을 직접 갱신)
+--   - 목록이 바뀌지 않았으면 files 테이블을 읽지 않고 304 응답 가능
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS files_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION files_bump_user_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE users SET files_version = files_version + 1
+        WHERE user_id IN (SELECT DISTINCT user_id FROM old_rows);
+    ELSIF TG_OP = 'INSERT' THEN
+        UPDATE users SET files_version = files_version + 1
+        WHERE user_id IN (SELECT DISTINCT user_id FROM new_rows);
+    ELSE
+        UPDATE users SET files_version = files_version + 1
+        WHERE user_id IN (
+            SELECT n.user_id FROM new_rows AS n JOIN old_rows AS o ON o.id = n.id
+            WHERE (n.user_id, n.file_path, n.file_hash, n.check_interval, n.status)
+                  IS DISTINCT FROM (o.user_id, o.file_path, o.file_hash, o.check_interval, o.status)
+            UNION
+            SELECT o.user_id FROM new_rows AS n JOIN old_rows AS o ON o.id = n.id
+            WHERE n.user_id <> o.user_id
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_files_version_insert ON files;
+CREATE TRIGGER trg_files_version_insert
+    AFTER INSERT ON files
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION files_bump_user_version();
+
+DROP TRIGGER IF EXISTS trg_files_version_update ON files;
+CREATE TRIGGER trg_files_version_update
+    AFTER UPDATE ON files
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION files_bump_user_version();
+
+DROP TRIGGER IF EXISTS trg_files_version_delete ON files;
+CREATE TRIGGER trg_files_version_delete
+    AFTER DELETE ON files
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION files_bump_user_version();
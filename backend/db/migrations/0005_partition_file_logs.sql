@@ -0,0 +1,96 @@
+-- 0005: file_logs를 logged_at 기준 월별 파티션 테이블로 전환
+--   - 기존 데이터는 월별 파티션으로 한 번 복사 (로그가 많으면 점검 시간에 적용)
+--   - 오래된 파티션은 DETACH/DROP으로 빠르게 제거 (db/maintenance.py)
+--   - 압축(compaction)으로 합쳐진 Unchanged 로그는 repeat_count / summary_until 에 요약
+--   - file_latest_events.log_id는 외래 키가 없으므로 파티션 교체의 영향을 받지 않음
+
+ALTER TABLE file_logs RENAME TO file_logs_legacy;
+DROP TRIGGER IF EXISTS trg_file_logs_latest_event ON file_logs_legacy;
+
+CREATE TABLE file_logs (
+    id               BIGINT NOT NULL DEFAULT nextval('file_logs_id_seq'),
+    file_id          INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    old_hash         VARCHAR(64),
+    new_hash         VARCHAR(64),
+    change_type      VARCHAR(32) NOT NULL,
+    logged_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    detection_source VARCHAR(64),
+    repeat_count     INTEGER NOT NULL DEFAULT 1,  -- 압축으로 합쳐진 연속 Unchanged 로그 수
+    summary_until    TIMESTAMPTZ,                 -- 합쳐진 마지막 로그 시각
+    CONSTRAINT file_logs_partitioned_pkey PRIMARY KEY (id, logged_at)
+) PARTITION BY RANGE (logged_at);
+
+ALTER SEQUENCE file_logs_id_seq OWNED BY file_logs.id;
+
+-- 범위를 벗어난 로그를 받기 위한 기본 파티션
+CREATE TABLE IF NOT EXISTS file_logs_default PARTITION OF file_logs DEFAULT;
+
+DROP INDEX IF EXISTS idx_file_logs_file_logged_at;
+CREATE INDEX idx_file_logs_file_logged_at ON file_logs (file_id, logged_at DESC);
+
+-- 월별 파티션 생성 함수: start_month부터 (이번 달 + months_ahead)까지
+--   점검이 밀려 해당 월의 로그가 기본 파티션에 들어가 있으면 PARTITION OF로 만들 수 없으므로
+--   별도 테이블을 만들어 그 월의 행을 옮긴 뒤 ATTACH
+CREATE OR REPLACE FUNCTION ensure_file_logs_partitions(start_month DATE, months_ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', start_month)::DATE;
+    last_month  DATE := (date_trunc('month', now()) + make_interval(months => months_ahead))::DATE;
+    month_end   DATE;
+    part_name   TEXT;
+    moved       BIGINT;
+    created     INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        part_name := format('file_logs_%s', to_char(month_start, 'YYYYMM'));
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        IF to_regclass(part_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM file_logs_default WHERE logged_at >= month_start AND logged_at < month_end) THEN
+                EXECUTE format('CREATE TABLE %I (LIKE file_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name);
+                EXECUTE format(
+                    'ALTER TABLE %I ADD CONSTRAINT %I CHECK (logged_at >= %L AND logged_at < %L)',
+                    part_name, part_name || '_range', month_start, month_end
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM file_logs_default WHERE logged_at >= %L AND logged_at < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_end, part_name
+                );
+                GET DIAGNOSTICS moved = ROW_COUNT;
+                EXECUTE format(
+                    'ALTER TABLE file_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    part_name, month_start, month_end
+                );
+                EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', part_name, part_name || '_range');
+                RAISE NOTICE 'file_logs: moved % rows from file_logs_default into %', moved, part_name;
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF file_logs FOR VALUES FROM (%L) TO (%L)',
+                    part_name, month_start, month_end
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_file_logs_partitions(
+    COALESCE((SELECT min(logged_at) FROM file_logs_legacy), now())::DATE,
+    3
+);
+
+INSERT INTO file_logs (id, file_id, old_hash, new_hash, change_type, logged_at, detection_source)
+SELECT id, file_id, old_hash, new_hash, change_type, logged_at, detection_source
+FROM file_logs_legacy;
+
+DROP TABLE file_logs_legacy;
+
+CREATE TRIGGER trg_file_logs_latest_event
+    AFTER INSERT ON file_logs
+    FOR EACH ROW EXECUTE FUNCTION file_logs_update_latest_event();
+
+-- 사용자별 로그 보관 기간 (NULL이면 서버 기본값 LOG_RETENTION_DAYS)
+ALTER TABLE users ADD COLUMN IF NOT EXISTS log_retention_days INTEGER;
@@ -0,0 +1,29 @@
+-- 0006: 비동기 백업 작업 대기열
+--   - /api/gdrive/backup_file 은 검증한 내용을 로컬 스풀에 저장하고 작업만 등록 (202 응답)
+--   - backup_jobs.py의 워커가 작업을 가져가 Google Drive에 업로드
+--   - running 상태에서 next_attempt_at(임대 만료)이 지나면 다른 워커가 다시 가져감
+
+CREATE TABLE IF NOT EXISTS backup_jobs (
+    id              BIGSERIAL PRIMARY KEY,
+    user_id         INTEGER NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+    file_id         INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    relative_path   TEXT NOT NULL,
+    file_hash       VARCHAR(64) NOT NULL,
+    file_size       BIGINT NOT NULL,
+    is_modified     BOOLEAN NOT NULL DEFAULT FALSE,
+    change_time     TIMESTAMPTZ,
+    spool_path      TEXT NOT NULL,
+    status          VARCHAR(16) NOT NULL DEFAULT 'queued',  -- queued / running / succeeded / failed
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    bytes_uploaded  BIGINT NOT NULL DEFAULT 0,
+    drive_file_id   TEXT,
+    backup_id       INTEGER REFERENCES backups (id) ON DELETE SET NULL,
+    last_error      TEXT,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at     TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_backup_jobs_dispatch ON backup_jobs (next_attempt_at) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_backup_jobs_user ON backup_jobs (user_id, id);
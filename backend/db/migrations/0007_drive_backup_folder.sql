@@ -0,0 +1,5 @@
+-- 0007: 사용자별 Google Drive 백업 폴더 ID
+--   - 업로드마다 Drive에서 FIM_Backup 폴더를 검색하지 않도록 저장
+--   - 폴더 생성은 advisory lock 안에서 한 워커만 수행 (중복 폴더 방지)
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS drive_backup_folder_id TEXT;
@@ -0,0 +1,4 @@
+-- 0008: 백업 작업의 Drive resumable upload 세션 URI
+--   - 워커가 재시작되거나 재시도할 때 이미 전송한 부분부터 이어서 업로드
+
+ALTER TABLE backup_jobs ADD COLUMN IF NOT EXISTS upload_session_uri TEXT;
@@ -0,0 +1,6 @@
+-- 0009: 백업 작업을 스풀 파일이 있는 호스트에서만 처리
+--   - 스풀 디렉토리는 서버 로컬이므로 다른 인스턴스가 작업을 가져가면 스풀 파일이 없어 실패 처리됨
+--   - 워커는 자신의 BACKUP_SPOOL_HOST와 같은 작업만 가져감 (공유 스풀 디렉토리면 모든 인스턴스에 같은 값 설정)
+--   - 이 컬럼 추가 전에 등록된 작업은 NULL (어느 서버든 가져갈 수 있음)
+
+ALTER TABLE backup_jobs ADD COLUMN IF NOT EXISTS spool_host TEXT;
@@ -0,0 +1,90 @@
+# db/query_stats.py
+# 쿼리 실행 시간 / 행 수 통계 (워커 프로세스별)
+#   - 연결 풀의 cursor_factory로 TimedCursor를 사용하여 모든 cursor.execute / conn.execute를 측정
+#   - 쿼리 이름: cursor.stats_name (execute_query가 지정) 또는 호출한 함수 이름과 줄 번호
+#   - DB_SLOW_QUERY_MS 이상 걸린 쿼리는 느린 쿼리 로그로 출력
+import sys, threading, time
+import psycopg
+from config import DB_SLOW_QUERY_MS
+
+_SLOW_QUERY_PREVIEW = 200  # 느린 쿼리 로그에 출력할 SQL 길이
+
+
+class QueryStats:
+    """ 쿼리 이름별 호출 수 / 오류 수 / 누적·최대 시간 / 행 수 집계 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # name -> [호출 수, 오류 수, 누적 시간(초), 최대 시간(초), 행 수]
+
+    def record(self, name, elapsed, rows, error=False):
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = [0, 0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += int(error)
+            entry[2] += elapsed
+            entry[3] = max(entry[3], elapsed)
+            entry[4] += rows
+
+    def snapshot(self):
+        """
+        쿼리별 통계 (누적 시간이 큰 순)
+
+        :return: [{"name", "calls", "errors", "total_ms", "avg_ms", "max_ms", "rows"}, ...]
+        """
+
+        with self._lock:
+            items = [(name, list(entry)) for name, entry in self._stats.items()]
+        result = [{
+            "name": name,
+            "calls": calls,
+            "errors": errors,
+            "total_ms": round(total * 1000, 3),
+            "avg_ms": round(total * 1000 / calls, 3) if calls else 0.0,
+            "max_ms": round(longest * 1000, 3),
+            "rows": rows,
+        } for name, (calls, errors, total, longest, rows) in items]
+        result.sort(key=lambda item: item["total_ms"], reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_stats = QueryStats()
+
+
+def _caller_name():
+    # psycopg 내부(conn.execute 등)를 건너뛰고 실제로 쿼리를 실행한 함수를 찾음
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith("psycopg"):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}:{frame.f_lineno}"
+
+
+class TimedCursor(psycopg.Cursor):
+    """ 실행 시간과 행 수를 query_stats에 기록하는 커서 """
+
+    stats_name = None
+
+    def execute(self, query, params=None, **kwargs):
+        name = self.stats_name or _caller_name()
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, params, **kwargs)
+        except Exception:
+            query_stats.record(name, time.perf_counter() - start, 0, error=True)
+            raise
+
+        elapsed = time.perf_counter() - start
+        rows = max(self.rowcount, 0)
+        query_stats.record(name, elapsed, rows)
+        if DB_SLOW_QUERY_MS and elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            sql = query if isinstance(query, str) else repr(query)
+            print(f"⚠️ 느린 쿼리 {name}: {elapsed * 1000:.1f}ms, {rows}행 | {' '.join(sql.split())[:_SLOW_QUERY_PREVIEW]}")
+        return result
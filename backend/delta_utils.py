@@ -0,0 +1,273 @@
+# delta_utils.py
+# rsync 방식 델타 업로드 유틸리티 (클라이언트 api_client와 서버 app.py가 함께 사용)
+#   - 서버: 이전 백업 버전의 블록 시그니처(약한 Adler-32 + 강한 BLAKE2b)를 저장
+#   - 클라이언트: 롤링 체크섬으로 새 버전에서 일치하는 블록을 찾아 (블록 복사 / 리터럴) 델타 생성
+#   - 서버: 이전 버전 + 델타로 새 버전을 복원
+import hashlib, math, struct, zlib
+
+DELTA_MIN_SIZE = 1024 * 1024            # 이보다 작은 파일은 델타를 사용하지 않음 (바이트)
+MIN_BLOCK_SIZE = 4 * 1024
+MAX_BLOCK_SIZE = 256 * 1024
+STRONG_DIGEST_SIZE = 16
+COPY_BLOCK_SIZE = 64 * 1024
+
+_SIGNATURE_ENTRY = struct.Struct(">I%ds" % STRONG_DIGEST_SIZE)
+_ADLER_MOD = 65521
+
+# 델타 스트림 형식: MAGIC + 블록 크기(u32) + 명령 반복 + END
+#   COPY    : b"C" + 시작 블록(u32) + 블록 수(u32)
+#   LITERAL : b"L" + 길이(u32) + 데이터
+DELTA_MAGIC = b"FIMDELTA1"
+_OP_COPY, _OP_LITERAL, _OP_END = b"C", b"L", b"E"
+_U32 = struct.Struct(">I")
+_U32_PAIR = struct.Struct(">II")
+
+_MAX_LITERAL_BUFFER = 1024 * 1024       # 리터럴을 이 크기까지 모았다가 기록
+_COMPACT_THRESHOLD = 4 * 1024 * 1024    # 읽기 버퍼 정리 기준
+
+
+def choose_block_size(file_size):
+    """
+    파일 크기에 맞는 블록 크기 결정 (rsync처럼 약 sqrt(파일 크기), 2의 거듭제곱)
+
+    :param file_size: 파일 크기 (바이트)
+
+    :return: 블록 크기 (바이트)
+    """
+
+    target = max(1, int(math.sqrt(max(file_size, 1))))
+    block_size = 1 << (target - 1).bit_length()
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, block_size))
+
+
+def _strong_digest(data):
+    return hashlib.blake2b(data, digest_size=STRONG_DIGEST_SIZE).digest()
+
+
+def compute_signatures(stream, block_size):
+    """
+    스트림의 블록 시그니처 계산 (블록마다 Adler-32 + BLAKE2b-128, 20바이트)
+
+    :param stream: 읽을 스트림 (현재 위치부터 끝까지)
+    :param block_size: 블록 크기
+
+    :return: 패킹된 시그니처 (bytes)
+    """
+
+    entries = []
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        entries.append(_SIGNATURE_ENTRY.pack(zlib.adler32(block), _strong_digest(block)))
+    return b"".join(entries)
+
+
+def unpack_signatures(packed):
+    """
+    패킹된 시그니처를 (약한 체크섬, 강한 해시) 리스트로 변환
+
+    :param packed: compute_signatures의 결과
+
+    :return: [(weak, strong), ...]
+    """
+
+    return list(_SIGNATURE_ENTRY.iter_unpack(packed))
+
+
+class _DeltaWriter:
+    """ 델타 명령을 스트림에 기록 (연속된 블록 복사는 하나로 합침) """
+
+    def __init__(self, out, block_size):
+        self.out = out
+        self.size = 0
+        self._copy_start = None
+        self._copy_count = 0
+        self._write(DELTA_MAGIC + _U32.pack(block_size))
+
+    def _write(self, data):
+        self.out.write(data)
+        self.size += len(data)
+
+    def _flush_copy(self):
+        if self._copy_count:
+            self._write(_OP_COPY + _U32_PAIR.pack(self._copy_start, self._copy_count))
+            self._copy_start, self._copy_count = None, 0
+
+    def copy(self, block_index):
+        if self._copy_count and block_index == self._copy_start + self._copy_count:
+            self._copy_count += 1
+            return
+        self._flush_copy()
+        self._copy_start, self._copy_count = block_index, 1
+
+    def literal(self, data):
+        if not data:
+            return
+        self._flush_copy()
+        self._write(_OP_LITERAL + _U32.pack(len(data)))
+        self._write(bytes(data))
+
+    def close(self):
+        self._flush_copy()
+        self._write(_OP_END)
+
+
+def compute_delta(stream, block_size, signatures, base_size, out):
+    """
+    이전 버전의 시그니처를 기준으로 새 버전의 델타를 계산하여 기록
+        - 블록 경계에 맞지 않게 삽입/삭제된 내용도 롤링 체크섬으로 찾아냄
+        - 메모리에는 읽기 버퍼와 시그니처 색인만 유지
+
+    :param stream: 새 버전 파일 스트림
+    :param block_size: 이전 버전 시그니처의 블록 크기
+    :param signatures: unpack_signatures 결과
+    :param base_size: 이전 버전 파일 크기 (마지막 짧은 블록 비교용)
+    :param out: 델타를 기록할 스트림
+
+    :return: 기록한 델타 크기 (바이트)
+    """
+
+    lookup = {}
+    for index, (weak, strong) in enumerate(signatures):
+        lookup.setdefault(weak, {}).setdefault(strong, index)
+
+    tail_length = base_size % block_size
+    tail_index = len(signatures) - 1 if tail_length else None
+
+    writer = _DeltaWriter(out, block_size)
+    buf = bytearray()
+    pos = 0             # 현재 윈도우 시작 위치 (buf 기준)
+    literal_start = 0   # 아직 기록하지 않은 리터럴 시작 위치
+    eof = False
+    a = b = None        # 롤링 체크섬 상태 (None이면 새로 계산)
+
+    while True:
+        # 1. 윈도우 + 다음 1바이트가 버퍼에 있도록 채움
+        if len(buf) - pos <= block_size and not eof:
+            if pos >= _COMPACT_THRESHOLD:
+                writer.literal(buf[literal_start:pos])
+                del buf[:pos]
+                pos = literal_start = 0
+            chunk = stream.read(max(COPY_BLOCK_SIZE, block_size * 4))
+            if chunk:
+                buf.extend(chunk)
+                continue
+            eof = True
+
+        remaining = len(buf) - pos
+        if remaining == 0:
+            break
+
+        # 2. 남은 데이터가 블록보다 짧으면 이전 버전의 마지막 짧은 블록과만 비교
+        if remaining < block_size:
+            tail = bytes(buf[pos:])
+            if (tail_index is not None and remaining == tail_length
+                    and lookup.get(zlib.adler32(tail), {}).get(_strong_digest(tail)) == tail_index):
+                writer.literal(buf[literal_start:pos])
+                writer.copy(tail_index)
+                literal_start = len(buf)
+            break
+
+        # 3. 현재 윈도우가 이전 버전의 블록과 일치하는지 확인
+        if a is None:
+            weak = zlib.adler32(buf[pos:pos + block_size])
+            a, b = weak & 0xffff, weak >> 16
+        else:
+            weak = (b << 16) | a
+
+        candidates = lookup.get(weak)
+        if candidates:
+            index = candidates.get(_strong_digest(buf[pos:pos + block_size]))
+            if index is not None:
+                writer.literal(buf[literal_start:pos])
+                writer.copy(index)
+                pos += block_size
+                literal_start = pos
+                a = b = None
+                continue
+
+        # 4. 일치하지 않으면 1바이트 이동 (Adler-32 롤링 갱신)
+        if remaining == block_size:
+            # 마지막 윈도우: 더 이동할 수 없으므로 나머지는 리터럴
+            pos = len(buf)
+            break
+        out_byte, in_byte = buf[pos], buf[pos + block_size]
+        a = (a - out_byte + in_byte) % _ADLER_MOD
+        b = (b + a - 1 - block_size * out_byte) % _ADLER_MOD
+        pos += 1
+
+        if pos - literal_start >= _MAX_LITERAL_BUFFER:
+            writer.literal(buf[literal_start:pos])
+            literal_start = pos
+
+    writer.literal(buf[literal_start:])
+    writer.close()
+    return writer.size
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated delta stream")
+    return data
+
+
+def apply_delta(base_stream, delta_stream, out, digest=None):
+    """
+    이전 버전 + 델타로 새 버전을 복원하여 기록
+
+    :param base_stream: 이전 버전 스트림 (seek 가능)
+    :param delta_stream: 델타 스트림
+    :param out: 복원한 내용을 기록할 스트림
+    :param digest: 복원한 내용으로 갱신할 hashlib 객체 (선택)
+
+    :return: 복원한 크기 (바이트)
+
+    :raises: ValueError: 델타 형식이 잘못되었거나 이전 버전 범위를 벗어난 경우
+    """
+
+    if _read_exact(delta_stream, len(DELTA_MAGIC)) != DELTA_MAGIC:
+        raise ValueError("Invalid delta header")
+    block_size = _U32.unpack(_read_exact(delta_stream, _U32.size))[0]
+    if block_size <= 0:
+        raise ValueError("Invalid delta block size")
+
+    written = 0
+
+    def emit(data):
+        nonlocal written
+        out.write(data)
+        if digest is not None:
+            digest.update(data)
+        written += len(data)
+
+    while True:
+        op = _read_exact(delta_stream, 1)
+
+        if op == _OP_END:
+            return written
+
+        if op == _OP_COPY:
+            start, count = _U32_PAIR.unpack(_read_exact(delta_stream, _U32_PAIR.size))
+            base_stream.seek(start * block_size)
+            remaining = count * block_size
+            while remaining > 0:
+                data = base_stream.read(min(COPY_BLOCK_SIZE, remaining))
+                if not data:
+                    # 마지막 짧은 블록은 블록 크기보다 작을 수 있음
+                    if remaining < block_size:
+                        break
+                    raise ValueError("Delta references blocks beyond the base version")
+                emit(data)
+                remaining -= len(data)
+
+        elif op == _OP_LITERAL:
+            remaining = _U32.unpack(_read_exact(delta_stream, _U32.size))[0]
+            while remaining > 0:
+                data = _read_exact(delta_stream, min(COPY_BLOCK_SIZE, remaining))
+                emit(data)
+                remaining -= len(data)
+
+        else:
+            raise ValueError(f"Unknown delta operation: {op!r}")
@@ -1,81 +1,472 @@
-import io
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from google.auth.transport.requests import Request as GoogleAuthRequest
+import collections, json, os, re, threading, time
+from datetime import datetime, timedelta, timezone
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import HttpRequest, MediaIoBaseDownload, MediaIoBaseUpload
+from google.auth.transport.requests import AuthorizedSession, Request as GoogleAuthRequest
 from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
 from database import get_google_tokens_by_user_id, save_or_update_google_tokens
+from database import get_or_create_drive_folder_record, clear_drive_folder_record
 from core.app_instance import app
+from config import DRIVE_UPLOAD_CHUNK_SIZE, DRIVE_UPLOAD_NUM_RETRIES, DRIVE_SERVICE_CACHE_TTL, DRIVE_SERVICE_CACHE_SIZE, DRIVE_TOKEN_REFRESH_MARGIN
 
-def get_google_drive_service_for_user(user_id: int):
-    """
-    특정 사용자에 대한 Google Drive API 서비스 객체를 생성
-        - 액세스 토큰이 만료되었을 경우 자동으로 리프레시 처리
-        - 유호한 자격 증명이 있으면 Google Drive 서비스 객체를 반환
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024 # Google Drive 다운로드 청크 크기 (바이트)
+DOWNLOAD_TIMEOUT = (10, 60)            # 스트리밍 다운로드 (연결, 읽기) 제한 시간 (초)
+DRIVE_MEDIA_URL = "https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
+KST = timezone(timedelta(hours=9))
+BACKUP_FOLDER_NAME = "FIM_Backup"
+_UPLOADED_RANGE = re.compile(r"^bytes=0-(\d+)$")  # resumable upload 세션 조회 응답의 Range 헤더
 
-    :param user_id: 사용자 ID
+class _DriveClient:
+    """ 사용자 1명의 자격 증명과 Drive 서비스 객체 (캐시 항목) """
 
-    :return: Google Drive 서비스 객체 or None
+    def __init__(self, user_id, creds, service):
+        self.user_id = user_id
+        self.creds = creds
+        self.service = service
+        self.loaded_at = time.monotonic()
+        self.lock = threading.Lock()  # 토큰 갱신은 한 스레드만
+        self._session = None
+
+    def session(self):
+        """ 미디어 스트리밍 다운로드용 AuthorizedSession (같은 자격 증명 사용, 연결 재사용) """
+        if self._session is None:
+            self._session = AuthorizedSession(self.creds)
+        return self._session
+
+
+_clients = collections.OrderedDict()  # user_id -> _DriveClient
+_clients_lock = threading.Lock()
+_refresher_pid = None
+_drive_discovery_doc = None
+_backup_folder_ids = {}  # user_id -> 백업 폴더 ID (DB users.drive_backup_folder_id의 프로세스 캐시, _clients_lock으로 보호)
+
+
+def _utcnow():
+    # google-auth의 Credentials.expiry는 naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _get_discovery_doc():
+    """ 라이브러리에 포함된 Drive v3 discovery 문서 (네트워크 요청 없음, 프로세스당 1회 로드) """
+    global _drive_discovery_doc
+    if _drive_discovery_doc is None:
+        _drive_discovery_doc = discovery_cache.get_static_doc("drive", "v3")
+    return _drive_discovery_doc
+
+
+def _build_drive_service(creds):
+    """
+    자격 증명으로 Drive 서비스 객체 생성
+        - discovery 문서는 정적 문서를 사용 (없으면 build가 직접 조회)
+        - httplib2.Http는 스레드 안전하지 않으므로 요청마다 새 AuthorizedHttp 사용 (서비스 객체는 스레드 간 공유)
     """
-    
-    # 1. 사용자 토큰 정보 조회
+
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(AuthorizedHttp(creds, http=httplib2.Http()), *args, **kwargs)
+
+    base_http = AuthorizedHttp(creds, http=httplib2.Http())
+    doc = _get_discovery_doc()
+    if doc is not None:
+        return build_from_document(doc, http=base_http, requestBuilder=build_request)
+    return build('drive', 'v3', http=base_http, requestBuilder=build_request, cache_discovery=False)
+
+
+def _load_drive_client(user_id):
+    """ DB의 토큰으로 자격 증명과 서비스 객체 생성 (캐시 미스 시) """
     user_google_tokens = get_google_tokens_by_user_id(user_id)
     if not user_google_tokens or not user_google_tokens.get("google_access_token"):
         print(f"No Google OAuth token found for user {user_id}")
         return None
-    
-    # 2. Google API 자격 증명 객체 생성
+
+    expiry = user_google_tokens.get("google_token_expires_at")
+    if expiry is not None and expiry.tzinfo is not None:
+        expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+
     creds = Credentials(
         token=user_google_tokens['google_access_token'],                # 액세스 토큰
         refresh_token=user_google_tokens.get('google_refresh_token'),   # 리프레시 토큰
         token_uri='https://oauth2.googleapis.com/token',                # 토큰 갱신 URL
         client_id=app.config["GOOGLE_OAUTH_CLIENT_ID"],                 # 클라이언트 ID
         client_secret=app.config["GOOGLE_OAUTH_CLIENT_SECRET"],         # 클라이언트 시크릿
-        scopes=["https://www.googleapis.com/auth/drive.file"]           # 필요한 권한 범위
+        scopes=["https://www.googleapis.com/auth/drive.file"],          # 필요한 권한 범위
+        expiry=expiry,                                                  # 액세스 토큰 만료 시간
     )
-    
-    # 3. 토큰이 만료되었을 경우 리프레시 처리
-    if creds.expired:
-        if creds.refresh_token:
-            try:
-                creds.refresh(GoogleAuthRequest()) # Google 서버에 요청하여 토큰 갱신
-                # 갱신된 토큰 정보를 DB에 업데이트
-                save_or_update_google_tokens(
-                    user_id,
-                    creds.token,
-                    user_google_tokens.get("google_refresh_token"),  # DB 값 유지
-                    creds.expiry                                     # 새 만료 시간
-                )
-            except Exception as e:
-                print(f"❌ Failed to refresh token for user {user_id}: {e}")
-                return None
-        else:
-            print(f"⚠️ No refresh token for user {user_id}, re-authentication required.")
+    return _DriveClient(user_id, creds, _build_drive_service(creds))
+
+
+def _refresh_credentials(client, margin=0):
+    """
+    토큰이 만료되었거나 margin(초) 안에 만료되면 갱신하고 DB에 저장
+
+    :return: 사용 가능한 토큰이 있으면 True
+    """
+
+    with client.lock:
+        creds = client.creds
+        if creds.expiry is None or creds.expiry - timedelta(seconds=margin) > _utcnow():
+            return True
+        if not creds.refresh_token:
+            if creds.expired:
+                print(f"⚠️ No refresh token for user {client.user_id}, re-authentication required.")
+                return False
+            return True
+        try:
+            creds.refresh(GoogleAuthRequest()) # Google 서버에 요청하여 토큰 갱신
+        except Exception as e:
+            print(f"❌ Failed to refresh token for user {client.user_id}: {e}")
+            return False
+        # 갱신된 토큰 정보를 DB에 업데이트 (리프레시 토큰은 DB 값 유지)
+        save_or_update_google_tokens(client.user_id, creds.token, None, creds.expiry)
+        return True
+
+
+def _refresh_loop():
+    """ 곧 만료될 토큰을 미리 갱신 (업로드 요청이 토큰 갱신을 기다리지 않도록) """
+    interval = max(10.0, DRIVE_TOKEN_REFRESH_MARGIN / 3)
+    while True:
+        time.sleep(interval)
+        with _clients_lock:
+            clients = list(_clients.values())
+        for client in clients:
+            if not _refresh_credentials(client, DRIVE_TOKEN_REFRESH_MARGIN):
+                invalidate_drive_service(client.user_id)
+
+
+def _ensure_refresher():
+    # gunicorn 워커가 fork된 뒤 워커마다 갱신 스레드 시작
+    global _refresher_pid
+    if _refresher_pid == os.getpid():
+        return
+    _refresher_pid = os.getpid()
+    threading.Thread(target=_refresh_loop, name="drive-token-refresher", daemon=True).start()
+
+
+def invalidate_drive_service(user_id: int) -> None:
+    """ 사용자의 캐시된 Drive 서비스 제거 (OAuth 재로그인 등으로 토큰이 바뀐 경우) """
+    with _clients_lock:
+        _clients.pop(user_id, None)
+
+
+def _get_drive_client(user_id: int):
+    """
+    사용자의 캐시된 자격 증명/서비스 (get_google_drive_service_for_user, open_drive_download 공용)
+
+    :return: _DriveClient or None
+    """
+
+    _ensure_refresher()
+
+    # 1. 캐시 조회
+    with _clients_lock:
+        client = _clients.get(user_id)
+        if client is not None and time.monotonic() - client.loaded_at > DRIVE_SERVICE_CACHE_TTL:
+            del _clients[user_id]
+            client = None
+        if client is not None:
+            _clients.move_to_end(user_id)
+
+    # 2. 캐시 미스: DB의 토큰으로 자격 증명/서비스 생성
+    if client is None:
+        client = _load_drive_client(user_id)
+        if client is None:
             return None
-    
-    # 4. Google Drive API 서비스 객체 생성 및 반환
-    return build('drive', 'v3', credentials=creds)
+        with _clients_lock:
+            _clients[user_id] = client
+            while len(_clients) > DRIVE_SERVICE_CACHE_SIZE:
+                _clients.popitem(last=False)
+
+    # 3. 토큰이 만료되었으면 갱신 (실패 시 캐시에서 제거)
+    if not _refresh_credentials(client):
+        invalidate_drive_service(user_id)
+        return None
+
+    return client
+
+def get_google_drive_service_for_user(user_id: int):
+    """
+    특정 사용자에 대한 Google Drive API 서비스 객체를 반환 (사용자별 캐시)
+        - 캐시 미스 또는 DRIVE_SERVICE_CACHE_TTL이 지나면 DB의 토큰으로 다시 생성
+        - 액세스 토큰이 만료되었을 경우 자동으로 리프레시 처리 (보통은 백그라운드에서 만료 전에 미리 갱신)
+        - 반환된 서비스 객체는 여러 스레드에서 함께 사용해도 안전
+
+    :param user_id: 사용자 ID
+
+    :return: Google Drive 서비스 객체 or None
+    """
+
+    client = _get_drive_client(user_id)
+    return client.service if client else None
+
+def open_drive_download(user_id: int, file_id: str, byte_range=None):
+    """
+    Google Drive 파일 내용을 스트리밍으로 여는 요청 (본문은 호출한 쪽에서 조금씩 읽음)
+        - Range 헤더를 그대로 전달하여 부분/이어받기 다운로드 지원 (206 / 416 응답)
+        - 압축 전송을 끄고 받아 Content-Length가 실제 파일 크기와 같도록 함
+
+    :param user_id: 사용자 ID
+    :param file_id: 다운로드할 파일의 Google Drive ID
+    :param byte_range: 전달할 Range 헤더 값 (예: "bytes=1048576-"), 없으면 전체
 
-def download_file_from_google_drive(service, file_id: str):
+    :return: requests.Response (stream=True, 사용 후 close 필요) or None (Drive 연동 없음)
     """
-    Google Drive에서 지정된 파일을 다운로드하여 바이트 형태로 변환
+
+    client = _get_drive_client(user_id)
+    if client is None:
+        return None
+
+    headers = {"Accept-Encoding": "identity"}
+    if byte_range:
+        headers["Range"] = byte_range
+    return client.session().get(
+        DRIVE_MEDIA_URL.format(file_id=file_id),
+        headers=headers,
+        stream=True,
+        timeout=DOWNLOAD_TIMEOUT,
+    )
+
+def download_file_to_stream(service, file_id: str, out_stream) -> bool:
+    """
+    Google Drive 파일을 청크 단위로 내려받아 스트림(임시 파일 등)에 기록
+        - 파일 전체를 메모리에 올리지 않음
 
     :param service: 인증된 Google Drive API 서비스 객체
     :param file_id: 다운로드할 파일의 Google Drive ID
+    :param out_stream: 내용을 기록할 스트림 (완료 후 처음 위치로 되감음)
 
-    :return: file content in bytes or None
+    :return: 성공 여부 (True, False)
     """
 
     try:
-        request = service.files().get_media(fileId=file_id) # 1. 다운로드 요청 객체 생성
-        file_io = io.BytesIO()                              # 2. 다운로드 데이터를 저장할 메모리 버퍼 생성
-        downloader = MediaIoBaseDownload(file_io, request)  # 3. Google API의 다운로드 도우미 객체 생성
-        # 4. 다운로드 진행 (chunk 단위로 반복)
+        request = service.files().get_media(fileId=file_id)
+        downloader = MediaIoBaseDownload(out_stream, request, chunksize=DOWNLOAD_CHUNK_SIZE)
         done = False
         while not done:
-            status, done = downloader.next_chunk()
-            print(f"Download {int(status.progress() * 100)}%")
-        file_io.seek(0)
-        return file_io.read()
+            _, done = downloader.next_chunk()
+        out_stream.seek(0)
+        return True
     except Exception as e:
-        print(f"Error downloading file from Google Drive: {e}")
-        return None
\ No newline at end of file
+        print(f"Error downloading file {file_id} from Google Drive: {e}")
+        return False
+
+def get_or_create_drive_folder_id(service, folder_name="FIM_Backup"):
+    """
+
+    :param service: 구글 드라이브 서비스
+    :param folder_name: 디렉토리 이름
+
+    :return:
+    """
+
+    query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
+    response = service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+    folders = response.get('files', [])
+    if folders:
+        return folders[0]['id']
+    else:
+        file_metadata = {
+            'name': folder_name,
+            'mimeType': 'application/vnd.google-apps.folder'
+        }
+        folder = service.files().create(body=file_metadata, fields='id').execute()
+        return folder.get('id')
+
+def _query_upload_session(upload_request, session_uri, total_size):
+    """
+    이전 resumable upload 세션이 받은 위치 조회 (빈 PUT + Content-Range: bytes */전체 크기)
+
+    :param upload_request: 같은 자격 증명으로 만든 업로드 요청 (HttpRequest)
+    :param session_uri: 이전 업로드 세션 URI
+    :param total_size: 업로드할 전체 크기 (바이트)
+
+    :return: ("complete", 생성된 파일 정보) / ("incomplete", 서버가 받은 바이트 수) / ("expired", None)
+
+    :raises: HttpError: 그 외 오류 응답
+    """
+
+    resp, content = upload_request.http.request(
+        session_uri,
+        method="PUT",
+        body="",
+        headers={"Content-Length": "0", "Content-Range": f"bytes */{total_size}"},
+    )
+    if resp.status in (200, 201):
+        return "complete", json.loads(content)
+    if resp.status == 308:
+        match = _UPLOADED_RANGE.match(resp.get("range", ""))
+        return "incomplete", int(match.group(1)) + 1 if match else 0
+    if resp.status in (404, 410):
+        return "expired", None
+    raise HttpError(resp, content, uri=session_uri)
+
+def upload_file_to_google_drive(service, drive_folder_id, client_relative_path, file_stream, is_modified=False,  change_time=None,
+                                progress_callback=None, resume_uri=None, session_callback=None):
+    """
+    구글 드라이브에 파일 업로드 (resumable upload)
+        - 파일 스트림을 DRIVE_UPLOAD_CHUNK_SIZE 단위로 나누어 전송 (파일 전체를 메모리에 올리지 않음)
+        - 청크 전송이 일시적으로 실패하면 그 청크만 재시도 (DRIVE_UPLOAD_NUM_RETRIES)
+        - resume_uri가 있으면 서버가 받은 위치를 조회한 뒤 이어서 전송 (세션이 만료되었으면 처음부터)
+        - 새 업로드 세션이 시작되면 session_callback(세션 URI), 청크를 보낼 때마다 progress_callback(보낸 바이트 수) 호출
+
+    :param service: 구글 드라이브 서비스
+    :param drive_folder_id:
+    :param client_relative_path:
+    :param file_stream: 업로드할 파일 스트림 (seek 가능한 file-like 객체)
+    :param is_modified:
+    :param change_time:
+    :param progress_callback: 업로드 진행 콜백 (선택)
+    :param resume_uri: 이어서 진행할 이전 업로드 세션 URI (선택)
+    :param session_callback: 업로드 세션 URI 저장 콜백 (선택, 작업 재시작 시 이어서 전송하기 위함)
+
+    :return:
+    """
+
+    original_filename = os.path.basename(client_relative_path)
+    base_name, ext = os.path.splitext(original_filename)
+
+    if is_modified:
+        if change_time:
+            # 문자열이면 datetime 변환 시도
+            if isinstance(change_time, str):
+                try:
+                    change_dt = datetime.strptime(change_time, "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    change_dt = datetime.now()
+            else:
+                change_dt = change_time
+        else:
+            change_dt = datetime.now()
+
+        if change_dt.tzinfo is None:
+            change_dt = change_dt.replace(tzinfo=KST)
+        change_dt = change_dt.astimezone(KST)
+
+        timestamp = change_dt.strftime("_%Y%m%d_%H%M%S")
+        drive_filename = f"{base_name}{timestamp}{ext}"
+    else:
+        drive_filename = original_filename
+
+    file_metadata = {
+        'name': drive_filename,
+        'parents': [drive_folder_id]
+    }
+    media = MediaIoBaseUpload(
+        file_stream,
+        mimetype='application/octet-stream',
+        chunksize=DRIVE_UPLOAD_CHUNK_SIZE,
+        resumable=True,
+    )
+
+    upload_request = service.files().create(body=file_metadata, media_body=media, fields='id, name, webViewLink')
+    if resume_uri:
+        # 이전 세션이 받은 위치를 조회하여 그 다음 바이트부터 전송
+        state, value = _query_upload_session(upload_request, resume_uri, media.size())
+        if state == "complete":
+            if progress_callback:
+                progress_callback(media.size())
+            print(f"File already uploaded to Google Drive: ID '{value.get('id')}', Name: '{value.get('name')}'")
+            return value
+        if state == "expired":
+            print(f"Upload session expired for '{client_relative_path}', restarting upload")
+            resume_uri = None
+        else:
+            upload_request.resumable_uri = resume_uri
+            upload_request.resumable_progress = value
+
+    reported_uri = resume_uri
+    created_file = None
+    while created_file is None:
+        try:
+            status, created_file = upload_request.next_chunk(num_retries=DRIVE_UPLOAD_NUM_RETRIES)
+        except HttpError as e:
+            if resume_uri and upload_request.resumable_uri == resume_uri and e.resp.status in (404, 410):
+                # 이전 업로드 세션 만료 -> 새 세션으로 처음부터
+                print(f"Upload session expired for '{client_relative_path}', restarting upload")
+                upload_request.resumable_uri = None
+                upload_request.resumable_progress = 0
+                resume_uri = None
+                continue
+            raise
+
+        if session_callback and upload_request.resumable_uri and upload_request.resumable_uri != reported_uri:
+            reported_uri = upload_request.resumable_uri
+            session_callback(reported_uri)
+        if status and progress_callback:
+            progress_callback(status.resumable_progress)
+    print(f"File uploaded to Google Drive: ID '{created_file.get('id')}', Name: '{created_file.get('name')}', Link: {created_file.get('webViewLink')}")
+    return created_file
+
+
+def get_backup_folder_id(service, user_id: int):
+    """
+    사용자의 백업 폴더 ID (프로세스 캐시 -> DB -> Drive 검색/생성 순)
+        - Drive 요청은 폴더 ID가 DB에 없을 때만 수행
+
+    :param service: 구글 드라이브 서비스
+    :param user_id: 사용자 ID
+
+    :return: 폴더 ID or None
+    """
+
+    with _clients_lock:
+        folder_id = _backup_folder_ids.get(user_id)
+    if folder_id:
+        return folder_id
+
+    # DB/Drive 요청 중에는 lock을 잡지 않음 (폴더 생성 중복은 DB advisory lock이 막음)
+    folder_id = get_or_create_drive_folder_record(
+        user_id, lambda: get_or_create_drive_folder_id(service, BACKUP_FOLDER_NAME)
+    )
+    if folder_id:
+        with _clients_lock:
+            _backup_folder_ids[user_id] = folder_id
+    return folder_id
+
+
+def invalidate_backup_folder_id(user_id: int, folder_id: str) -> None:
+    """ Drive에서 사라진 백업 폴더 ID를 캐시와 DB에서 제거 """
+    with _clients_lock:
+        if _backup_folder_ids.get(user_id) == folder_id:
+            _backup_folder_ids.pop(user_id, None)
+    clear_drive_folder_record(user_id, folder_id)
+
+
+def upload_file_to_backup_folder(service, user_id: int, client_relative_path, file_stream, is_modified=False,
+                                 change_time=None, progress_callback=None, resume_uri=None, session_callback=None):
+    """
+    사용자의 백업 폴더에 파일 업로드
+        - 저장된 폴더가 삭제되어 Drive가 404를 반환하면 폴더를 다시 찾거나 만든 뒤 한 번 재시도
+
+    :param service: 구글 드라이브 서비스
+    :param user_id: 사용자 ID
+    :param client_relative_path: 파일의 상대 경로
+    :param file_stream: 업로드할 파일 스트림 (seek 가능)
+    :param is_modified: 파일의 수정 여부
+    :param change_time: 파일의 변경 시간
+    :param progress_callback: 업로드 진행 콜백 (선택)
+    :param resume_uri: 이어서 진행할 이전 업로드 세션 URI (선택)
+    :param session_callback: 업로드 세션 URI 저장 콜백 (선택)
+
+    :return: 업로드된 파일 정보 딕셔너리
+
+    :raises: RuntimeError: 백업 폴더를 준비하지 못한 경우
+    """
+
+    for attempt in range(2):
+        folder_id = get_backup_folder_id(service, user_id)
+        if not folder_id:
+            raise RuntimeError(f"Failed to create {BACKUP_FOLDER_NAME} folder")
+        try:
+            return upload_file_to_google_drive(service, folder_id, client_relative_path, file_stream,
+                                               is_modified, change_time, progress_callback,
+                                               resume_uri, session_callback)
+        except HttpError as e:
+            if e.resp.status != 404 or attempt > 0:
+                raise
+            print(f"⚠️ Backup folder '{folder_id}' not found for user {user_id}, looking it up again")
+            invalidate_backup_folder_id(user_id, folder_id)
+            file_stream.seek(0)
+            resume_uri = None  # 이전 폴더로 시작한 세션은 사용하지 않음
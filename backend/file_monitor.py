@@ -1,4 +1,4 @@
-import os, time, schedule
+import asyncio, contextlib, os, time
 import api_client
 import sys
 import traceback
@@ -7,7 +7,7 @@ from dateutil import parser as date_parser
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from hash_calculator import calculate_file_hash
+from agent_runtime import AgentRuntime
 from config import USE_WATCHDOG
 
 
@@ -100,13 +100,21 @@ def show_notification(title, message):
 
 # --- Watchdog 이벤트 핸들러 ---
 class FIMEventHandler(FileSystemEventHandler):
-    def __init__(self, base_path, api_client_instance):
+    """
+    watchdog 이벤트 핸들러
+        - watchdog 스레드에서는 필터링/디바운싱만 하고 실제 처리는 런타임의 이벤트 루프로 넘김
+        - 같은 파일의 이벤트는 경로별 잠금으로 순서대로 처리하고, 다른 파일은 동시에 처리
+    """
+
+    def __init__(self, base_path, api_client_instance, runtime):
         self.base_path_str = str(base_path)
         self.api_client = api_client_instance
+        self.runtime = runtime
         self.last_event_time = {}
         self.MODIFIED_IGNORE_THRESHOLD_AFTER_CREATE = 10.0
         self.EVENT_DEBOUNCING_TIME = 2.0
         self.last_sent_hash = {}
+        self._path_locks = {}
 
     def _get_relative_path(self, src_path):
         """ 기본 경로로부터 상대 경로 계산, OS 독립적인 구분자 사용 """
@@ -125,6 +133,21 @@ class FIMEventHandler(FileSystemEventHandler):
         self.last_event_time[norm_event_path] = current_time
         return True
 
+    @contextlib.asynccontextmanager
+    async def _path_lock(self, relative_path):
+        """ 경로별 asyncio 잠금 (루프 안에서만 사용, 해제 시 기다리는 작업이 없으면 항목 삭제) """
+        entry = self._path_locks.get(relative_path)
+        if entry is None:
+            entry = self._path_locks[relative_path] = [asyncio.Lock(), 0]  # [잠금, 사용/대기 중인 작업 수]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._path_locks[relative_path]
+
     def _is_temporary_file(self, filepath):
         """
         파일 경로가 임시파일인지 확인
@@ -154,7 +177,7 @@ class FIMEventHandler(FileSystemEventHandler):
         return any(temp_patterns)
 
     def on_created(self, event):
-        """ 파일 생성 이벤트 처리 """
+        """ 파일 생성 이벤트 처리 (watchdog 스레드 -> 이벤트 루프) """
 
         if event.is_directory or self._is_temporary_file(event.src_path):
             return
@@ -162,121 +185,131 @@ class FIMEventHandler(FileSystemEventHandler):
         if not self._should_process(event.src_path):
             return
 
-        relative_path = self._get_relative_path(event.src_path)
+        self.runtime.submit(self._handle_created(event.src_path, datetime.now(timezone.utc)))
+
+    async def _handle_created(self, src_path, change_time):
+        relative_path = self._get_relative_path(src_path)
         absolute_path = str(FIM_BASE_DIR / relative_path)
-        change_time = datetime.now(timezone.utc)
 
         print(f"[{datetime.now()}] [WATCHDOG] 파일 생성됨: {relative_path}")
 
-        try:
-            time.sleep(1.0)  # 파일 쓰기 완료 대기
-            new_hash = calculate_file_hash(absolute_path)
-            if new_hash:
-                with open(absolute_path, 'rb') as f:
-                    file_content_bytes = f.read()
-
-                print(f"  ㄴ Google Drive 백업 시도 (생성됨): {relative_path}")
-                backup_success = self.api_client.request_gdrive_backup(
-                    relative_path,
-                    file_content_bytes,
-                    new_hash,
-                    is_modified=False,
-                    change_time=change_time,
-                )
-                if backup_success:
-                    self.last_sent_hash[relative_path] = new_hash
-                    show_notification(
-                        "FIM: 파일 생성됨",
-                        f"파일이 백업되었습니다: {relative_path}"
+        async with self._path_lock(relative_path):
+            try:
+                await asyncio.sleep(1.0)  # 파일 쓰기 완료 대기
+                new_hash = await self.runtime.hash_file(absolute_path)
+                if new_hash:
+                    print(f"  ㄴ Google Drive 백업 시도 (생성됨): {relative_path}")
+                    backup_success = await self.runtime.call_api(
+                        self.api_client.request_gdrive_backup,
+                        relative_path,
+                        absolute_path,
+                        new_hash,
+                        is_modified=False,
+                        change_time=change_time,
                     )
+                    if backup_success:
+                        self.last_sent_hash[relative_path] = new_hash
+                        await self.runtime.call_blocking(
+                            show_notification,
+                            "FIM: 파일 생성됨",
+                            f"파일이 백업되었습니다: {relative_path}"
+                        )
 
-                if not backup_success:
-                    print(f"    ㄴ Google Drive 백업 요청 실패.")
-            else:
-                print(f"  ㄴ 오류: 해시 계산 실패 ({relative_path})")
+                    if not backup_success:
+                        print(f"    ㄴ Google Drive 백업 요청 실패.")
+                else:
+                    print(f"  ㄴ 오류: 해시 계산 실패 ({relative_path})")
 
-        except Exception as e:
-            print(f"  ㄴ 오류 (on_created 처리 중 {relative_path}): {e}")
+            except Exception as e:
+                print(f"  ㄴ 오류 (on_created 처리 중 {relative_path}): {e}")
 
     def on_modified(self, event):
-        """ 파일 수정 이벤트 처리 """
+        """ 파일 수정 이벤트 처리 (watchdog 스레드 -> 이벤트 루프) """
         if event.is_directory or self._is_temporary_file(event.src_path):
             return
 
         if not self._should_process(event.src_path):
             return
 
-        relative_path = self._get_relative_path(event.src_path)
+        self.runtime.submit(self._handle_modified(event.src_path, datetime.now(timezone.utc)))
+
+    async def _handle_modified(self, src_path, change_time):
+        relative_path = self._get_relative_path(src_path)
         absolute_path = str(FIM_BASE_DIR / relative_path)
-        change_time = datetime.now(timezone.utc)
         print(f"[{datetime.now()}] [WATCHDOG] 파일 수정됨: {relative_path}")
 
-        try:
-            time.sleep(0.5)  # 파일 쓰기 완료 대기
-            new_hash = calculate_file_hash(absolute_path)
-            if new_hash:
-                last_hash = self.last_sent_hash.get(relative_path)
-                if last_hash == new_hash:
-                    return
-
-                with open(absolute_path, 'rb') as f:
-                    file_content_bytes = f.read()
-
-                print(f"  ㄴ Google Drive 백업 시도 (수정됨): {relative_path}")
-                backup_success = self.api_client.request_gdrive_backup(
-                    relative_path,
-                    file_content_bytes,
-                    new_hash,
-                    is_modified=True,
-                    change_time=change_time,
-                )
-                if backup_success:
-                    self.last_sent_hash[relative_path] = new_hash
-                    show_notification(
-                        "FIM: 파일 수정됨",
-                        f"새 버전이 백업되었습니다: {relative_path}"
+        async with self._path_lock(relative_path):
+            try:
+                await asyncio.sleep(0.5)  # 파일 쓰기 완료 대기
+                new_hash = await self.runtime.hash_file(absolute_path)
+                if new_hash:
+                    last_hash = self.last_sent_hash.get(relative_path)
+                    if last_hash == new_hash:
+                        return
+
+                    print(f"  ㄴ Google Drive 백업 시도 (수정됨): {relative_path}")
+                    backup_success = await self.runtime.call_api(
+                        self.api_client.request_gdrive_backup,
+                        relative_path,
+                        absolute_path,
+                        new_hash,
+                        is_modified=True,
+                        change_time=change_time,
                     )
+                    if backup_success:
+                        self.last_sent_hash[relative_path] = new_hash
+                        await self.runtime.call_blocking(
+                            show_notification,
+                            "FIM: 파일 수정됨",
+                            f"새 버전이 백업되었습니다: {relative_path}"
+                        )
 
-                if not backup_success:
-                    print(f"    ㄴ Google Drive 백업 요청 실패 (수정됨).")
-            else:
-                print(f"  ㄴ 오류: 해시 계산 실패 ({relative_path})")
+                    if not backup_success:
+                        print(f"    ㄴ Google Drive 백업 요청 실패 (수정됨).")
+                else:
+                    print(f"  ㄴ 오류: 해시 계산 실패 ({relative_path})")
 
-        except Exception as e:
-            print(f"  ㄴ 오류 (on_modified 처리 중 {relative_path}): {e}")
+            except Exception as e:
+                print(f"  ㄴ 오류 (on_modified 처리 중 {relative_path}): {e}")
 
     def on_deleted(self, event):
-        """ 파일 삭제 이벤트 처리 """
+        """ 파일 삭제 이벤트 처리 (watchdog 스레드 -> 이벤트 루프) """
         if event.is_directory or self._is_temporary_file(event.src_path):
             return
 
-        relative_path = self._get_relative_path(event.src_path)
-        print(f"[{datetime.now(timezone.utc)}] [WATCHDOG] 파일 삭제됨: {relative_path}")
+        self.runtime.submit(self._handle_deleted(event.src_path))
 
-        success = self.api_client.report_file_deleted_on_server(
-            relative_path, detection_source="watchdog"
-        )
-        if success:
-            print(f"  ㄴ 서버에 삭제 보고 성공: {relative_path}")
-            show_notification(
-                "FIM: 파일 삭제됨",
-                f"파일 삭제가 서버에 보고되었습니다: {relative_path}"
-            )
-        else:
-            print(f"  ㄴ 서버에 삭제 보고 실패: {relative_path}")
+    async def _handle_deleted(self, src_path):
+        relative_path = self._get_relative_path(src_path)
+        print(f"[{datetime.now(timezone.utc)}] [WATCHDOG] 파일 삭제됨: {relative_path}")
 
-        if relative_path in self.last_sent_hash:
+        async with self._path_lock(relative_path):
             try:
-                del self.last_sent_hash[relative_path]
-            except KeyError:
-                pass
+                success = await self.runtime.call_api(
+                    self.api_client.report_file_deleted_on_server,
+                    relative_path, detection_source="watchdog"
+                )
+            except Exception as e:
+                print(f"  ㄴ 오류 (on_deleted 처리 중 {relative_path}): {e}")
+                success = False
+
+            if success:
+                print(f"  ㄴ 서버에 삭제 보고 성공: {relative_path}")
+                await self.runtime.call_blocking(
+                    show_notification,
+                    "FIM: 파일 삭제됨",
+                    f"파일 삭제가 서버에 보고되었습니다: {relative_path}"
+                )
+            else:
+                print(f"  ㄴ 서버에 삭제 보고 실패: {relative_path}")
+
+            self.last_sent_hash.pop(relative_path, None)
 
     def on_moved(self, event):
         """
         파일 이동/이름 변경 이벤트 처리.
         '안전한 저장' 패턴(임시 파일 -> 원본 파일)을 '수정'으로 간주하여 처리
         """
-        backup_performed_or_skipped = False
         if event.is_directory or self._is_temporary_file(event.src_path) or self._is_temporary_file(event.dest_path):
             print(f"[{datetime.now()}] [WATCHDOG] 디렉토리 이동 감지 (현재 미처리): {event.src_path} -> {event.dest_path}")
             return
@@ -284,80 +317,89 @@ class FIMEventHandler(FileSystemEventHandler):
         if not self._should_process(event.dest_path):
             return
 
+        self.runtime.submit(self._handle_moved(event.src_path, event.dest_path, datetime.now(timezone.utc)))
+
+    async def _handle_moved(self, src_path, dest_path, change_time):
+        backup_performed_or_skipped = False
+
         # 이동 이벤트의 최종 목적지 파일을 기준으로 '수정'된 것으로 간주
-        relative_path = self._get_relative_path(event.dest_path)
+        relative_path = self._get_relative_path(dest_path)
         absolute_path = str(FIM_BASE_DIR / relative_path)
-        change_time = datetime.now(timezone.utc)
         print(f"[{datetime.now()}] [WATCHDOG] 파일 이동 감지 -> '수정'으로 처리: {relative_path}")
 
-        try:
-            # 파일 쓰기가 완전히 끝날 때까지 잠시 대기
-            time.sleep(1.0)
-            new_hash = calculate_file_hash(absolute_path)
-
-            if new_hash:
-                last_hash = self.last_sent_hash.get(relative_path)
-                if last_hash == new_hash:
-                    backup_performed_or_skipped = True
-                else:
-                    with open(absolute_path, 'rb') as f:
-                        file_content_bytes = f.read()
+        async with self._path_lock(relative_path):
+            try:
+                # 파일 쓰기가 완전히 끝날 때까지 잠시 대기
+                await asyncio.sleep(1.0)
+                new_hash = await self.runtime.hash_file(absolute_path)
 
-                    print(f"  ㄴ Google Drive 백업 시도 (이동으로 인한 수정): {relative_path}")
-                    backup_success = self.api_client.request_gdrive_backup(
-                        relative_path,
-                        file_content_bytes,
-                        new_hash,
-                        is_modified=True,
-                        change_time=change_time,
-                    )
-                    if backup_success:
-                        self.last_sent_hash[relative_path] = new_hash
+                if new_hash:
+                    last_hash = self.last_sent_hash.get(relative_path)
+                    if last_hash == new_hash:
                         backup_performed_or_skipped = True
-
-                        show_notification(
-                            "FIM: 파일 이동/변경됨",
-                            f"새 버전이 백업되었습니다: {relative_path}"
+                    else:
+                        print(f"  ㄴ Google Drive 백업 시도 (이동으로 인한 수정): {relative_path}")
+                        backup_success = await self.runtime.call_api(
+                            self.api_client.request_gdrive_backup,
+                            relative_path,
+                            absolute_path,
+                            new_hash,
+                            is_modified=True,
+                            change_time=change_time,
                         )
-            else:
-                print(f"  ㄴ 오류: 해시 계산 실패 ({relative_path})")
+                        if backup_success:
+                            self.last_sent_hash[relative_path] = new_hash
+                            backup_performed_or_skipped = True
+
+                            await self.runtime.call_blocking(
+                                show_notification,
+                                "FIM: 파일 이동/변경됨",
+                                f"새 버전이 백업되었습니다: {relative_path}"
+                            )
+                else:
+                    print(f"  ㄴ 오류: 해시 계산 실패 ({relative_path})")
 
-        except Exception as e:
-            print(f"  ㄴ 오류 (on_moved 처리 중 {relative_path}): {e}")
+            except Exception as e:
+                print(f"  ㄴ 오류 (on_moved 처리 중 {relative_path}): {e}")
 
         # 만약 원본 파일이 임시 파일이 아니었다면 (단순 이름 변경의 경우)
         # 이전 이름의 파일을 삭제된 것으로 보고
-        if not self._is_temporary_file(event.src_path):
-            relative_old_path = self._get_relative_path(event.src_path)
+        if not self._is_temporary_file(src_path):
+            relative_old_path = self._get_relative_path(src_path)
 
             if backup_performed_or_skipped:
                 print(f"  ㄴ 원본 경로 삭제 보고 (이름 변경 감지): {relative_old_path}")
-                self.api_client.report_file_deleted_on_server(
-                    relative_old_path, detection_source="watchdog_rename"
-                )
-                if relative_old_path in self.last_sent_hash:
+                async with self._path_lock(relative_old_path):
                     try:
-                        del self.last_sent_hash[relative_old_path]
-                    except KeyError:
-                        pass
+                        await self.runtime.call_api(
+                            self.api_client.report_file_deleted_on_server,
+                            relative_old_path, detection_source="watchdog_rename"
+                        )
+                    except Exception as e:
+                        print(f"  ㄴ 오류 (원본 경로 삭제 보고 중 {relative_old_path}): {e}")
+                    self.last_sent_hash.pop(relative_old_path, None)
             else:
                 print(f"  ㄴ 목적지 파일 백업 실패. 원본 경로 삭제 보고 건너뜀: {relative_old_path}")
 
 
 class FileMonitor:
+    CHECK_SCHEDULE_INTERVAL = 60  # 주기적 검사 대상 확인 간격 (초)
+
     def __init__(self):
         self.api_client_module = api_client
+        self.runtime = AgentRuntime()
 
         self.event_handler = FIMEventHandler(
             FIM_BASE_DIR,
-            self.api_client_module
+            self.api_client_module,
+            self.runtime
         )
         self.observer = Observer()
 
-    def get_files_to_check_from_server(self):
+    async def get_files_to_check_from_server(self):
         """서버로부터 각 파일별 검사 설정을 포함한 파일 목록을 받아옴"""
         print(f"[{datetime.now()}] [SCHEDULER] 서버로부터 파일 목록 요청...")
-        files = self.api_client_module.fetch_file_list()
+        files = await self.runtime.call_api(self.api_client_module.fetch_file_list)
         if files is None:
             print(f"  [SCHEDULER] 서버로부터 파일 목록을 가져오는데 실패했거나 API 클라이언트가 준비되지 않았습니다.")
             return []
@@ -365,10 +407,117 @@ class FileMonitor:
         print(f"  [SCHEDULER] 서버로부터 {len(files)}개의 파일 정보 수신 완료.")
         return files
 
-    def check_files_periodically(self):
-        """(스케줄러에 의해 주기적 실행) 서버에 등록된 각 파일의 검사 주기에 따라 무결성을 검사합니다."""
+    def _on_hash_reported(self, relative_file_path, new_hash, success):
+        """ 일괄 해시 보고 결과 콜백: 성공한 보고만 마지막 전송 해시로 기록 """
+        if success:
+            self.event_handler.last_sent_hash[relative_file_path] = new_hash
+        else:
+            print(f"      ㄴ 해시 보고 실패: {relative_file_path}")
+
+    def _on_hash_reported_threadsafe(self, relative_file_path, new_hash, success):
+        """ 네트워크 스레드에서 호출된 보고 결과를 이벤트 루프로 넘김 """
+        self.runtime.loop.call_soon_threadsafe(self._on_hash_reported, relative_file_path, new_hash, success)
+
+    def _is_check_due(self, file_info, now):
+        """
+        파일 정보로 이번 주기에 검사할 대상인지 판단
+
+        :param file_info: 서버에서 받은 파일 정보
+        :param now: 현재 시각 (timezone 포함)
+
+        :return: True or False
+        """
+
+        relative_file_path = file_info.get("file_path")
+        check_interval_seconds_val = file_info.get("check_interval")
+        updated_at_str = file_info.get("updated_at")
+
+        if not relative_file_path or check_interval_seconds_val is None:
+            print(f"  [SCHEDULER] 정보 부족: 건너뜀 ({file_info.get('file_path', '경로 알 수 없음')})")
+            return False
+
+        try:
+            check_interval_seconds = float(check_interval_seconds_val)
+            if check_interval_seconds <= 0:
+                print(
+                    f"  [SCHEDULER] 경고: '{relative_file_path}'의 check_interval ({check_interval_seconds}초)이 유효하지 않음. 건너뜀.")
+                return False
+        except ValueError:
+            print(
+                f"  [SCHEDULER] 오류: '{relative_file_path}'의 check_interval ('{check_interval_seconds_val}')이 숫자가 아님. 건너뜀.")
+            return False
+
+        last_checked_time = None
+        if updated_at_str:
+            try:
+                last_checked_time = date_parser.isoparse(updated_at_str)
+            except ValueError:
+                print(f"  [SCHEDULER] 경고: '{relative_file_path}'의 updated_at ('{updated_at_str}') 파싱 실패. 첫 검사로 간주.")
+
+        if last_checked_time is None:
+            print(f"  [SCHEDULER] 파일: {relative_file_path}, 상태: 첫 검사 대상.")
+            return True
+
+        interval_delta = timedelta(seconds=check_interval_seconds)
+        next_check_time = last_checked_time + interval_delta
+        if now >= next_check_time:
+            lc_display = last_checked_time.strftime(
+                '%Y-%m-%d %H:%M:%S %Z') if last_checked_time.tzinfo else last_checked_time.strftime(
+                '%Y-%m-%d %H:%M:%S')
+            nc_display = next_check_time.strftime(
+                '%Y-%m-%d %H:%M:%S %Z') if next_check_time.tzinfo else next_check_time.strftime(
+                '%Y-%m-%d %H:%M:%S')
+            print(
+                f"  [SCHEDULER] 파일: {relative_file_path}, 상태: 검사 주기 도래 (마지막: {lc_display}, 다음: {nc_display}).")
+            return True
+
+        return False
+
+    async def _check_file(self, relative_file_path):
+        """
+        파일 1개 검사 (해시 계산 후 변경 시 보고 대기열에 추가)
+            - watchdog 이벤트 처리와 같은 경로별 잠금 안에서 수행하여 같은 파일의 보고 순서를 유지
+        """
+        async with self.event_handler._path_lock(relative_file_path):
+            absolute_file_path = FIM_BASE_DIR / relative_file_path
+            print(f"    [SCHEDULER] 검사 수행: {absolute_file_path}")
+
+            if not absolute_file_path.exists():
+                print(f"    [SCHEDULER] [경고] 파일 없음: {absolute_file_path}")
+                success = await self.runtime.call_api(
+                    self.api_client_module.report_file_deleted_on_server,
+                    relative_file_path, detection_source="scheduled_per_file"
+                )
+                if success:
+                    self.event_handler.last_sent_hash.pop(relative_file_path, None)
+                return
+
+            try:
+                new_hash = await self.runtime.hash_file(absolute_file_path)
+                if new_hash:
+                    last_hash = self.event_handler.last_sent_hash.get(relative_file_path)
+                    if last_hash == new_hash:
+                        print(f"    [SCHEDULER] 해시 변경 없음. 서버 보고 생략.")
+                        return
+
+                    await self.runtime.call_api(
+                        self.api_client_module.queue_hash_report,
+                        relative_file_path, new_hash,
+                        detection_source="scheduled_per_file",
+                        on_result=self._on_hash_reported_threadsafe
+                    )
+                else:
+                    print(f"      ㄴ 오류: 해시 계산 실패 ({relative_file_path})")
+            except Exception as e:
+                print(f"      ㄴ 오류 (주기적 검사 중 해시 계산/보고 {relative_file_path}): {e}")
+
+    async def check_files_periodically(self):
+        """
+        (스케줄러에 의해 주기적 실행) 서버에 등록된 각 파일의 검사 주기에 따라 무결성을 검사합니다.
+            - 대상 파일들의 해시 계산과 보고를 동시에 진행 (런타임의 스레드 풀 크기로 제한)
+        """
         print(f"--- 각 파일별 주기적 검사 시작 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ---")
-        files_to_check = self.get_files_to_check_from_server()
+        files_to_check = await self.get_files_to_check_from_server()
 
         if not files_to_check:
             print("  [SCHEDULER] 주기적 검사 대상 파일 목록이 없습니다 (서버 기준).")
@@ -376,87 +525,42 @@ class FileMonitor:
             return
 
         now = datetime.now().astimezone()
+        due_paths = [info.get("file_path") for info in files_to_check if self._is_check_due(info, now)]
 
-        for file_info in files_to_check:
-            relative_file_path = file_info.get("file_path")
-            check_interval_seconds_val = file_info.get("check_interval")
-            updated_at_str = file_info.get("updated_at")
+        await asyncio.gather(*(self._check_file(path) for path in due_paths))
 
-            if not relative_file_path or check_interval_seconds_val is None:
-                print(f"  [SCHEDULER] 정보 부족: 건너뜀 ({file_info.get('file_path', '경로 알 수 없음')})")
-                continue
+        # 이번 검사에서 모인 해시 보고를 일괄 전송
+        await self.runtime.call_api(self.api_client_module.flush_hash_reports)
+        print(f"--- 각 파일별 주기적 검사 완료 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ---")
 
-            absolute_file_path = FIM_BASE_DIR / relative_file_path
+    async def _run_async(self):
+        """ 이벤트 루프 안에서 감시 시작 및 주기 검사 반복 """
+        loop = asyncio.get_running_loop()
+        self.runtime.attach(loop)
 
-            try:
-                check_interval_seconds = float(check_interval_seconds_val)
-                if check_interval_seconds <= 0:
-                    print(
-                        f"  [SCHEDULER] 경고: '{relative_file_path}'의 check_interval ({check_interval_seconds}초)이 유효하지 않음. 건너뜀.")
-                    continue
-            except ValueError:
-                print(
-                    f"  [SCHEDULER] 오류: '{relative_file_path}'의 check_interval ('{check_interval_seconds_val}')이 숫자가 아님. 건너뜀.")
-                continue
-
-            last_checked_time = None
-            if updated_at_str:
-                try:
-                    last_checked_time = date_parser.isoparse(updated_at_str)
-                except ValueError:
-                    print(f"  [SCHEDULER] 경고: '{relative_file_path}'의 updated_at ('{updated_at_str}') 파싱 실패. 첫 검사로 간주.")
-
-            should_check = False
-            if last_checked_time is None:
-                print(f"  [SCHEDULER] 파일: {relative_file_path}, 상태: 첫 검사 대상.")
-                should_check = True
-            else:
-                interval_delta = timedelta(seconds=check_interval_seconds)
-                next_check_time = last_checked_time + interval_delta
-                if now >= next_check_time:
-                    lc_display = last_checked_time.strftime(
-                        '%Y-%m-%d %H:%M:%S %Z') if last_checked_time.tzinfo else last_checked_time.strftime(
-                        '%Y-%m-%d %H:%M:%S')
-                    nc_display = next_check_time.strftime(
-                        '%Y-%m-%d %H:%M:%S %Z') if next_check_time.tzinfo else next_check_time.strftime(
-                        '%Y-%m-%d %H:%M:%S')
-                    print(
-                        f"  [SCHEDULER] 파일: {relative_file_path}, 상태: 검사 주기 도래 (마지막: {lc_display}, 다음: {nc_display}).")
-                    should_check = True
-
-            if should_check:
-                print(f"    [SCHEDULER] 검사 수행: {absolute_file_path}")
-                if not absolute_file_path.exists():
-                    print(f"    [SCHEDULER] [경고] 파일 없음: {absolute_file_path}")
-                    success = self.api_client_module.report_file_deleted_on_server(
-                        relative_file_path, detection_source="scheduled_per_file"
-                    )
-                    if success:
-                        if relative_file_path in self.event_handler.last_sent_hash:
-                            try:
-                                del self.event_handler.last_sent_hash[relative_file_path]
-                            except KeyError:
-                                pass
-                    continue
-
-                try:
-                    new_hash = calculate_file_hash(str(absolute_file_path))
-                    if new_hash:
-                        last_hash = self.event_handler.last_sent_hash.get(relative_file_path)
-                        if last_hash == new_hash:
-                            print(f"    [SCHEDULER] 해시 변경 없음. 서버 보고 생략.")
-                            continue
-
-                        success = self.api_client_module.report_hash(
-                            relative_file_path, new_hash, detection_source="scheduled_per_file"
-                        )
-                        if success:
-                            self.event_handler.last_sent_hash[relative_file_path] = new_hash
-                    else:
-                        print(f"      ㄴ 오류: 해시 계산 실패 ({relative_file_path})")
-                except Exception as e:
-                    print(f"      ㄴ 오류 (주기적 검사 중 해시 계산/보고 {relative_file_path}): {e}")
-        print(f"--- 각 파일별 주기적 검사 완료 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ---")
+        if USE_WATCHDOG:
+            self.observer.schedule(self.event_handler, str(FIM_BASE_DIR), recursive=True)
+            self.observer.start()
+            print(f"[{datetime.now()}] 실시간 파일 변경 감지(Watchdog) 활성화됨 ({FIM_BASE_DIR})")
+        else:
+            print(f"[{datetime.now()}] 실시간 파일 변경 감지(Watchdog) 비활성화됨")
+
+        print(f"[{datetime.now()}] 프로그램 시작 초기 파일 검사를 실행합니다...")
+        await self.check_files_periodically()
+
+        print(f"[{datetime.now()}] 매 1분마다 각 파일별 검사 대상 여부를 확인하는 스케줄러를 시작합니다.")
+        next_run = loop.time() + self.CHECK_SCHEDULE_INTERVAL
+        try:
+            while True:
+                await asyncio.sleep(max(0.0, next_run - loop.time()))
+                next_run = loop.time() + self.CHECK_SCHEDULE_INTERVAL
+                await self.check_files_periodically()
+        finally:
+            if USE_WATCHDOG and self.observer.is_alive():
+                self.observer.stop()
+                await self.runtime.call_blocking(self.observer.join)
+                print("Watchdog 모니터링이 정지되었습니다.")
+            await self.runtime.drain()
 
     def run(self):
         """ 모니터링 시작 """
@@ -470,23 +574,7 @@ class FileMonitor:
             else:
                 api_token_set = True
                 ensure_fim_directory()
-
-                if USE_WATCHDOG:
-                    self.observer.schedule(self.event_handler, str(FIM_BASE_DIR), recursive=True)
-                    self.observer.start()
-                    print(f"[{datetime.now()}] 실시간 파일 변경 감지(Watchdog) 활성화됨 ({FIM_BASE_DIR})")
-                else:
-                    print(f"[{datetime.now()}] 실시간 파일 변경 감지(Watchdog) 비활성화됨")
-
-                print(f"[{datetime.now()}] 프로그램 시작 초기 파일 검사를 실행합니다...")
-                self.check_files_periodically()
-
-                print(f"[{datetime.now()}] 매 1분마다 각 파일별 검사 대상 여부를 확인하는 스케줄러를 시작합니다.")
-                schedule.every(1).minutes.do(self.check_files_periodically)
-
-                while True:
-                    schedule.run_pending()
-                    time.sleep(1)
+                asyncio.run(self._run_async())
 
         except KeyboardInterrupt:
             print("\n사용자에 의해 파일 무결성 모니터링이 중단됩니다...")
@@ -503,7 +591,7 @@ class FileMonitor:
                 self.observer.stop()
                 self.observer.join()
                 print("Watchdog 모니터링이 정지되었습니다.")
-            schedule.clear()
+            self.runtime.shutdown()
             print("모든 스케줄된 작업이 정지되었습니다.")
             print("프로그램을 종료합니다.")
 
@@ -1,15 +1,26 @@
 # routes/files.py
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file
 from auth import token_required
+import blob_cache
 from database import DatabaseManager, DatabaseError, NotFoundError
-from drive_utils import get_google_drive_service_for_user, download_file_from_google_drive
+from drive_utils import open_drive_download
+from urllib.parse import quote
 import traceback, datetime
-import io
+import base64
 import os
+import re
 
 files_bp = Blueprint('files', __name__)
 db: DatabaseManager | None = None  # 타입 힌트 명시
 
+MAX_BATCH_REPORTS = 500 # /api/report_hashes 요청 1건당 최대 보고 수
+MAX_BLOB_QUERY_HASHES = 1000 # /api/blobs/exists 요청 1건당 최대 해시 수
+DEFAULT_HISTORY_PAGE_SIZE = 50 # 변경 이력 API 기본 페이지 크기
+MAX_HISTORY_PAGE_SIZE = 200 # 변경 이력 API 최대 페이지 크기
+MAX_FILE_LIST_PAGE_SIZE = 5000 # /api/files 최대 페이지 크기
+DOWNLOAD_STREAM_CHUNK_SIZE = 256 * 1024 # 백업 다운로드 시 클라이언트로 전달하는 청크 크기
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
 def init_files_bp(database_manager):
     global db
     db = database_manager
@@ -19,34 +30,63 @@ def init_files_bp(database_manager):
 def get_user_files(user_id):
     """
     클라이언트가 사용자 파일 목록을 요청하는 엔드포인트 (딕셔너리)
+        - ETag(사용자별 파일 목록 버전, 페이지 요청이면 limit/cursor 포함)와 If-None-Match가 같으면
+          files 테이블 조회 없이 304 응답 (updated_at만 바뀐 경우는 버전이 바뀌지 않음)
+        - limit/cursor 파라미터로 페이지 단위 조회, 다음 페이지 커서는 X-Next-Cursor 헤더로 전달
 
     :param user_id: 사용자 ID
     :return: 사용자의 파일 목록을 JSON 형식으로 반환
     """
-    files_from_db = db.get_files_for_user(user_id)
+
+    try:
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+        after_id = int(request.args["cursor"]) if request.args.get("cursor") else None
+        if (limit is not None and limit <= 0) or (after_id is not None and after_id < 0):
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be positive integers"}), 400
+    if limit is not None:
+        limit = min(limit, MAX_FILE_LIST_PAGE_SIZE)
+
+    # 1. 목록 버전이 같으면 304 (페이지 요청은 limit/cursor별로 다른 ETag)
+    version = db.get_files_version(user_id)
+    etag = f"files-{user_id}-{version}" if version is not None else None
+    if etag and (limit is not None or after_id is not None):
+        etag = f"{etag}-{after_id or 0}-{limit or 'all'}"
+    if etag and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    # 2. 목록 조회 후 한 번에 변환 (timedelta -> 초, datetime -> ISO 문자열)
+    files_from_db = db.get_files_for_user(user_id, after_id=after_id, limit=limit)
 
     result = []
-    if files_from_db:
-        for f_db_item in files_from_db:
-            check_interval_value = f_db_item.get('check_interval')
-            updated_at_from_db = f_db_item.get('updated_at')
+    for f_db_item in files_from_db:
+        check_interval_value = f_db_item.get('check_interval')
+        updated_at_from_db = f_db_item.get('updated_at')
 
-            check_interval_seconds = None
+        check_interval_seconds = None
 
-            if isinstance(check_interval_value, datetime.timedelta):
-                check_interval_seconds = check_interval_value.total_seconds()
-            elif isinstance(check_interval_value, (int, float)):
-                check_interval_seconds = float(check_interval_value)
+        if isinstance(check_interval_value, datetime.timedelta):
+            check_interval_seconds = check_interval_value.total_seconds()
+        elif isinstance(check_interval_value, (int, float)):
+            check_interval_seconds = float(check_interval_value)
 
-            # 필요한 필드만 추출하여 딕셔너리 구성
-            result.append({
-                "file_path": f_db_item['file_path'],
-                "check_interval": check_interval_seconds,
-                "current_hash": f_db_item.get('current_hash'),
-                "updated_at": updated_at_from_db
-            })
+        # 필요한 필드만 추출하여 딕셔너리 구성
+        result.append({
+            "file_path": f_db_item['file_path'],
+            "check_interval": check_interval_seconds,
+            "current_hash": f_db_item.get('current_hash'),
+            "updated_at": updated_at_from_db.isoformat() if updated_at_from_db else None
+        })
 
-    return jsonify(result)
+    response = jsonify(result)
+    if etag:
+        response.set_etag(etag)
+    if limit is not None and len(files_from_db) == limit:
+        response.headers["X-Next-Cursor"] = str(files_from_db[-1]["id"])
+    return response
 
 
 @files_bp.route("/api/report_hash", methods=["POST"])
@@ -92,6 +132,66 @@ def report_hash(user_id):
         traceback.print_exc()
         return jsonify({"error": "An unexpected internal server error occurred in API handler."}), 500
 
+@files_bp.route("/api/report_hashes", methods=["POST"])
+@token_required
+def report_hashes(user_id):
+    """
+    클라이언트가 여러 파일의 해시값을 한 번에 보고하는 엔드포인트
+        - {"reports": [{"file_path", "new_hash", "detection_source", "detected_at"}]} 형식
+        - 모든 보고를 하나의 트랜잭션에서 일괄 처리
+
+    :param user_id: 사용자 ID
+
+    :return: 경로별 처리 결과 목록 or 에러 메시지
+    """
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get("reports"), list):
+        return jsonify({"error": "Request body must be JSON with a 'reports' list"}), 400
+
+    raw_reports = data["reports"]
+    if len(raw_reports) > MAX_BATCH_REPORTS:
+        return jsonify({"error": f"Too many reports in one batch (max {MAX_BATCH_REPORTS})"}), 413
+
+    reports, rejected = [], []
+    for item in raw_reports:
+        file_path = item.get("file_path") if isinstance(item, dict) else None
+        new_hash = item.get("new_hash") if isinstance(item, dict) else None
+        if not file_path or not new_hash:
+            rejected.append({"file_path": file_path, "status": "error", "message": "file_path and new_hash are required"})
+            continue
+
+        detected_at = None
+        if item.get("detected_at"):
+            try:
+                detected_at = datetime.datetime.fromisoformat(item["detected_at"])
+                if detected_at.tzinfo is None:
+                    detected_at = detected_at.replace(tzinfo=datetime.timezone.utc)
+            except (TypeError, ValueError):
+                detected_at = None
+
+        reports.append({
+            "file_path": file_path,
+            "new_hash": new_hash,
+            "detection_source": item.get("detection_source", "unknown_api_report"),
+            "detected_at": detected_at,
+        })
+
+    try:
+        results = db.handle_file_reports_batch(user_id, reports)
+        for result in results:
+            result["status"] = "success"
+        return jsonify({"results": results + rejected}), 200
+
+    except DatabaseError as e:
+        print(f"❌ Error from db.handle_file_reports_batch ({len(reports)} files, user {user_id}): {e}")
+        return jsonify({"error": str(e)}), 500
+
+    except Exception as e:
+        print(f"❌ Exception in report_hashes API ({len(reports)} files, user {user_id}): {e}")
+        traceback.print_exc()
+        return jsonify({"error": "An unexpected internal server error occurred in API handler."}), 500
+
 @files_bp.route("/api/file_deleted", methods=["POST"])
 @token_required
 def handle_delete_report_api(user_id):
@@ -179,6 +279,115 @@ def get_file_logs(user_id):
         return jsonify({"error": "Failed to retrieve file logs."}), 500
 
 
+def _encode_history_cursor(logged_at, log_id):
+    """ 이력 페이지 커서 생성 (마지막 항목의 logged_at, id) """
+    raw = f"{logged_at.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_history_cursor(cursor):
+    """
+    이력 페이지 커서 해석
+
+    :raises: ValueError: 잘못된 커서
+    """
+    raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    time_str, id_str = raw.rsplit("|", 1)
+    return datetime.datetime.fromisoformat(time_str), int(id_str)
+
+def _parse_history_time(value):
+    """ ISO 8601 시각 파라미터 해석 (시간대가 없으면 UTC) """
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+def _file_history_response(user_id, file_id=None):
+    """
+    변경 이력 조회 공통 처리
+        - 쿼리 파라미터: limit, cursor, since, until (ISO 8601), change_type (쉼표 구분)
+
+    :return: {"items": [...], "next_cursor": str or None}
+    """
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_HISTORY_PAGE_SIZE))
+        if limit <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    limit = min(limit, MAX_HISTORY_PAGE_SIZE)
+
+    try:
+        cursor = _decode_history_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    try:
+        since = _parse_history_time(request.args["since"]) if request.args.get("since") else None
+        until = _parse_history_time(request.args["until"]) if request.args.get("until") else None
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO 8601 timestamps"}), 400
+
+    change_types = [t.strip() for t in request.args.get("change_type", "").split(",") if t.strip()]
+
+    try:
+        rows = db.get_file_history(user_id, file_id=file_id, cursor=cursor, since=since, until=until,
+                                   change_types=change_types or None, limit=limit)
+    except DatabaseError:
+        return jsonify({"error": "Failed to retrieve file history."}), 500
+
+    if rows is None:
+        return jsonify({"error": "File not found"}), 404
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = _encode_history_cursor(rows[-1]["logged_at"], rows[-1]["id"])
+
+    items = [{
+        "id": row["id"],
+        "file_id": row["file_id"],
+        "file": row["file_path"],
+        "status": row["change_type"],
+        "time": row["logged_at"].isoformat(),
+        "oldHash": row["old_hash"],
+        "newHash": row["new_hash"],
+        "detectionSource": row["detection_source"],
+        "repeatCount": row["repeat_count"] or 1,
+        "summaryUntil": row["summary_until"].isoformat() if row["summary_until"] else None,
+    } for row in rows]
+
+    return jsonify({"items": items, "next_cursor": next_cursor}), 200
+
+
+@files_bp.route("/api/files/<int:file_id>/history", methods=["GET"])
+@token_required
+def get_file_history(user_id, file_id):
+    """
+    특정 파일의 변경 이력을 페이지 단위로 조회하는 API 엔드포인트 (최신순)
+
+    :param user_id: 사용자 ID
+    :param file_id: 파일 ID
+
+    :return: {"items": [...], "next_cursor": ...} (다음 페이지는 cursor 파라미터로 요청)
+    """
+
+    return _file_history_response(user_id, file_id)
+
+
+@files_bp.route("/api/files/history", methods=["GET"])
+@token_required
+def get_user_file_history(user_id):
+    """
+    사용자의 전체 파일 변경 이력을 페이지 단위로 조회하는 API 엔드포인트 (최신순)
+
+    :param user_id: 사용자 ID
+
+    :return: {"items": [...], "next_cursor": ...} (다음 페이지는 cursor 파라미터로 요청)
+    """
+
+    return _file_history_response(user_id)
+
+
 @files_bp.route("/api/files/status", methods=["PUT"])
 @token_required
 def update_file_status(user_id):
@@ -288,11 +497,108 @@ def get_file_backups(user_id, file_id):
         return jsonify({"error": "An internal server error occurred while fetching backups."}), 500
 
 
+@files_bp.route("/api/blobs/exists", methods=["POST"])
+@token_required
+def check_existing_blobs(user_id):
+    """
+    업로드 전 사전 확인: 사용자의 백업으로 이미 저장된 내용(해시)을 알려주는 엔드포인트
+        - {"hashes": [...]} 형식, 서버에 없는 해시만 실제 파일 업로드가 필요
+
+    :param user_id: 사용자 ID
+
+    :return: {"existing": [...], "missing": [...]} or 에러 메시지
+    """
+
+    data = request.get_json(silent=True)
+    hashes = data.get("hashes") if isinstance(data, dict) else None
+    if not isinstance(hashes, list) or not all(isinstance(h, str) for h in hashes):
+        return jsonify({"error": "Request body must be JSON with a 'hashes' list"}), 400
+
+    if len(hashes) > MAX_BLOB_QUERY_HASHES:
+        return jsonify({"error": f"Too many hashes in one request (max {MAX_BLOB_QUERY_HASHES})"}), 413
+
+    requested = list(dict.fromkeys(h.lower() for h in hashes))
+    try:
+        existing = db.get_existing_backup_hashes(user_id, requested)
+        return jsonify({
+            "existing": [h for h in requested if h in existing],
+            "missing": [h for h in requested if h not in existing],
+        }), 200
+
+    except Exception as e:
+        print(f"❌ Error in check_existing_blobs for user {user_id}: {e}")
+        traceback.print_exc()
+        return jsonify({"error": "Failed to check existing backups."}), 500
+
+
+@files_bp.route("/api/files/delta_base", methods=["GET"])
+@token_required
+def get_delta_base(user_id):
+    """
+    델타 업로드 기준 정보를 반환하는 엔드포인트
+        - 파일의 최신 백업과 그 블록 시그니처(base64)를 반환
+        - 델타는 이 서버의 백업 캐시(blob_cache)에 있는 기준 백업에만 적용하므로, 캐시에 없으면 404
+          (클라이언트는 델타를 계산/전송하지 않고 바로 전체 업로드)
+
+    :param user_id: 사용자 ID
+
+    :return: 기준 백업 정보 JSON or error message (기준 백업이 없으면 404)
+    """
+
+    relative_path = request.args.get("relative_path")
+    if not relative_path:
+        return jsonify({"error": "relative_path is required"}), 400
+
+    try:
+        base = db.get_delta_base(user_id, relative_path)
+        if not base or not blob_cache.contains(base["backup_hash"]):
+            return jsonify({"error": "No delta base available"}), 404
+
+        return jsonify({
+            "backup_id": base["id"],
+            "backup_hash": base["backup_hash"],
+            "file_size": base["file_size"],
+            "block_size": base["block_size"],
+            "signatures": base64.b64encode(bytes(base["block_signatures"])).decode("ascii"),
+        }), 200
+
+    except Exception as e:
+        print(f"❌ Error in get_delta_base for {relative_path} (user {user_id}): {e}")
+        traceback.print_exc()
+        return jsonify({"error": "Failed to retrieve delta base."}), 500
+
+
+def _single_byte_range(range_header):
+    """
+    Drive에 전달할 Range 헤더 (단일 바이트 범위만 지원, 그 외는 전체 다운로드)
+
+    :param range_header: 클라이언트의 Range 헤더 값
+
+    :return: "bytes=start-end" 형식 문자열 or None
+    """
+
+    if not range_header:
+        return None
+    match = _BYTE_RANGE.match(range_header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    return range_header.strip()
+
+
+def _attachment_disposition(filename):
+    """ 다운로드 파일 이름 헤더 (한글 등 비 ASCII 이름은 RFC 5987 형식으로 함께 전달) """
+    ascii_name = filename.encode("ascii", "ignore").decode() or "download.bin"
+    ascii_name = ascii_name.replace('"', "")
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
 @files_bp.route("/api/backups/<int:backup_id>/download", methods=["GET"])
 @token_required
 def download_backup_file(user_id, backup_id):
     """
     Google Drive에서 특정 백업 파일을 다운로드하여 사용자에게 스트리밍
+        - 로컬 백업 캐시(blob_cache)에 있으면 Drive 요청 없이 캐시 파일을 전송
+        - 캐시에 없으면 Drive에서 받으면서 전체 다운로드일 때만 캐시에 함께 기록
 
     :param user_id: 사용자 ID
     :param backup_id: 다운로드할 백업 파일의 ID
@@ -314,22 +620,83 @@ def download_backup_file(user_id, backup_id):
         else:
             download_name = f"rollback_{backup_id}.bin"
 
-        # 2. Google Drive 서비스 가져오기
-        service = get_google_drive_service_for_user(user_id)
-        if not service:
+        # 2. 로컬 캐시에 있으면 그대로 전송 (Range/조건부 요청은 send_file이 처리)
+        backup_hash = backup_details.get("backup_hash")
+        cached_path = blob_cache.get_cached_path(backup_hash)
+        if cached_path:
+            return send_file(
+                cached_path,
+                mimetype="application/octet-stream",
+                as_attachment=True,
+                download_name=download_name,
+                conditional=True,
+                etag=backup_hash.lower(),
+            )
+
+        # 3. Google Drive에 스트리밍 다운로드 요청 (Range 요청이면 그대로 전달)
+        byte_range = _single_byte_range(request.headers.get("Range"))
+        upstream = open_drive_download(user_id, backup_path, byte_range)
+        if upstream is None:
             return jsonify({"error": "Google Drive service not available"}), 500
 
-        # 3. 파일 다운로드
-        file_bytes = download_file_from_google_drive(service, backup_path)
-        if not file_bytes:
-            return jsonify({"error": "Failed to download file from Google Drive"}), 500
-
-        # 4. 파일 스트리밍 응답
-        return send_file(
-            io.BytesIO(file_bytes),                         # 바이트 스트림으로 변환
-            as_attachment=True,                             # 다운로드 형식으로 응답
-            download_name=download_name,                    # 다운로드 파일 이름 지정
-            mimetype="application/octet-stream"             # MIME 타입 지정
+        if upstream.status_code == 416:
+            upstream.close()
+            response = Response(status=416)
+            response.headers["Content-Range"] = upstream.headers.get("Content-Range", "bytes */*")
+            return response
+
+        if upstream.status_code not in (200, 206):
+            print(f"❌ Drive download failed for backup {backup_id}: HTTP {upstream.status_code}")
+            upstream.close()
+            if upstream.status_code == 404:
+                return jsonify({"error": "Backup content not found in Google Drive"}), 404
+            return jsonify({"error": "Failed to download file from Google Drive"}), 502
+
+        # 4. 받은 청크를 그대로 클라이언트에 전달 (메모리에는 청크 하나만 유지)
+        #    전체 다운로드면 같은 청크를 캐시에도 기록하고, 끝까지 받았을 때 해시가 맞으면 반영
+        cache_writer = None
+        if byte_range is None and upstream.status_code == 200:
+            content_length = upstream.headers.get("Content-Length")
+            cache_writer = blob_cache.open_cache_writer(
+                backup_hash, int(content_length) if content_length and content_length.isdigit() else None
+            )
+
+        headers = {
+            "Content-Disposition": _attachment_disposition(download_name),
+            "Accept-Ranges": "bytes",
+        }
+        for name in ("Content-Length", "Content-Range"):
+            if upstream.headers.get(name):
+                headers[name] = upstream.headers[name]
+
+        def generate():
+            nonlocal cache_writer
+            completed = False
+            try:
+                for chunk in upstream.iter_content(DOWNLOAD_STREAM_CHUNK_SIZE):
+                    if cache_writer is not None:
+                        try:
+                            cache_writer.write(chunk)
+                        except OSError as e:
+                            print(f"⚠️ 백업 캐시 기록 중단 (backup {backup_id}): {e}")
+                            cache_writer.abort()
+                            cache_writer = None
+                    yield chunk
+                completed = True
+            finally:
+                upstream.close()
+                if cache_writer is not None:
+                    if completed:
+                        cache_writer.commit()
+                    else:
+                        cache_writer.abort()
+
+        return Response(
+            generate(),
+            status=upstream.status_code,
+            headers=headers,
+            mimetype="application/octet-stream",
+            direct_passthrough=True,
         )
 
     except Exception as e: